@@ -1,18 +1,115 @@
 """
 Access point for the beedle library
+
+The public names and the submodules are imported on first access
+through the module __getattr__, so importing beedle doesn't load NumPy,
+loguru or any engine module until one of them is used
 """
 
-from .exceptions import TileMapIndexError
-from .tilegraph import TileGraph
-from .tilelocations import LocationMap
-from .tilemap import TileMap
-from .tilesearch import PartialTileMap
+import importlib
+
+
+# typing.TYPE_CHECKING without importing typing, type checkers treat the
+# name as true
+TYPE_CHECKING = False
 
 
+# Public name -> submodule defining it
+_LAZY_IMPORTS = {
+    "CompiledConfiguration": ".tileconfig",
+    "ConfigurationError": ".exceptions",
+    "ItemCriticality": ".tilecritical",
+    "ItemInventory": ".tileinventory",
+    "ItemTable": ".tileconfig",
+    "LocationMap": ".tilelocations",
+    "MapEditor": ".tileedit",
+    "MapSnapshot": ".tilesnapshot",
+    "PartialTileMap": ".tilesearch",
+    "ReachabilityQuery": ".tilequery",
+    "RequirementSolver": ".tilesolver",
+    "RoutePlanner": ".tileroute",
+    "TileGraph": ".tilegraph",
+    "TileGrid": ".tilegrid",
+    "TileMap": ".tilemap",
+    "TileMapIndexError": ".exceptions",
+    "TileTable": ".tileconfig",
+    "TileWorld": ".tileworld",
+    "WorldLayer": ".tileworld",
+    "compile_configuration": ".tileconfig",
+    "load_compiled_configuration": ".tileconfig",
+}
+
 __all__ = [
+    "CompiledConfiguration",
+    "ConfigurationError",
+    "ItemCriticality",
+    "ItemInventory",
+    "ItemTable",
     "LocationMap",
+    "MapEditor",
+    "MapSnapshot",
     "PartialTileMap",
+    "ReachabilityQuery",
+    "RequirementSolver",
+    "RoutePlanner",
     "TileGraph",
+    "TileGrid",
     "TileMap",
     "TileMapIndexError",
+    "TileTable",
+    "TileWorld",
+    "WorldLayer",
+    "compile_configuration",
+    "load_compiled_configuration",
 ]
+
+if TYPE_CHECKING:
+    from .exceptions import ConfigurationError, TileMapIndexError
+    from .tileconfig import (
+        CompiledConfiguration,
+        ItemTable,
+        TileTable,
+        compile_configuration,
+        load_compiled_configuration,
+    )
+    from .tilecritical import ItemCriticality
+    from .tileedit import MapEditor
+    from .tilegraph import TileGraph
+    from .tilegrid import TileGrid
+    from .tileinventory import ItemInventory
+    from .tilelocations import LocationMap
+    from .tilemap import TileMap
+    from .tilequery import ReachabilityQuery
+    from .tileroute import RoutePlanner
+    from .tilesearch import PartialTileMap
+    from .tilesnapshot import MapSnapshot
+    from .tilesolver import RequirementSolver
+    from .tileworld import TileWorld, WorldLayer
+
+
+def __getattr__(name: str):
+    """
+    Imports the submodule defining the public name, or the submodule
+    itself, and stores the result so later lookups skip this hook
+    """
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is not None:
+        value = getattr(importlib.import_module(module_name, __name__), name)
+    else:
+        try:
+            value = importlib.import_module(f"{__name__}.{name}")
+        except ModuleNotFoundError as import_err:
+            if import_err.name != f"{__name__}.{name}":
+                raise
+            raise AttributeError(
+                f"module {__name__!r} has no attribute {name!r}"
+            ) from None
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """
+    Module attributes along with the public names not imported yet
+    """
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,10 @@
+"""
+Allows running the beedle console command through python -m beedle
+"""
+
+import sys
+
+from .cli import main
+
+
+sys.exit(main())
@@ -0,0 +1,432 @@
+"""
+Command line entry point for the beedle library
+
+beedle analyze
+> Discovers map / configuration pairs from directories, globs or
+  explicit configuration files
+> Runs the full TileMap -> TileGraph -> topological_sort pipeline for
+  every pair over a pool of worker processes
+> Streams one JSON-lines record per input with the analysis results and
+  the timing of each pipeline stage
+> Optionally reuses the results stored within a ResultCache database
+  shared by every worker process (--cache)
+> Optionally checks every location of the configuration within the
+  same search (--all-locations)
+
+Map / configuration pairing
+> Each "<name>.json" configuration is paired with the first existing map
+  file out of "<name>map.npy", "<name>map.dat", "<name>.npy" or
+  "<name>.dat" in the same directory (ie. zelda2.json -> zelda2map.dat)
+"""
+
+import argparse
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+import cProfile
+import glob
+import json
+import os
+from pathlib import Path
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from .tiletrace import tracer
+
+
+Coord = Tuple[int, int]
+InputPair = Tuple[Path, Optional[Path]]
+
+MAP_FILE_SUFFIXES = ("map.npy", "map.dat", ".npy", ".dat")
+
+
+def configure_logging(log_level: str) -> None:
+    """
+    Replaces the default loguru sink so the worker processes only report
+    messages at or above the requested level on stderr, leaving stdout
+    for the JSON-lines records
+    """
+    logger.remove()
+    logger.add(sys.stderr, level=log_level)
+
+
+def find_map_file(config_path: Path) -> Optional[Path]:
+    """
+    Finds the map data paired with the configuration file using the
+    MAP_FILE_SUFFIXES naming conventions
+    """
+    for suffix in MAP_FILE_SUFFIXES:
+        map_path = config_path.with_name(config_path.stem + suffix)
+        if map_path.is_file():
+            return map_path
+    return None
+
+
+def discover_inputs(patterns: Iterable[str]) -> List[InputPair]:
+    """
+    Expands the directories, globs and configuration files provided on
+    the command line into (configuration, map) pairs
+
+    Configurations without a matching map file are still returned with a
+    map path of None so they can be reported in the output stream
+    """
+    discovered = []
+    seen_configs = set()
+    for pattern in patterns:
+        pattern_path = Path(pattern)
+        if pattern_path.is_dir():
+            candidates = sorted(pattern_path.glob("*.json"))
+        elif pattern_path.is_file():
+            candidates = [pattern_path]
+        else:
+            candidates = sorted(
+                Path(match) for match in glob.glob(pattern, recursive=True)
+            )
+
+        for config_path in candidates:
+            if config_path.suffix != ".json":
+                continue
+            if config_path in seen_configs:
+                continue
+            seen_configs.add(config_path)
+            discovered.append((config_path, find_map_file(config_path)))
+    return discovered
+
+
+def analyze_input(
+    input_index: int,
+    config_path: Path,
+    map_path: Optional[Path],
+    graph_start: Coord,
+    graph_end: Coord,
+    profile_directory: Optional[Path] = None,
+    trace: bool = False,
+    cache_path: Optional[Path] = None,
+    all_locations: bool = False,
+) -> dict:
+    """
+    Runs the complete analysis pipeline for a single map / configuration
+    pair and returns a JSON serializable record of the results
+
+    Any failure is captured within the record rather than raised so a
+    single broken input doesn't stop the remaining batch. Inputs whose
+    goal can't be completed are reported with the "unbeatable" status and
+    the UnbeatableResult diagnostics. With trace enabled the tracer
+    summary of the input is added to the record. With a cache_path the
+    TileGraph results are looked up in the ResultCache database and
+    cache_hit reports whether they were found. With
+    all_locations every location is a goal of the same search, the
+    chunk completing each of them is reported within goal_chunks and
+    the locations never completed within unresolved_goals
+    """
+    # The engine is only imported by the processes running an analysis,
+    # keeping argument parsing and --help free of NumPy
+    # pylint: disable=import-outside-toplevel
+    from .tilecache import ResultCache
+    from .tileconfig import load_compiled_configuration
+    from .tilegraph import ALL_LOCATIONS, TileGraph
+    from .tileio import load_map_data
+    from .tilelocations import LocationMap
+    from .tilemap import TileMap
+
+    record = {
+        "input": input_index,
+        "config": str(config_path),
+        "map": None if map_path is None else str(map_path),
+    }
+    if map_path is None:
+        record["status"] = "error"
+        record["error"] = f"Unable to find map data for {config_path}"
+        return record
+
+    profiler = cProfile.Profile() if profile_directory else None
+    timings = {}
+    result_cache = None
+    if trace:
+        tracer.reset()
+        tracer.enable()
+    try:
+        if cache_path is not None:
+            result_cache = ResultCache(cache_path)
+        if profiler:
+            profiler.enable()
+
+        stage_start = time.perf_counter()
+        configuration = load_compiled_configuration(config_path)
+        map_data = load_map_data(map_path)
+        configuration.validate_map(map_data)
+        timings["load"] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        location_map = LocationMap(configuration.locations)
+        tile_map = TileMap(map_data, location_map, configuration.tiles)
+        timings["tile_map"] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        graph_obj = TileGraph(
+            graph_start,
+            graph_end,
+            tile_map,
+            location_map,
+            cache=result_cache,
+            goals=ALL_LOCATIONS if all_locations else None,
+        )
+        timings["tile_graph"] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        topological_order, _ = graph_obj.topological_sort(
+            tile_map, location_map
+        )
+        timings["topological_sort"] = time.perf_counter() - stage_start
+    except Exception as analysis_err:  # pylint: disable=broad-except
+        logger.error(f"Failed to analyze {config_path}: {analysis_err}")
+        record["status"] = "error"
+        record["error"] = f"{type(analysis_err).__name__}: {analysis_err}"
+    else:
+        record["status"] = "ok" if graph_obj.beatable else "unbeatable"
+        record["location_order"] = [
+            sorted(map(list, completion_group))
+            for completion_group in graph_obj.location_order
+        ]
+        record["bottlenecks"] = [
+            {
+                "reward_location": list(reward_location),
+                "cost_locations": sorted(map(list, cost_locations)),
+            }
+            for reward_location, cost_locations in (
+                graph_obj.bottlenecks.items()
+            )
+        ]
+        record["topological_order"] = [
+            [completion_index, list(location)]
+            for completion_index, location in topological_order
+        ]
+        if not graph_obj.beatable:
+            record["unbeatable"] = graph_obj.unbeatable.as_dict()
+        if all_locations:
+            record["goal_chunks"] = [
+                [list(goal), chunk_index]
+                for goal, chunk_index in sorted(graph_obj.goal_chunks.items())
+            ]
+            record["unresolved_goals"] = sorted(
+                map(list, graph_obj.unresolved_goals)
+            )
+        if result_cache is not None:
+            record["cache_hit"] = result_cache.hits > 0
+    finally:
+        if result_cache is not None:
+            result_cache.close()
+        if profiler:
+            profiler.disable()
+            profile_directory.mkdir(parents=True, exist_ok=True)
+            profile_path = (
+                profile_directory / f"{config_path.stem}-{input_index}.prof"
+            )
+            profiler.dump_stats(str(profile_path))
+            record["profile"] = str(profile_path)
+        if trace:
+            tracer.disable()
+            record["trace"] = tracer.summary()
+
+    timings["total"] = sum(timings.values())
+    record["timings"] = timings
+    return record
+
+
+def run_analyze(args: argparse.Namespace) -> int:
+    """
+    Handler for the analyze subcommand
+
+    Records are written as soon as each input completes so the order
+    of the output stream follows completion order rather than the input
+    order; the "input" field of the record refers back to the input index
+    """
+    input_pairs = discover_inputs(args.inputs)
+    if not input_pairs:
+        logger.error(f"No configuration files found in {args.inputs}")
+        return 2
+
+    graph_start = tuple(args.start)
+    graph_end = tuple(args.end)
+    profile_directory = Path(args.profile_dir) if args.profile else None
+    cache_path = Path(args.cache) if args.cache else None
+
+    output_handle = (
+        open(args.output, "w", encoding="utf-8")
+        if args.output
+        else sys.stdout
+    )
+    failures = 0
+    try:
+        task_arguments = [
+            (index, config_path, map_path, graph_start, graph_end,
+             profile_directory, args.trace, cache_path, args.all_locations)
+            for index, (config_path, map_path) in enumerate(input_pairs)
+        ]
+        if args.jobs == 1:
+            records = (analyze_input(*task) for task in task_arguments)
+            failures = _write_records(records, output_handle)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=args.jobs,
+                initializer=configure_logging,
+                initargs=(args.log_level,),
+            ) as pool:
+                futures = {
+                    pool.submit(analyze_input, *task): task
+                    for task in task_arguments
+                }
+                records = _completed_records(futures)
+                failures = _write_records(records, output_handle)
+    finally:
+        if output_handle is not sys.stdout:
+            output_handle.close()
+    return 1 if failures else 0
+
+
+def _completed_records(futures: Dict[Future, tuple]) -> Iterator[dict]:
+    """
+    Yields the record of every future as it completes, a worker failing
+    outside of analyze_input (a crashed process, a result that can't be
+    pickled) yields the error record of its task instead
+    """
+    for future in as_completed(futures):
+        try:
+            yield future.result()
+        except Exception as worker_err:  # pylint: disable=broad-except
+            input_index, config_path, map_path = futures[future][:3]
+            logger.error(
+                f"Worker failed to analyze {config_path}: {worker_err}"
+            )
+            yield {
+                "input": input_index,
+                "config": str(config_path),
+                "map": None if map_path is None else str(map_path),
+                "status": "error",
+                "error": f"{type(worker_err).__name__}: {worker_err}",
+            }
+
+
+def _write_records(records: Iterable[dict], output_handle) -> int:
+    """
+    Streams the records as JSON-lines and returns the number of
+    records that failed
+    """
+    failures = 0
+    for record in records:
+        output_handle.write(json.dumps(record) + "\n")
+        output_handle.flush()
+        if record["status"] != "ok":
+            failures += 1
+    return failures
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Builds the argument parser for the beedle console command
+    """
+    parser_obj = argparse.ArgumentParser(
+        prog="beedle", description="Map to Graph translation library"
+    )
+    parser_obj.add_argument(
+        "--log-level",
+        dest="log_level",
+        type=str,
+        default="WARNING",
+        help="Minimum loguru level reported on stderr",
+    )
+    subparsers = parser_obj.add_subparsers(dest="command", required=True)
+
+    analyze_parser = subparsers.add_parser(
+        "analyze",
+        help="Run the TileGraph analysis over map / configuration pairs",
+    )
+    analyze_parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="Directories, glob patterns or configuration files to analyze",
+    )
+    analyze_parser.add_argument(
+        "-s",
+        "--start",
+        dest="start",
+        type=int,
+        nargs=2,
+        required=True,
+        metavar=("X", "Y"),
+        help="Coordinate the graph search starts from",
+    )
+    analyze_parser.add_argument(
+        "-e",
+        "--end",
+        dest="end",
+        type=int,
+        nargs=2,
+        required=True,
+        metavar=("X", "Y"),
+        help="Coordinate of the location that completes the graph search",
+    )
+    analyze_parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes",
+    )
+    analyze_parser.add_argument(
+        "-o",
+        "--output",
+        dest="output",
+        type=str,
+        default=None,
+        help="Output file path for the JSON-lines records (default stdout)",
+    )
+    analyze_parser.add_argument(
+        "--profile",
+        dest="profile",
+        action="store_true",
+        help="Dump cProfile stats for every input",
+    )
+    analyze_parser.add_argument(
+        "--profile-dir",
+        dest="profile_dir",
+        type=str,
+        default="profiles",
+        help="Output directory for the cProfile stats",
+    )
+    analyze_parser.add_argument(
+        "--trace",
+        dest="trace",
+        action="store_true",
+        help="Add the tracer counters and phase timings to every record",
+    )
+    analyze_parser.add_argument(
+        "--cache",
+        dest="cache",
+        type=str,
+        default=None,
+        help="SQLite database storing the analysis results between runs",
+    )
+    analyze_parser.add_argument(
+        "--all-locations",
+        dest="all_locations",
+        action="store_true",
+        help="Keep searching until every location is completed or blocked",
+    )
+    analyze_parser.set_defaults(func=run_analyze)
+    return parser_obj
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Console entry point for the beedle command
+    """
+    args = build_parser().parse_args(argv)
+    configure_logging(args.log_level)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
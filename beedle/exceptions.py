@@ -4,7 +4,7 @@ Module for all custom exceptions within the beedle library
 
 from __future__ import annotations
 
-from typing import Any, TYPE_CHECKING
+from typing import Any, List, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from .tilemap import TileMap
@@ -34,3 +34,25 @@ class TileMapIndexError(KeyError):
             f"Expected value type: TileNode\n"
         )
         return message
+
+
+class ConfigurationError(ValueError):
+    """
+    Error raised when compiling the configuration
+    If the "tiles" / "locations" fields don't match the expected
+    schema or reference items / tiles that can't be resolved, then
+    this exception is raised with every problem found
+    """
+
+    def __init__(self, errors: List[str]):
+        self.errors = list(errors)
+        message = self._format_message(self.errors)
+        super().__init__(message)
+
+    def _format_message(self, errors: List[str]) -> str:
+        """
+        Formats the ValueError message with one line per problem found
+        """
+        message = f"Invalid configuration ({len(errors)} errors)\n"
+        message += "\n".join(f"\t> {error}" for error in errors)
+        return message
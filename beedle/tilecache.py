@@ -0,0 +1,224 @@
+"""
+Persistent on-disk cache of the TileGraph analysis results
+
+Results are stored within a single SQLite database keyed by the
+analysis_key of the inputs
+> TileMap.content_hash covering the map data, the tile table and the
+  location configuration
+> graph_start / graph_end coordinates
+> Options changing the results (goal_directed, heuristic)
+> ENGINE_VERSION, bumped whenever the analysis output changes
+
+Rows are stored as zlib compressed JSON payloads. Derived results such
+as the topological sort are stored under "<key>:<name>" so invalidating
+a key drops everything computed from it. Once the stored payloads
+exceed max_bytes the least recently read rows are evicted first
+
+The database runs in WAL mode so the worker processes of the CLI can
+share a cache file, each opening its own connection
+"""
+
+import hashlib
+import json
+from pathlib import Path
+import sqlite3
+import time
+from typing import Any, Optional, Tuple, Union
+import zlib
+
+from loguru import logger
+
+from .tiletrace import tracer
+
+
+ENGINE_VERSION = "6"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def analysis_key(
+    tile_map,
+    graph_start: Tuple[int, int],
+    graph_end: Tuple[int, int],
+    **options: Any,
+) -> str:
+    """
+    Returns the cache key of an analysis over the TileMap
+
+    The options must be JSON serializable and are sorted by name so the
+    keyword order doesn't change the key
+    """
+    key_fields = {
+        "engine": ENGINE_VERSION,
+        "map": tile_map.content_hash,
+        "start": list(graph_start),
+        "end": list(graph_end),
+        "options": options,
+    }
+    return hashlib.sha256(
+        json.dumps(key_fields, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite backed store of JSON serializable analysis results
+    > path <Path>
+        > Location of the SQLite database, created when missing
+    > max_bytes <int>
+        > Upper bound on the total size of the compressed payloads
+    > hits, misses <int>
+        > Number of get calls answered / not answered by the store
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        timeout: float = 30.0,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._connection = sqlite3.connect(
+            str(self.path), timeout=timeout, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, "
+            "engine_version TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "accessed REAL NOT NULL, "
+            "payload BLOB NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS results_accessed "
+            "ON results (accessed)"
+        )
+        stale_rows = self._connection.execute(
+            "DELETE FROM results WHERE engine_version != ?",
+            (ENGINE_VERSION,),
+        ).rowcount
+        if stale_rows:
+            logger.info(
+                f"Dropped {stale_rows} results of other engine versions "
+                f"from {self.path}"
+            )
+
+    def __str__(self) -> str:
+        return (
+            f"ResultCache Instance [{self.path}] "
+            f"[{self.hits} hits / {self.misses} misses] {id(self)}"
+        )
+
+    def __len__(self) -> int:
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM results"
+        ).fetchone()[0]
+
+    def __contains__(self, key: str) -> bool:
+        return (
+            self._connection.execute(
+                "SELECT 1 FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            is not None
+        )
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @property
+    def total_bytes(self) -> int:
+        """
+        Total size of the compressed payloads currently stored
+        """
+        return self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the value stored under the key or None, refreshing the
+        access time of the row used by the eviction
+        """
+        row = self._connection.execute(
+            "SELECT payload FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            tracer.count("tilecache.miss")
+            return None
+        self._connection.execute(
+            "UPDATE results SET accessed = ? WHERE key = ?",
+            (time.time(), key),
+        )
+        self.hits += 1
+        tracer.count("tilecache.hit")
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Stores the JSON serializable value under the key, then evicts
+        the least recently read rows while the store exceeds max_bytes
+        """
+        payload = zlib.compress(
+            json.dumps(value, separators=(",", ":")).encode("utf-8")
+        )
+        self._connection.execute(
+            "INSERT OR REPLACE INTO results "
+            "(key, engine_version, size, accessed, payload) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, ENGINE_VERSION, len(payload), time.time(), payload),
+        )
+        tracer.count("tilecache.put")
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Removes the least recently read rows until the stored payloads
+        fit within max_bytes, returning the number of rows removed
+        """
+        total_bytes = self.total_bytes
+        if total_bytes <= self.max_bytes:
+            return 0
+        evicted_keys = []
+        for key, size in self._connection.execute(
+            "SELECT key, size FROM results ORDER BY accessed, rowid"
+        ).fetchall():
+            if total_bytes <= self.max_bytes:
+                break
+            evicted_keys.append((key,))
+            total_bytes -= size
+        self._connection.executemany(
+            "DELETE FROM results WHERE key = ?", evicted_keys
+        )
+        tracer.count("tilecache.evict", len(evicted_keys))
+        logger.debug(f"Evicted {len(evicted_keys)} results from {self}")
+        return len(evicted_keys)
+
+    def invalidate(self, key: str) -> int:
+        """
+        Removes the key along with the results derived from it
+        ("<key>:<name>"), returning the number of rows removed
+        """
+        return self._connection.execute(
+            "DELETE FROM results WHERE key = ? OR substr(key, 1, ?) = ?",
+            (key, len(key) + 1, f"{key}:"),
+        ).rowcount
+
+    def clear(self) -> None:
+        """
+        Removes every stored result
+        """
+        self._connection.execute("DELETE FROM results")
+
+    def close(self) -> None:
+        """
+        Closes the database connection
+        """
+        self._connection.close()
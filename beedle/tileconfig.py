@@ -0,0 +1,577 @@
+"""
+Configuration compiler:
+Parses the "tiles" and "locations" fields of the configuration once,
+validates the schema and the item references between them and produces
+dense lookup tables used while building the TileMap
+
+ItemTable
+> Interned item names mapped to bit indexes so item collections can be
+  represented as integer bitmasks
+TileTable
+> Dense arrays / tuples indexed directly by the integer tile value
+  replacing the tile_table[str(tile_value)] dictionary lookups
+Costs
+> BASE_COST, traversal_cost and reward_cost accept boolean expressions
+  compiled once by beedle.tilecost.compile_cost
+CompiledConfiguration
+> The compiled tiles, normalized locations and item tables
+
+Compiled configurations loaded from disk are cached by the hash
+of the file contents so repeated loads skip parsing entirely
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+from pathlib import Path
+import sys
+from typing import FrozenSet, Iterable, List, Union
+
+from loguru import logger
+import numpy as np
+
+from .exceptions import ConfigurationError
+from .tilecost import (
+    canonical_cost,
+    compile_cost,
+    cost_masks,
+    item_name,
+    normalize_items,
+)
+
+
+TILE_FIELDS = {
+    "TYPE": str,
+    "SYMBOL": str,
+    "BASE_COST": (list, str),
+    "WALKABLE": bool,
+    "COLOR": str,
+}
+LOCATION_COORDINATE_FIELDS = ("entrance", "exit")
+LOCATION_ITEM_FIELDS = ("traversal_cost", "reward_cost", "reward")
+LOCATION_COST_FIELDS = ("traversal_cost", "reward_cost")
+
+CONFIGURATION_CACHE_SIZE = 32
+_CONFIGURATION_CACHE = OrderedDict()
+
+
+class ItemTable:
+    """
+    Interned lookup table between item names and bit indexes
+
+    Item collections are stored as integer bitmasks where bit N is set
+    when the item at index N is present in the collection
+    """
+
+    def __init__(self, items: Iterable[str] = ()):
+        self.items = []
+        self.index = {}
+        for item in items:
+            self.intern(item)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, item: str) -> bool:
+        return item in self.index
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __str__(self) -> str:
+        return f"ItemTable Instance [{len(self.items)}] {id(self)}"
+
+    def intern(self, item: str) -> int:
+        """
+        Returns the bit index of the item, adding it to the table
+        if it hasn't been seen before
+        """
+        item_index = self.index.get(item)
+        if item_index is None:
+            item = sys.intern(item)
+            item_index = len(self.items)
+            self.items.append(item)
+            self.index[item] = item_index
+        return item_index
+
+    def mask(self, items: Iterable[str]) -> int:
+        """
+        Converts a collection of item names into a bitmask
+
+        Items unknown to the table are ignored as they can't be
+        referenced by any cost stored within the table
+        """
+        item_mask = 0
+        for item in items:
+            item_index = self.index.get(item)
+            if item_index is not None:
+                item_mask |= 1 << item_index
+        return item_mask
+
+    def names(self, item_mask: int) -> FrozenSet[str]:
+        """
+        Converts a bitmask back into the collection of item names
+        """
+        item_names = []
+        item_index = 0
+        while item_mask:
+            if item_mask & 1:
+                item_names.append(self.items[item_index])
+            item_mask >>= 1
+            item_index += 1
+        return frozenset(item_names)
+
+
+class TileTable:
+    """
+    Dense lookup table of the "tiles" configuration field
+
+    All attributes are indexed directly by the integer tile value
+    > defined <np.ndarray[bool]>
+        > Whether the tile value exists within the configuration
+    > walkable <np.ndarray[bool]>
+        > WALKABLE property of the tile
+    > base_cost <tuple>
+        > BASE_COST property of the tile compiled into a frozenset, or a
+          CostExpression when it holds alternatives
+    > base_cost_mask <tuple>
+        > Every item referenced by the BASE_COST as an ItemTable bitmask
+    > base_cost_masks <tuple>
+        > BASE_COST clauses of the tile as ItemTable bitmasks, the cost is
+          met when any clause mask is covered
+    > properties <tuple>
+        > Normalized tile properties dictionary passed to the TileNode
+    """
+
+    def __init__(self, tile_data: dict, item_table: ItemTable = None):
+        if item_table is None:
+            item_table = ItemTable()
+        self.item_table = item_table
+
+        errors = []
+        parsed_tiles = {}
+        if not isinstance(tile_data, dict) or not tile_data:
+            errors.append("Field <tiles> must be a non-empty mapping")
+            tile_data = {}
+
+        for tile_key, tile_properties in tile_data.items():
+            try:
+                tile_value = int(tile_key)
+            except (TypeError, ValueError):
+                errors.append(f"Tile id {tile_key!r} is not an integer")
+                continue
+            if tile_value < 0:
+                errors.append(f"Tile id {tile_key!r} is negative")
+                continue
+            tile_errors = self._validate_tile(tile_key, tile_properties)
+            if tile_errors:
+                errors.extend(tile_errors)
+                continue
+            parsed_tiles[tile_value] = tile_properties
+
+        if errors:
+            raise ConfigurationError(errors)
+
+        self.size = max(parsed_tiles) + 1
+        self.defined = np.zeros(self.size, dtype=bool)
+        self.walkable = np.zeros(self.size, dtype=bool)
+        base_cost = [frozenset()] * self.size
+        base_cost_mask = [0] * self.size
+        base_cost_masks = [(0,)] * self.size
+        properties = [None] * self.size
+        for tile_value, tile_properties in parsed_tiles.items():
+            tile_base_cost = compile_cost(tile_properties["BASE_COST"])
+            self.defined[tile_value] = True
+            self.walkable[tile_value] = tile_properties["WALKABLE"]
+            base_cost[tile_value] = tile_base_cost
+            base_cost_masks[tile_value] = cost_masks(
+                tile_base_cost, item_table
+            )
+            for item in tile_base_cost:
+                base_cost_mask[tile_value] |= 1 << item_table.intern(item)
+            properties[tile_value] = {
+                "TYPE": tile_properties["TYPE"],
+                "SYMBOL": tile_properties["SYMBOL"],
+                "BASE_COST": tile_base_cost,
+                "WALKABLE": tile_properties["WALKABLE"],
+                "COLOR": tile_properties["COLOR"],
+            }
+        self.defined.setflags(write=False)
+        self.walkable.setflags(write=False)
+        self.base_cost = tuple(base_cost)
+        self.base_cost_mask = tuple(base_cost_mask)
+        self.base_cost_masks = tuple(base_cost_masks)
+        self.properties = tuple(properties)
+
+    def __str__(self) -> str:
+        return f"TileTable Instance [{int(self.defined.sum())}] {id(self)}"
+
+    @property
+    def content_hash(self) -> str:
+        """
+        Hexadecimal sha256 of the normalized tile properties, independent
+        of the order the tiles were configured in
+        """
+        tile_entries = [
+            [
+                tile_value,
+                tile_properties["TYPE"],
+                tile_properties["SYMBOL"],
+                canonical_cost(tile_properties["BASE_COST"]),
+                tile_properties["WALKABLE"],
+                tile_properties["COLOR"],
+            ]
+            for tile_value, tile_properties in enumerate(self.properties)
+            if tile_properties is not None
+        ]
+        return hashlib.sha256(
+            json.dumps(tile_entries, separators=(",", ":")).encode("utf-8")
+        ).hexdigest()
+
+    def __getitem__(self, tile_value: int) -> dict:
+        """
+        Returns the normalized tile properties for the tile value
+        """
+        if 0 <= tile_value < self.size and self.defined[tile_value]:
+            return self.properties[tile_value]
+        raise ConfigurationError([f"Tile id {tile_value} is not defined"])
+
+    @classmethod
+    def _validate_tile(cls, tile_key: str, tile_properties: dict) -> List[str]:
+        """
+        Checks the tile properties contain every field of TILE_FIELDS with
+        the expected type
+        """
+        if not isinstance(tile_properties, dict):
+            return [f"Tile {tile_key!r} properties must be a mapping"]
+
+        errors = []
+        for field_name, field_type in TILE_FIELDS.items():
+            if field_name not in tile_properties:
+                errors.append(f"Tile {tile_key!r} is missing {field_name}")
+            elif not isinstance(tile_properties[field_name], field_type):
+                type_names = " or ".join(
+                    type_option.__name__
+                    for type_option in (
+                        field_type
+                        if isinstance(field_type, tuple)
+                        else (field_type,)
+                    )
+                )
+                errors.append(
+                    f"Tile {tile_key!r} field {field_name} must be of "
+                    f"type {type_names}"
+                )
+        base_cost = tile_properties.get("BASE_COST", [])
+        if isinstance(base_cost, list) and not all(
+            isinstance(item, str) for item in base_cost
+        ):
+            errors.append(f"Tile {tile_key!r} BASE_COST must contain strings")
+        elif isinstance(base_cost, (list, str)):
+            try:
+                compile_cost(base_cost)
+            except ValueError as cost_err:
+                errors.append(f"Tile {tile_key!r} BASE_COST: {cost_err}")
+        return errors
+
+    def validate_map(self, map_data: np.ndarray) -> None:
+        """
+        Checks every tile value stored within the map data has an
+        entry within the table
+        """
+        if map_data.ndim != 2:
+            raise ConfigurationError(
+                [f"Map data must be 2D, found shape {map_data.shape}"]
+            )
+        tile_values = np.unique(map_data)
+        in_range = (tile_values >= 0) & (tile_values < self.size)
+        missing = tile_values[~in_range].tolist()
+        missing.extend(
+            tile_value
+            for tile_value in tile_values[in_range].tolist()
+            if not self.defined[tile_value]
+        )
+        if missing:
+            raise ConfigurationError(
+                [f"Map data references undefined tile ids {sorted(missing)}"]
+            )
+
+
+class CompiledConfiguration:
+    """
+    Fully parsed and validated configuration
+    > tiles <TileTable>
+        > Dense lookup table for the "tiles" field
+    > locations <tuple>
+        > Normalized "locations" entries using tuples for the coordinates
+          and frozensets for the item collections, the costs holding
+          alternatives are compiled into a CostExpression
+    > item_table <ItemTable>
+        > Every item referenced by the tiles and the locations
+    > reward_sources <dict>
+        > Maps each rewarded item name (without its count) to the
+          entrances of the locations providing the reward
+    > unresolved_items <frozenset>
+        > Location cost items that no location rewards
+    """
+
+    def __init__(self, config_data: dict):
+        if not isinstance(config_data, dict):
+            raise ConfigurationError(["Configuration must be a mapping"])
+
+        self.item_table = ItemTable()
+        errors = []
+        try:
+            self.tiles = TileTable(config_data.get("tiles"), self.item_table)
+        except ConfigurationError as tile_err:
+            errors.extend(tile_err.errors)
+
+        location_data = config_data.get("locations", [])
+        if not isinstance(location_data, list):
+            errors.append("Field <locations> must be a list")
+            location_data = []
+
+        locations = []
+        reward_sources = {}
+        seen_entrances = set()
+        for location_index, location_entry in enumerate(location_data):
+            location_errors = self._validate_location(
+                location_index, location_entry
+            )
+            if location_errors:
+                errors.extend(location_errors)
+                continue
+
+            location = self._normalize_location(location_entry)
+            entrance = location["entrance"]
+            if entrance in seen_entrances:
+                errors.append(
+                    f"Location #{location_index} duplicates entrance "
+                    f"{entrance}"
+                )
+                continue
+            seen_entrances.add(entrance)
+            locations.append(location)
+            for item in location["reward"]:
+                reward_sources.setdefault(item_name(item), []).append(
+                    entrance
+                )
+
+        if errors:
+            raise ConfigurationError(errors)
+
+        unrewarded_base_costs = set()
+        for tile_base_cost in self.tiles.base_cost:
+            unrewarded_base_costs.update(
+                {item_name(item) for item in tile_base_cost}
+                - reward_sources.keys()
+            )
+        if unrewarded_base_costs:
+            raise ConfigurationError(
+                [
+                    f"BASE_COST item {item!r} isn't rewarded by any location"
+                    for item in sorted(unrewarded_base_costs)
+                ]
+            )
+
+        unresolved_items = set()
+        for location in locations:
+            location_costs = (
+                location["traversal_cost"] | location["reward_cost"]
+            )
+            unresolved_items.update(
+                {item_name(item) for item in location_costs}
+                - reward_sources.keys()
+            )
+        if unresolved_items:
+            logger.warning(
+                f"Cost items {sorted(unresolved_items)} aren't rewarded "
+                "by any location"
+            )
+
+        self.locations = tuple(locations)
+        self.reward_sources = {
+            item: tuple(sources) for item, sources in reward_sources.items()
+        }
+        self.unresolved_items = frozenset(unresolved_items)
+
+    def __str__(self) -> str:
+        return (
+            f"CompiledConfiguration Instance "
+            f"[{len(self.locations)} locations] {id(self)}"
+        )
+
+    def validate_map(self, map_data: np.ndarray) -> None:
+        """
+        Checks the map data only uses defined tile ids and every location
+        entrance / exit lies within the bounds of the map
+        """
+        self.tiles.validate_map(map_data)
+        map_size_x, map_size_y = map_data.shape
+        errors = []
+        for location in self.locations:
+            for field_name in LOCATION_COORDINATE_FIELDS:
+                coord_x, coord_y = location[field_name]
+                if not (
+                    0 <= coord_x < map_size_x and 0 <= coord_y < map_size_y
+                ):
+                    errors.append(
+                        f"Location {location['entrance']} {field_name} "
+                        f"{location[field_name]} lies outside the map "
+                        f"{map_data.shape}"
+                    )
+        if errors:
+            raise ConfigurationError(errors)
+
+    def _normalize_location(self, location_entry: dict) -> dict:
+        """
+        Converts a validated location entry into the normalized form,
+        interning every item name within the ItemTable
+        """
+        location = {
+            "description": location_entry.get("description", ""),
+            "entrance": tuple(location_entry["entrance"]),
+            "exit": tuple(location_entry["exit"]),
+        }
+        for field_name in LOCATION_ITEM_FIELDS:
+            if field_name in LOCATION_COST_FIELDS:
+                location[field_name] = compile_cost(location_entry[field_name])
+                for item in location[field_name]:
+                    self.item_table.intern(item)
+                continue
+            location[field_name] = frozenset(
+                self.item_table.items[self.item_table.intern(item)]
+                for item in normalize_items(location_entry[field_name])
+            )
+        if "consume" in location_entry:
+            location["consume"] = normalize_items(location_entry["consume"])
+        return location
+
+    @classmethod
+    def _validate_location(
+        cls, location_index: int, location_entry: dict
+    ) -> List[str]:
+        """
+        Checks the location entry matches the schema described
+        within the README
+        """
+        if not isinstance(location_entry, dict):
+            return [f"Location #{location_index} must be a mapping"]
+
+        errors = []
+        description = location_entry.get("description", "")
+        if not isinstance(description, str):
+            errors.append(
+                f"Location #{location_index} description must be str"
+            )
+
+        for field_name in LOCATION_COORDINATE_FIELDS:
+            coordinate = location_entry.get(field_name)
+            if not (
+                isinstance(coordinate, (list, tuple))
+                and len(coordinate) == 2
+                and all(
+                    isinstance(value, int) and not isinstance(value, bool)
+                    for value in coordinate
+                )
+            ):
+                errors.append(
+                    f"Location #{location_index} {field_name} must be a "
+                    f"pair of integers, found {coordinate!r}"
+                )
+
+        for field_name in LOCATION_ITEM_FIELDS:
+            items = location_entry.get(field_name)
+            if field_name in LOCATION_COST_FIELDS and isinstance(items, str):
+                items = [items]
+            if not (
+                isinstance(items, (list, tuple, set, frozenset))
+                and all(isinstance(item, str) for item in items)
+            ):
+                errors.append(
+                    f"Location #{location_index} {field_name} must be a "
+                    f"collection of strings, found {items!r}"
+                )
+            else:
+                errors.extend(
+                    cls._validate_items(location_index, field_name, items)
+                )
+
+        consumed_items = location_entry.get("consume", [])
+        if not (
+            isinstance(consumed_items, (list, tuple, set, frozenset))
+            and all(isinstance(item, str) for item in consumed_items)
+        ):
+            errors.append(
+                f"Location #{location_index} consume must be a collection "
+                f"of strings, found {consumed_items!r}"
+            )
+        else:
+            errors.extend(
+                cls._validate_items(location_index, "consume", consumed_items)
+            )
+        return errors
+
+    @classmethod
+    def _validate_items(
+        cls, location_index: int, field_name: str, items: Iterable[str]
+    ) -> List[str]:
+        """
+        Checks the costs compile and the item counts are valid
+        """
+        try:
+            if field_name in LOCATION_COST_FIELDS:
+                compile_cost(items)
+            else:
+                normalize_items(items)
+        except ValueError as item_err:
+            return [f"Location #{location_index} {field_name}: {item_err}"]
+        return []
+
+
+def compile_configuration(config_data: dict) -> CompiledConfiguration:
+    """
+    Compiles an already parsed json configuration
+    """
+    return CompiledConfiguration(config_data)
+
+
+def load_compiled_configuration(
+    config_path: Union[str, Path]
+) -> CompiledConfiguration:
+    """
+    Loads and compiles the configuration file
+
+    The file is read in a single pass with the raw bytes used for both
+    the content hash and the json parsing. Compiled configurations are
+    cached by the hash so repeated loads of unchanged files skip parsing
+    """
+    with open(config_path, "rb") as config_handle:
+        config_bytes = config_handle.read()
+    config_hash = hashlib.sha256(config_bytes).hexdigest()
+
+    compiled = _CONFIGURATION_CACHE.get(config_hash)
+    if compiled is not None:
+        _CONFIGURATION_CACHE.move_to_end(config_hash)
+        logger.debug(f"Configuration cache hit for {config_path}")
+        return compiled
+
+    try:
+        config_data = json.loads(config_bytes)
+    except json.JSONDecodeError as json_decode_err:
+        raise ConfigurationError(
+            [f"Unable to parse {config_path}: {json_decode_err}"]
+        ) from json_decode_err
+
+    compiled = compile_configuration(config_data)
+    _CONFIGURATION_CACHE[config_hash] = compiled
+    if len(_CONFIGURATION_CACHE) > CONFIGURATION_CACHE_SIZE:
+        _CONFIGURATION_CACHE.popitem(last=False)
+    return compiled
+
+
+def clear_configuration_cache() -> None:
+    """
+    Drops every cached compiled configuration
+    """
+    _CONFIGURATION_CACHE.clear()
@@ -0,0 +1,424 @@
+"""
+Boolean cost expressions for the traversal_cost, reward_cost and
+BASE_COST fields
+
+The list form of a cost remains an AND of every item. Any string within
+the cost (or the cost itself given as a string) is parsed as a boolean
+expression over item names
+> "Hammer OR Fairy"
+> "(Boots AND Raft) OR Flute"
+> ["Candle", "Hammer | Fairy"] -> Candle AND (Hammer OR Fairy)
+
+AND binds tighter than OR, the operators are case insensitive and "&" /
+"|" are accepted in their place. Item names used within an expression
+can't hold whitespace, parentheses, "&" or "|"
+
+Expressions are compiled once into disjunctive normal form, a tuple of
+AND-clauses with every clause implied by another clause removed
+> Costs with a single clause stay plain frozensets, so configurations
+  without alternatives behave exactly as before
+> Costs with several clauses become a CostExpression, a frozenset of
+  every item the expression references (so collecting the items of a
+  cost is unchanged) whose issubset / <= / | operators follow the
+  expression instead of the item set. The other comparisons and the
+  difference / intersection operators have no meaning over alternatives
+  and raise TypeError, missing_items gives the items an inventory lacks
+
+Against an ItemTable bitmask inventory a cost reduces to one mask per
+clause, see cost_masks
+
+Item names may carry a count, "SmallKey*2" requiring at least two
+SmallKey (or rewarding two of them). Counts of one are dropped so
+"SmallKey*1" and "SmallKey" are the same item, see split_count
+"""
+
+import re
+import sys
+from typing import Iterable, List, Optional, Tuple, Union
+
+from .tiletrace import tracer
+
+
+Clauses = Tuple[frozenset, ...]
+CostValue = Union[str, Iterable[str], None]
+
+COST_TOKEN_PATTERN = re.compile(r"\s*(\(|\)|&|\||[^\s()&|]+)")
+COUNT_SEPARATOR = "*"
+AND_TOKENS = ("AND", "&")
+OR_TOKENS = ("OR", "|")
+
+# Upper bound on the clauses of a compiled cost, as expanding an AND of
+# alternatives into disjunctive normal form multiplies the clause counts
+MAX_COST_CLAUSES = 256
+
+
+def split_count(item: str) -> Tuple[str, int]:
+    """
+    Splits a counted item "Name*N" into its name and count, items
+    without a count have a count of one
+
+    Raises ValueError for counts below one
+    """
+    name, separator, count = item.rpartition(COUNT_SEPARATOR)
+    if not (separator and name and count.isdigit()):
+        return item, 1
+    if int(count) < 1:
+        raise ValueError(f"Item {item!r} must count at least one")
+    return name, int(count)
+
+
+def item_name(item: str) -> str:
+    """
+    Name of the item without its count
+    """
+    return split_count(item)[0]
+
+
+def count_token(name: str, count: int) -> str:
+    """
+    Counted item string of the name, the bare name for a count of one
+    """
+    if count == 1:
+        return sys.intern(name)
+    return sys.intern(f"{name}{COUNT_SEPARATOR}{count}")
+
+
+def normalize_items(items: Iterable[str]) -> frozenset:
+    """
+    Sums the counts of every item name within a reward or consume
+    collection, so ["SmallKey", "SmallKey"] becomes {"SmallKey*2"}
+    """
+    item_counts = {}
+    for item in items:
+        name, count = split_count(item)
+        item_counts[name] = item_counts.get(name, 0) + count
+    return frozenset(
+        count_token(name, count) for name, count in item_counts.items()
+    )
+
+
+def minimize_clauses(clauses: Iterable[frozenset]) -> Clauses:
+    """
+    Removes duplicate clauses and every clause that is a superset of
+    another clause, ordering the rest by size then item names
+    """
+    minimal_clauses = []
+    for clause in sorted(set(clauses), key=lambda clause: len(clause)):
+        if not any(kept.issubset(clause) for kept in minimal_clauses):
+            minimal_clauses.append(clause)
+    return tuple(
+        sorted(
+            minimal_clauses, key=lambda clause: (len(clause), sorted(clause))
+        )
+    )
+
+
+def and_clauses(first_clauses: Clauses, second_clauses: Clauses) -> Clauses:
+    """
+    Clauses of the conjunction of two disjunctive normal forms
+    """
+    combined_clauses = minimize_clauses(
+        first_clause | second_clause
+        for first_clause in first_clauses
+        for second_clause in second_clauses
+    )
+    if len(combined_clauses) > MAX_COST_CLAUSES:
+        raise ValueError(
+            f"Cost expands to {len(combined_clauses)} alternatives, "
+            f"more than the limit of {MAX_COST_CLAUSES}"
+        )
+    return combined_clauses
+
+
+def _unsupported(operation: str):
+    """
+    CostExpression method raising TypeError for a set operation the
+    alternatives of an expression give no meaning to
+    """
+
+    def unsupported_operation(self, *others):
+        raise TypeError(
+            f"{operation} isn't supported by {self!r}, compare the "
+            "clauses (cost_clauses) or use missing_items instead"
+        )
+
+    unsupported_operation.__name__ = operation
+    return unsupported_operation
+
+
+class CostExpression(frozenset):
+    """
+    Cost holding alternatives, stored as a frozenset of every referenced
+    item along with the clauses of its disjunctive normal form
+    > clauses <Tuple[frozenset, ...]>
+        > Minimal AND-clauses, the cost is met when any clause is a
+          subset of the inventory
+    """
+
+    __slots__ = ("clauses",)
+
+    def __new__(cls, clauses: Iterable[Iterable[str]]):
+        clauses = minimize_clauses(frozenset(clause) for clause in clauses)
+        cost_expression = super().__new__(cls, frozenset().union(*clauses))
+        cost_expression.clauses = clauses
+        return cost_expression
+
+    def __reduce__(self):
+        return (CostExpression, (self.clauses,))
+
+    def __repr__(self) -> str:
+        return f"CostExpression({format_cost(self)!r})"
+
+    def __str__(self) -> str:
+        return format_cost(self)
+
+    def __hash__(self) -> int:
+        return hash(frozenset(self.clauses))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CostExpression):
+            return frozenset(self.clauses) == frozenset(other.clauses)
+        if isinstance(other, (set, frozenset)):
+            return False
+        return NotImplemented
+
+    def __ne__(self, other) -> bool:
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def issubset(self, item_inventory: Iterable[str]) -> bool:
+        """
+        Checks whether the inventory meets the cost
+        """
+        if tracer.enabled:
+            tracer.count("tilecost.evaluate")
+        if not isinstance(item_inventory, (set, frozenset)):
+            item_inventory = frozenset(item_inventory)
+        return any(
+            clause.issubset(item_inventory) for clause in self.clauses
+        )
+
+    __le__ = issubset
+
+    def union(self, *costs: Iterable[str]) -> frozenset:
+        """
+        Conjunction of the cost with the other costs, as combining two
+        costs requires both of them to be met
+        """
+        return conjunction(self, *costs)
+
+    def __or__(self, other):
+        if not isinstance(other, (set, frozenset)):
+            return NotImplemented
+        return conjunction(self, other)
+
+    __ror__ = __or__
+
+    # Inherited operators would answer over the referenced items. A plain
+    # set on the left of the operator keeps its own set semantics since
+    # Python doesn't defer to a frozenset subclass over a set
+    issuperset = __ge__ = _unsupported("issuperset")
+    __lt__ = _unsupported("__lt__")
+    __gt__ = _unsupported("__gt__")
+    difference = __sub__ = __rsub__ = _unsupported("difference")
+    intersection = __and__ = __rand__ = _unsupported("intersection")
+    symmetric_difference = __xor__ = __rxor__ = _unsupported(
+        "symmetric_difference"
+    )
+
+
+def cost_clauses(cost: Iterable[str]) -> Clauses:
+    """
+    Clauses of the disjunctive normal form of a compiled cost
+    """
+    if isinstance(cost, CostExpression):
+        return cost.clauses
+    return (frozenset(cost),)
+
+
+def missing_items(
+    cost: Iterable[str], item_inventory: Iterable[str]
+) -> frozenset:
+    """
+    Items the inventory lacks for the clause of the cost closest to
+    being met, an empty frozenset once the cost is met
+    """
+    if not isinstance(item_inventory, (set, frozenset)):
+        item_inventory = frozenset(item_inventory)
+    return min(
+        (clause - item_inventory for clause in cost_clauses(cost)),
+        key=lambda missing: (len(missing), sorted(missing)),
+    )
+
+
+def from_clauses(clauses: Clauses) -> frozenset:
+    """
+    Returns the plain frozenset for a single clause, otherwise the
+    CostExpression holding the clauses
+    """
+    if len(clauses) == 1:
+        return clauses[0]
+    return CostExpression(clauses)
+
+
+def conjunction(*costs: Iterable[str]) -> frozenset:
+    """
+    Compiled cost met only when every cost is met
+    """
+    clauses = (frozenset(),)
+    for cost in costs:
+        if isinstance(cost, CostExpression):
+            clauses = and_clauses(clauses, cost.clauses)
+        else:
+            clauses = tuple(clause | frozenset(cost) for clause in clauses)
+    return from_clauses(clauses)
+
+
+def _tokenize(expression: str) -> List[str]:
+    """
+    Splits the expression into parentheses, operators and item names
+    """
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        token_match = COST_TOKEN_PATTERN.match(expression, position)
+        tokens.append(token_match.group(1))
+        position = token_match.end()
+    return tokens
+
+
+def parse_cost(expression: str) -> Clauses:
+    """
+    Parses a boolean cost expression into its minimal AND-clauses
+
+    Raises ValueError describing the first syntax error found
+    """
+    tokens = _tokenize(expression)
+    position = 0
+
+    def peek() -> Optional[str]:
+        return tokens[position] if position < len(tokens) else None
+
+    def parse_or() -> Clauses:
+        nonlocal position
+        clauses = parse_and()
+        while peek() is not None and peek().upper() in OR_TOKENS:
+            position += 1
+            clauses = minimize_clauses(clauses + parse_and())
+        return clauses
+
+    def parse_and() -> Clauses:
+        nonlocal position
+        clauses = parse_operand()
+        while peek() is not None and peek().upper() in AND_TOKENS:
+            position += 1
+            clauses = and_clauses(clauses, parse_operand())
+        return clauses
+
+    def parse_operand() -> Clauses:
+        nonlocal position
+        token = peek()
+        if token is None:
+            raise ValueError(f"Cost {expression!r} ends unexpectedly")
+        position += 1
+        if token == "(":
+            clauses = parse_or()
+            if peek() != ")":
+                raise ValueError(f"Cost {expression!r} is missing a ')'")
+            position += 1
+            return clauses
+        if token == ")" or token.upper() in AND_TOKENS + OR_TOKENS:
+            raise ValueError(
+                f"Unexpected {token!r} within cost {expression!r}"
+            )
+        return (frozenset([count_token(*split_count(token))]),)
+
+    if not tokens:
+        return (frozenset(),)
+    clauses = parse_or()
+    if peek() is not None:
+        raise ValueError(f"Unexpected {peek()!r} within cost {expression!r}")
+    return clauses
+
+
+def compile_cost(cost: CostValue) -> frozenset:
+    """
+    Compiles a configured cost into a plain frozenset or CostExpression
+
+    Lists, tuples and sets are an AND of their entries, where any entry
+    holding an operator or a parenthesis is parsed as an expression.
+    Frozensets and CostExpressions are already compiled and returned
+    unchanged
+    """
+    if cost is None:
+        return frozenset()
+    if isinstance(cost, frozenset):
+        return cost
+    if isinstance(cost, str):
+        return from_clauses(parse_cost(cost))
+
+    clauses = (frozenset(),)
+    for item in cost:
+        if _is_expression(item):
+            clauses = and_clauses(clauses, parse_cost(item))
+        else:
+            item = count_token(*split_count(item))
+            clauses = tuple(clause | frozenset([item]) for clause in clauses)
+    return from_clauses(clauses)
+
+
+def _is_expression(item: str) -> bool:
+    """
+    Checks whether a cost entry holds an operator or a parenthesis,
+    entries without one are item names even when they hold spaces
+    """
+    return any(
+        token in "()" or token.upper() in AND_TOKENS + OR_TOKENS
+        for token in _tokenize(item)
+    )
+
+
+def format_cost(cost: Iterable[str]) -> str:
+    """
+    Canonical expression string of a compiled cost
+    """
+    clause_strings = [
+        " AND ".join(sorted(clause)) for clause in cost_clauses(cost)
+    ]
+    if len(clause_strings) == 1:
+        return clause_strings[0]
+    return " OR ".join(
+        f"({clause_string})" if " AND " in clause_string else clause_string
+        for clause_string in clause_strings
+    )
+
+
+def canonical_cost(cost: Iterable[str]) -> Union[str, List[str]]:
+    """
+    JSON serializable canonical form of a compiled cost, the sorted item
+    list for plain costs and the format_cost string for expressions
+    """
+    if isinstance(cost, CostExpression):
+        return format_cost(cost)
+    return sorted(cost)
+
+
+def cost_masks(cost: Iterable[str], item_table) -> Tuple[int, ...]:
+    """
+    Converts every clause of the cost into an ItemTable bitmask, the
+    cost is met by an inventory mask covering any of the clause masks
+    """
+    return tuple(
+        sum(1 << item_table.intern(item) for item in clause)
+        for clause in cost_clauses(cost)
+    )
+
+
+def masks_met(clause_masks: Tuple[int, ...], inventory_mask: int) -> bool:
+    """
+    Checks the inventory mask covers any of the clause masks
+    """
+    return any(
+        clause_mask & ~inventory_mask == 0 for clause_mask in clause_masks
+    )
@@ -0,0 +1,344 @@
+"""
+Batch item criticality: what the progression loses without each item
+
+Removing an item means no location rewards it. Rather than running a
+TileGraph per item, every item resumes the progression of one shared
+TileGraph run
+> Up to the chunk collecting the item the progression is unchanged, so
+  the search restarts from the chunk just before it, with the locations
+  completed and the counts held at that point (count_order)
+> From there the chunks are repeated until a fixed point, dropping the
+  item from every reward. Each chunk is a label lookup within the cached
+  component labels of a shared ReachabilityQuery, and the inventories of
+  different items mostly coincide so the labellings are reused
+> The baseline is the same search without removing anything, resumed
+  from the last chunk of the TileGraph so it covers every location
+  rather than stopping at graph_end
+
+The impact of an item compares its fixed point against the baseline:
+the locations and walkable tiles no longer reachable and whether
+graph_end is still completed. With jobs above one the items are split
+across a process pool, every worker building its own ReachabilityQuery
+once
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+from loguru import logger
+import numpy as np
+
+from .tilegraph import TileGraph
+from .tileinventory import ItemInventory
+from .tilekernels import KernelBackend
+from .tilelocations import LocationMap
+from .tilemap import TileMap
+from .tilequery import ReachabilityQuery
+from .tilesearch import PartialTileMap
+from .tiletrace import tracer
+
+
+Coord = Tuple[int, int]
+
+# ClosureSearch of the worker processes, set by _initialize_worker
+_WORKER_SEARCH = None
+
+
+class ItemImpact:
+    """
+    Consequences of removing an item from the map
+    > item <str>
+        > Name of the removed item
+    > lost_locations <FrozenSet[Tuple[int, int]]>
+        > Baseline locations no longer completed
+    > lost_tiles <int>
+        > Number of baseline reachable tiles no longer reachable
+    > goal_reachable <bool>
+        > Whether graph_end is still completed
+    > resume_chunk <int>
+        > TileGraph chunk the search resumed from
+    """
+
+    def __init__(
+        self,
+        item: str,
+        lost_locations: FrozenSet[Coord],
+        lost_tiles: int,
+        goal_reachable: bool,
+        resume_chunk: int,
+    ):
+        self.item = item
+        self.lost_locations = lost_locations
+        self.lost_tiles = lost_tiles
+        self.goal_reachable = goal_reachable
+        self.resume_chunk = resume_chunk
+
+    def __str__(self) -> str:
+        return (
+            f"ItemImpact Instance [{self.item}] "
+            f"[{len(self.lost_locations)} lost locations] {id(self)}"
+        )
+
+    @property
+    def critical(self) -> bool:
+        """
+        Whether removing the item stops graph_end from being completed
+        """
+        return not self.goal_reachable
+
+    def as_dict(self) -> dict:
+        """
+        JSON serializable form of the impact
+        """
+        return {
+            "item": self.item,
+            "lost_locations": sorted(map(list, self.lost_locations)),
+            "lost_tiles": self.lost_tiles,
+            "goal_reachable": self.goal_reachable,
+            "resume_chunk": self.resume_chunk,
+        }
+
+
+class ClosureSearch:
+    """
+    Repeats the TileGraph chunks from a chunk of a finished progression
+    until a fixed point, optionally without one of the items
+    > reachability <ReachabilityQuery>
+        > Shared component labels answering every chunk
+    > location_order, count_order <list>
+        > Progression of the TileGraph the searches resume from
+    """
+
+    def __init__(
+        self,
+        graph_start: Coord,
+        tile_map: TileMap,
+        location_map: LocationMap,
+        location_order: List[set],
+        count_order: List[Dict[str, int]],
+        reachability: Optional[ReachabilityQuery] = None,
+        backend: Union[str, KernelBackend, None] = None,
+    ):
+        self.graph_start = graph_start
+        self.tile_map = tile_map
+        self.location_map = location_map
+        self.location_order = location_order
+        self.count_order = count_order
+        if reachability is None:
+            reachability = ReachabilityQuery(
+                tile_map, location_map, cache_size=1024, backend=backend
+            )
+        self.reachability = reachability
+
+    def __str__(self) -> str:
+        return (
+            f"ClosureSearch Instance "
+            f"[{len(self.location_order)} chunks] {id(self)}"
+        )
+
+    def resume_chunk(self, removed_item: Optional[str] = None) -> int:
+        """
+        Last chunk of the progression whose inventory doesn't hold the
+        item yet, the final chunk when the item is never collected
+        """
+        final_chunk = len(self.count_order) - 1
+        if removed_item is None:
+            return final_chunk
+        for chunk_index, chunk_counts in enumerate(self.count_order):
+            if removed_item in chunk_counts:
+                return max(chunk_index - 1, 0)
+        return final_chunk
+
+    def closure(
+        self, removed_item: Optional[str] = None
+    ) -> Tuple[int, ItemInventory, FrozenSet[Coord]]:
+        """
+        Returns the resumed chunk along with the inventory and completed
+        locations of the fixed point reached without the item
+        """
+        chunk_index = self.resume_chunk(removed_item)
+        item_counts = ItemInventory(self.count_order[chunk_index])
+        completed_locations = set().union(
+            *self.location_order[:chunk_index]
+        )
+        collected_locations = set(completed_locations)
+        while True:
+            with tracer.phase("tilecritical.chunk"):
+                partial_tile_map = PartialTileMap(
+                    self.tile_map,
+                    self.graph_start,
+                    item_counts.tokens,
+                    reachability=self.reachability,
+                )
+                partial_tile_map.find_completed_locations(
+                    self.tile_map,
+                    self.location_map,
+                    completed_locations,
+                    item_counts,
+                    collected_locations=collected_locations,
+                )
+            chunk_counts = partial_tile_map.item_counts
+            if removed_item is not None:
+                chunk_counts.discard(removed_item)
+            if (
+                not partial_tile_map.completed_locations
+                and chunk_counts == item_counts
+            ):
+                break
+            completed_locations.update(partial_tile_map.completed_locations)
+            item_counts = chunk_counts
+        return chunk_index, item_counts, frozenset(completed_locations)
+
+    def reachable_tiles(self, item_counts: ItemInventory) -> np.ndarray:
+        """
+        Tiles reachable from graph_start with the inventory
+        """
+        return self.reachability.reachable_tiles(
+            self.graph_start, item_counts.tokens
+        )
+
+
+class ItemCriticality:
+    """
+    Impact of removing each item, computed from a single TileGraph
+    progression rather than a TileGraph run per item
+    > impacts <Dict[str, ItemImpact]>
+        > Item name -> ItemImpact, ordered by item name
+    > baseline_locations <FrozenSet[Tuple[int, int]]>
+        > Every location completed without removing any item
+    > baseline_tiles <np.ndarray[bool]>
+        > Tiles reachable without removing any item
+    """
+
+    def __init__(
+        self,
+        graph_start: Coord,
+        graph_end: Coord,
+        tile_map: TileMap,
+        location_map: LocationMap,
+        tile_graph=None,
+        items: Optional[Iterable[str]] = None,
+        reachability: Optional[ReachabilityQuery] = None,
+        jobs: int = 1,
+        backend: Union[str, KernelBackend, None] = None,
+    ):
+        self.graph_start = graph_start
+        self.graph_end = graph_end
+        if tile_graph is None:
+            tile_graph = TileGraph(
+                graph_start, graph_end, tile_map, location_map
+            )
+        items = sorted(
+            location_map.reward_index if items is None else set(items)
+        )
+        search_arguments = (
+            graph_start,
+            tile_map,
+            location_map,
+            tile_graph.location_order,
+            tile_graph.count_order,
+        )
+        closure_search = ClosureSearch(
+            *search_arguments, reachability=reachability, backend=backend
+        )
+
+        with tracer.phase("tilecritical.baseline"):
+            _, baseline_counts, baseline_locations = closure_search.closure()
+        self.baseline_locations = baseline_locations
+        self.baseline_tiles = closure_search.reachable_tiles(baseline_counts)
+
+        logger.info(
+            f"Analyzing the removal of {len(items)} items with {jobs} jobs"
+        )
+        if jobs > 1 and len(items) > 1:
+            with ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_initialize_worker,
+                initargs=(*search_arguments, backend),
+            ) as pool:
+                closures = list(
+                    pool.map(
+                        _worker_closure,
+                        items,
+                        chunksize=max(1, len(items) // (jobs * 4)),
+                    )
+                )
+        else:
+            closures = [
+                _removal_closure(closure_search, item) for item in items
+            ]
+
+        self.impacts = {}
+        for item, (resume_chunk, completed_locations, reachable_tiles) in zip(
+            items, closures
+        ):
+            self.impacts[item] = ItemImpact(
+                item,
+                baseline_locations - completed_locations,
+                int(np.count_nonzero(self.baseline_tiles & ~reachable_tiles)),
+                graph_end in completed_locations,
+                resume_chunk,
+            )
+
+    def __str__(self) -> str:
+        return (
+            f"ItemCriticality Instance [{len(self.impacts)} items] "
+            f"[{len(self.critical_items)} critical] {id(self)}"
+        )
+
+    @property
+    def critical_items(self) -> FrozenSet[str]:
+        """
+        Items without which graph_end can't be completed
+        """
+        return frozenset(
+            item for item, impact in self.impacts.items() if impact.critical
+        )
+
+    def ranked(self) -> List[ItemImpact]:
+        """
+        Impacts ordered from the most to the least disruptive removal,
+        critical items first then by lost locations and lost tiles
+        """
+        return sorted(
+            self.impacts.values(),
+            key=lambda impact: (
+                impact.goal_reachable,
+                -len(impact.lost_locations),
+                -impact.lost_tiles,
+                impact.item,
+            ),
+        )
+
+
+def _removal_closure(
+    closure_search: ClosureSearch, item: str
+) -> Tuple[int, FrozenSet[Coord], np.ndarray]:
+    """
+    Resumed chunk, completed locations and reachable tiles of the fixed
+    point reached without the item
+    """
+    resume_chunk, item_counts, completed_locations = closure_search.closure(
+        item
+    )
+    return (
+        resume_chunk,
+        completed_locations,
+        closure_search.reachable_tiles(item_counts),
+    )
+
+
+def _initialize_worker(*search_arguments) -> None:
+    """
+    Builds the ClosureSearch of a worker process once
+    """
+    global _WORKER_SEARCH  # pylint: disable=global-statement
+    *search_arguments, backend = search_arguments
+    _WORKER_SEARCH = ClosureSearch(*search_arguments, backend=backend)
+
+
+def _worker_closure(item: str) -> Tuple[int, FrozenSet[Coord], np.ndarray]:
+    """
+    Runs the removal closure of the item within a worker process
+    """
+    return _removal_closure(_WORKER_SEARCH, item)
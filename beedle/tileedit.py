@@ -0,0 +1,104 @@
+"""
+MapEditor:
+Incremental re-analysis of a TileMap while tiles and locations are
+edited
+
+Rebuilding the TileMap, TileGrid and component labels after every edit
+repeats work for the untouched parts of the map. The MapEditor keeps a
+single ReachabilityQuery alive across edits, so only the modified tiles
+are refreshed before the TileGraph progression is replayed on the
+patched component labels
+"""
+
+from typing import Mapping, Optional, Tuple
+
+from loguru import logger
+
+from .tilegraph import TileGraph
+from .tilelocations import LocationMap
+from .tilemap import TileMap
+from .tilequery import ReachabilityQuery
+
+
+Coord = Tuple[int, int]
+
+
+class MapEditor:
+    """
+    Applies edits to a TileMap and LocationMap and returns the
+    TileGraph of the edited map
+    > tile_map <TileMap>
+        > TileMap modified in place by the edits
+    > location_map <LocationMap>
+        > Current LocationMap, replaced by a new variant on every
+          location edit
+    > reachability <ReachabilityQuery>
+        > Shared query whose labels are patched after every edit
+    > tile_graph <TileGraph>
+        > TileGraph of the current state of the map
+    """
+
+    def __init__(
+        self,
+        graph_start: Coord,
+        graph_end: Coord,
+        tile_map: TileMap,
+        location_map: LocationMap,
+    ):
+        self.graph_start = graph_start
+        self.graph_end = graph_end
+        self.tile_map = tile_map
+        self.location_map = location_map
+        self.tile_map.pop_dirty_tiles()
+        self.reachability = ReachabilityQuery(tile_map, location_map)
+        self.tile_graph = self.__analyze()
+
+    def __str__(self) -> str:
+        return f"MapEditor Instance [{self.tile_map}] {id(self)}"
+
+    def __analyze(self) -> TileGraph:
+        """
+        Replays the TileGraph progression on the shared ReachabilityQuery
+        """
+        return TileGraph(
+            self.graph_start,
+            self.graph_end,
+            self.tile_map,
+            self.location_map,
+            reachability=self.reachability,
+        )
+
+    def set_tile(self, tile_coord: Coord, tile_value: int) -> TileGraph:
+        """
+        Replaces a single tile value and returns the updated TileGraph
+        """
+        return self.set_tiles({tile_coord: tile_value})
+
+    def set_tiles(self, tile_changes: Mapping[Coord, int]) -> TileGraph:
+        """
+        Replaces the tile values of several tiles at once and returns
+        the updated TileGraph
+        """
+        for tile_coord, tile_value in tile_changes.items():
+            self.tile_map.set_tile(tile_coord, tile_value)
+        logger.debug(f"{self} updated {len(tile_changes)} tiles")
+        self.reachability.refresh()
+        self.tile_graph = self.__analyze()
+        return self.tile_graph
+
+    def update_locations(
+        self, location_changes: Mapping[Coord, Optional[Mapping]]
+    ) -> TileGraph:
+        """
+        Applies the changes through LocationMap.with_changes and returns
+        the updated TileGraph
+        """
+        location_map = self.location_map.with_changes(location_changes)
+        self.tile_map.update_locations(
+            location_map, changed_locations=location_changes.keys()
+        )
+        self.location_map = location_map
+        logger.debug(f"{self} updated {len(location_changes)} locations")
+        self.reachability.refresh(location_map)
+        self.tile_graph = self.__analyze()
+        return self.tile_graph
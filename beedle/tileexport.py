@@ -0,0 +1,404 @@
+"""
+Exporting a TileGraph to array, tabular and graph formats
+
+The exporters read TileGraph.graph_data, bottlenecks and location_order
+directly and stream their rows rather than building an intermediate
+copy of the graph, so large configurations are written with a bounded
+amount of memory
+
+Nodes are numbered by their position within node_index, which sorts the
+location coordinates of the graph
+
+Node attributes
+> node_id, x, y
+> description
+    > Location description from the LocationMap
+> chunk
+    > Index of the TileGraph search chunk completing the location,
+      -1 when the location was never completed
+> topological_index
+    > Position within the topological_sort output when it's provided,
+      -1 otherwise
+> reward
+    > Items joined by ITEM_SEPARATOR
+> reward_cost, traversal_cost
+    > Cost expression written by format_cost, "Boots AND Raft" or
+      "Flute OR (Boots AND Raft)"
+> bottleneck_reward, bottleneck_cost
+    > Whether the location rewards / requires a bottleneck item
+
+Edge attributes
+> source, target
+    > node_id of the connected locations
+> kind
+    > "graph" for the edges of graph_data, "bottleneck" for the edges
+      from a bottleneck reward location to its cost locations
+
+Formats
+> NumPy (edge count, 2) arrays of node ids and scipy.sparse matrices
+> CSV node and edge tables
+> Parquet node and edge tables, requires pyarrow
+> GraphML
+"""
+
+import csv
+import itertools
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+from xml.sax.saxutils import escape
+
+from loguru import logger
+import numpy as np
+
+from .tilecost import format_cost
+from .tilegraph import TileGraph
+from .tilelocations import LocationMap
+
+
+Coord = Tuple[int, int]
+PathLike = Union[str, Path]
+
+ITEM_SEPARATOR = ";"
+GRAPH_EDGE = "graph"
+BOTTLENECK_EDGE = "bottleneck"
+
+NODE_COLUMNS = (
+    ("node_id", "int"),
+    ("x", "int"),
+    ("y", "int"),
+    ("description", "string"),
+    ("chunk", "int"),
+    ("topological_index", "int"),
+    ("reward", "string"),
+    ("reward_cost", "string"),
+    ("traversal_cost", "string"),
+    ("bottleneck_reward", "boolean"),
+    ("bottleneck_cost", "boolean"),
+)
+EDGE_COLUMNS = (
+    ("source", "int"),
+    ("target", "int"),
+    ("kind", "string"),
+)
+
+
+def iter_graph_edges(
+    tile_graph: TileGraph, include_bottlenecks: bool = True
+) -> Iterator[Tuple[Coord, Coord, str]]:
+    """
+    Yields the (source, target, kind) edges of the TileGraph
+    """
+    for node, connected_nodes in tile_graph.graph_data.items():
+        for connected_node in connected_nodes:
+            yield node, connected_node, GRAPH_EDGE
+    if include_bottlenecks:
+        for reward_location, cost_locations in tile_graph.bottlenecks.items():
+            if reward_location is None:
+                continue
+            for cost_location in cost_locations or ():
+                if cost_location is not None:
+                    yield reward_location, cost_location, BOTTLENECK_EDGE
+
+
+def node_index(
+    tile_graph: TileGraph, include_bottlenecks: bool = True
+) -> Dict[Coord, int]:
+    """
+    Maps every location of the TileGraph to its node_id
+    """
+    graph_nodes = set(tile_graph.graph_data)
+    for source, target, _ in iter_graph_edges(tile_graph, include_bottlenecks):
+        graph_nodes.add(source)
+        graph_nodes.add(target)
+    return {node: node_id for node_id, node in enumerate(sorted(graph_nodes))}
+
+
+def edge_array(
+    tile_graph: TileGraph,
+    nodes: Optional[Dict[Coord, int]] = None,
+    include_bottlenecks: bool = False,
+) -> np.ndarray:
+    """
+    Returns the (edge count, 2) int64 array of (source, target) node ids
+
+    The node ids are streamed straight into the array through np.fromiter
+    without materializing a list of edges
+    """
+    if nodes is None:
+        nodes = node_index(tile_graph, include_bottlenecks)
+    edge_count = sum(
+        1 for _ in iter_graph_edges(tile_graph, include_bottlenecks)
+    )
+    flat_ids = np.fromiter(
+        itertools.chain.from_iterable(
+            (nodes[source], nodes[target])
+            for source, target, _ in iter_graph_edges(
+                tile_graph, include_bottlenecks
+            )
+        ),
+        dtype=np.int64,
+        count=edge_count * 2,
+    )
+    return flat_ids.reshape(edge_count, 2)
+
+
+def node_coordinates(nodes: Dict[Coord, int]) -> np.ndarray:
+    """
+    Returns the (node count, 2) int64 array of node coordinates indexed
+    by node_id
+    """
+    coordinates = np.empty((len(nodes), 2), dtype=np.int64)
+    for node, node_id in nodes.items():
+        coordinates[node_id] = node
+    return coordinates
+
+
+def adjacency_matrix(
+    tile_graph: TileGraph,
+    nodes: Optional[Dict[Coord, int]] = None,
+    include_bottlenecks: bool = False,
+):
+    """
+    Returns the scipy.sparse CSR adjacency matrix indexed by node_id
+
+    Requires scipy
+    """
+    try:
+        # pylint: disable=import-outside-toplevel
+        from scipy import sparse
+    except ImportError as import_error:
+        raise ImportError(
+            "adjacency_matrix requires scipy, install beedle[scipy]"
+        ) from import_error
+
+    if nodes is None:
+        nodes = node_index(tile_graph, include_bottlenecks)
+    edges = edge_array(tile_graph, nodes, include_bottlenecks)
+    return sparse.csr_matrix(
+        (np.ones(len(edges), dtype=np.int8), (edges[:, 0], edges[:, 1])),
+        shape=(len(nodes), len(nodes)),
+    )
+
+
+def iter_node_rows(
+    tile_graph: TileGraph,
+    location_map: LocationMap,
+    nodes: Optional[Dict[Coord, int]] = None,
+    topological_order: Optional[Iterable[Tuple[int, Coord]]] = None,
+) -> Iterator[tuple]:
+    """
+    Yields one row per node following the NODE_COLUMNS order
+    """
+    if nodes is None:
+        nodes = node_index(tile_graph)
+    chunk_index = {
+        location: completion_index
+        for completion_index, completion_group in enumerate(
+            tile_graph.location_order
+        )
+        for location in completion_group
+    }
+    topological_index = {
+        location: order_index
+        for order_index, (_, location) in enumerate(topological_order or ())
+    }
+    bottleneck_rewards = set(tile_graph.bottlenecks)
+    bottleneck_costs = set()
+    for cost_locations in tile_graph.bottlenecks.values():
+        bottleneck_costs.update(cost_locations or ())
+
+    for node, node_id in sorted(nodes.items(), key=lambda item: item[1]):
+        location = location_map[node]
+        yield (
+            node_id,
+            node[0],
+            node[1],
+            location.get("description", ""),
+            chunk_index.get(node, -1),
+            topological_index.get(node, -1),
+            ITEM_SEPARATOR.join(sorted(location.get("reward", ()))),
+            format_cost(location.get("reward_cost", ())),
+            format_cost(location.get("traversal_cost", ())),
+            node in bottleneck_rewards,
+            node in bottleneck_costs,
+        )
+
+
+def iter_edge_rows(
+    tile_graph: TileGraph,
+    nodes: Optional[Dict[Coord, int]] = None,
+    include_bottlenecks: bool = True,
+) -> Iterator[tuple]:
+    """
+    Yields one row per edge following the EDGE_COLUMNS order
+    """
+    if nodes is None:
+        nodes = node_index(tile_graph, include_bottlenecks)
+    for source, target, kind in iter_graph_edges(
+        tile_graph, include_bottlenecks
+    ):
+        yield nodes[source], nodes[target], kind
+
+
+def write_csv(
+    tile_graph: TileGraph,
+    location_map: LocationMap,
+    node_path: PathLike,
+    edge_path: PathLike,
+    topological_order: Optional[Iterable[Tuple[int, Coord]]] = None,
+) -> Tuple[Path, Path]:
+    """
+    Writes the node and edge tables as CSV files
+    """
+    nodes = node_index(tile_graph)
+    tables = (
+        (
+            Path(node_path),
+            NODE_COLUMNS,
+            iter_node_rows(tile_graph, location_map, nodes, topological_order),
+        ),
+        (Path(edge_path), EDGE_COLUMNS, iter_edge_rows(tile_graph, nodes)),
+    )
+    for table_path, columns, rows in tables:
+        with open(table_path, "w", encoding="utf-8", newline="") as table:
+            table_writer = csv.writer(table)
+            table_writer.writerow([column for column, _ in columns])
+            table_writer.writerows(rows)
+        logger.debug(f"Wrote {table_path}")
+    return tables[0][0], tables[1][0]
+
+
+def write_parquet(
+    tile_graph: TileGraph,
+    location_map: LocationMap,
+    node_path: PathLike,
+    edge_path: PathLike,
+    topological_order: Optional[Iterable[Tuple[int, Coord]]] = None,
+    batch_size: int = 65536,
+) -> Tuple[Path, Path]:
+    """
+    Writes the node and edge tables as Parquet files, one record batch
+    of at most batch_size rows at a time
+
+    Requires pyarrow
+    """
+    try:
+        # pylint: disable=import-outside-toplevel
+        import pyarrow as pa
+        from pyarrow import parquet as pq
+    except ImportError as import_error:
+        raise ImportError(
+            "write_parquet requires pyarrow, install beedle[parquet]"
+        ) from import_error
+
+    arrow_types = {
+        "int": pa.int64(),
+        "string": pa.string(),
+        "boolean": pa.bool_(),
+    }
+    nodes = node_index(tile_graph)
+    tables = (
+        (
+            Path(node_path),
+            NODE_COLUMNS,
+            iter_node_rows(tile_graph, location_map, nodes, topological_order),
+        ),
+        (Path(edge_path), EDGE_COLUMNS, iter_edge_rows(tile_graph, nodes)),
+    )
+    for table_path, columns, rows in tables:
+        schema = pa.schema(
+            [
+                (column, arrow_types[column_type])
+                for column, column_type in columns
+            ]
+        )
+        with pq.ParquetWriter(str(table_path), schema) as table_writer:
+            while True:
+                batch_rows = list(itertools.islice(rows, batch_size))
+                if not batch_rows:
+                    break
+                batch_columns = [
+                    pa.array(column_values, type=column_field.type)
+                    for column_field, column_values in zip(
+                        schema, zip(*batch_rows)
+                    )
+                ]
+                table_writer.write_batch(
+                    pa.RecordBatch.from_arrays(batch_columns, schema=schema)
+                )
+        logger.debug(f"Wrote {table_path}")
+    return tables[0][0], tables[1][0]
+
+
+def write_graphml(
+    tile_graph: TileGraph,
+    location_map: LocationMap,
+    graphml_path: PathLike,
+    topological_order: Optional[Iterable[Tuple[int, Coord]]] = None,
+) -> Path:
+    """
+    Streams the TileGraph into a directed GraphML file, writing every
+    node and edge as soon as it's produced
+    """
+    graphml_path = Path(graphml_path)
+    nodes = node_index(tile_graph)
+    node_attributes = NODE_COLUMNS[1:]
+    edge_attributes = EDGE_COLUMNS[2:]
+    with open(graphml_path, "w", encoding="utf-8") as graphml:
+        graphml.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+        )
+        for scope, attributes in (
+            ("node", node_attributes),
+            ("edge", edge_attributes),
+        ):
+            for column, column_type in attributes:
+                graphml.write(
+                    f'  <key id="{column}" for="{scope}" '
+                    f'attr.name="{column}" attr.type="{column_type}"/>\n'
+                )
+        graphml.write('  <graph id="TileGraph" edgedefault="directed">\n')
+
+        for node_row in iter_node_rows(
+            tile_graph, location_map, nodes, topological_order
+        ):
+            graphml.write(f'    <node id="n{node_row[0]}">\n')
+            _write_graphml_data(graphml, node_attributes, node_row[1:])
+            graphml.write("    </node>\n")
+        for source, target, kind in iter_edge_rows(tile_graph, nodes):
+            graphml.write(
+                f'    <edge source="n{source}" target="n{target}">\n'
+            )
+            _write_graphml_data(graphml, edge_attributes, (kind,))
+            graphml.write("    </edge>\n")
+        graphml.write("  </graph>\n</graphml>\n")
+    logger.debug(f"Wrote {graphml_path}")
+    return graphml_path
+
+
+def _write_graphml_data(
+    graphml, attributes: Iterable[Tuple[str, str]], values: Iterable
+) -> None:
+    """
+    Writes the <data> elements of a GraphML node or edge
+    """
+    for (column, column_type), value in zip(attributes, values):
+        if column_type == "boolean":
+            value = "true" if value else "false"
+        graphml.write(
+            f'      <data key="{column}">{escape(str(value))}</data>\n'
+        )
+
+
+def export_arrays(
+    tile_graph: TileGraph, include_bottlenecks: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the (node count, 2) node coordinates and the (edge count, 2)
+    edge array of node ids
+    """
+    nodes = node_index(tile_graph, include_bottlenecks)
+    return node_coordinates(nodes), edge_array(
+        tile_graph, nodes, include_bottlenecks
+    )
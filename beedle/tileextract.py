@@ -0,0 +1,266 @@
+"""
+Extracting overworld map data from game ROM files
+
+The ROM is memory mapped rather than read, so only the pages holding the
+map data are loaded. Every quadrant of the map is stored run length
+encoded, one byte per run
+    > high nibble: run length - 1
+    > low nibble: tile value
+
+The runs are decoded with np.repeat, and the layout of a game (quadrant
+addresses, water barriers, cleanup fills and transposition) is described
+by a MapLayout so supporting another game only requires a new descriptor
+
+Layouts
+> ZELDA2_LAYOUT
+    > Overworld of Zelda II: The Adventure of Link, matching the map data
+      shipped in tools/zelda2/zelda2map.dat
+
+No descriptor is provided for the Zelda 1 overworld, its ROM stores the
+map as column indexes into a tile table rather than run length encoded
+quadrants
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import mmap
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+from loguru import logger
+import numpy as np
+
+from .tileio import save_map_data
+
+
+PathLike = Union[str, Path]
+Fill = Tuple[slice, slice, int]
+
+
+class QuadrantLayout:
+    """
+    Description of a single run length encoded quadrant of the map
+    > name <str>
+        > Human readable name of the quadrant
+    > address_range <Tuple[int, int]>
+        > Inclusive (start, end) ROM addresses of the encoded quadrant
+    > position <Tuple[int, int]>
+        > (row, col) block index of the quadrant within the full map
+    > barrier <Optional[int]>
+        > Tile value inserted at the end of every decoded row to separate
+          the quadrants, None to leave the rows untouched
+    > fills <Tuple[Fill, ...]>
+        > (row slice, col slice, tile value) cleanup regions overwritten
+          after decoding
+    """
+
+    def __init__(
+        self,
+        name: str,
+        address_range: Tuple[int, int],
+        position: Tuple[int, int],
+        barrier: Optional[int] = None,
+        fills: Iterable[Fill] = (),
+    ):
+        self.name = name
+        self.address_range = address_range
+        self.position = position
+        self.barrier = barrier
+        self.fills = tuple(fills)
+
+    def __str__(self) -> str:
+        start_address, end_address = self.address_range
+        return (
+            f"QuadrantLayout {self.name} "
+            f"[{start_address:#06x}-{end_address:#06x}] {id(self)}"
+        )
+
+
+class MapLayout:
+    """
+    Description of how the quadrants are assembled into the full map
+    > name <str>
+        > Human readable name of the layout
+    > quadrant_shape <Tuple[int, int]>
+        > (rows, cols) dimensions every decoded quadrant is resized to
+    > quadrants <Tuple[QuadrantLayout, ...]>
+        > Quadrants forming the map
+    > transpose <bool>
+        > Transposes the assembled map so it's indexed with (X, Y)
+          rather than (Y, X)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        quadrant_shape: Tuple[int, int],
+        quadrants: Iterable[QuadrantLayout],
+        transpose: bool = False,
+    ):
+        self.name = name
+        self.quadrant_shape = quadrant_shape
+        self.quadrants = tuple(quadrants)
+        self.transpose = transpose
+
+    def __str__(self) -> str:
+        return (
+            f"MapLayout {self.name} [{len(self.quadrants)} quadrants] "
+            f"{id(self)}"
+        )
+
+    @property
+    def map_shape(self) -> Tuple[int, int]:
+        """
+        Dimensions of the assembled map before any transposition
+        """
+        block_rows, block_cols = zip(
+            *(quadrant.position for quadrant in self.quadrants)
+        )
+        return (
+            (max(block_rows) + 1) * self.quadrant_shape[0],
+            (max(block_cols) + 1) * self.quadrant_shape[1],
+        )
+
+
+ZELDA2_LAYOUT = MapLayout(
+    "Zelda II: The Adventure of Link",
+    quadrant_shape=(75, 65),
+    quadrants=(
+        QuadrantLayout("West Hyrule", (0x506C, 0x538C), (0, 0), barrier=12),
+        QuadrantLayout(
+            "Death Mountain",
+            (0x665C, 0x6942),
+            (1, 0),
+            barrier=12,
+            fills=(
+                (slice(None), slice(28, None), 12),
+                (slice(60, None), slice(None), 12),
+            ),
+        ),
+        QuadrantLayout("East Hyrule", (0x9056, 0x936F), (0, 1), barrier=12),
+        QuadrantLayout(
+            "Maze Island",
+            (0xA65C, 0xA942),
+            (1, 1),
+            barrier=12,
+            fills=(
+                (slice(None), slice(None, 28), 12),
+                (slice(59, None), slice(None), 12),
+            ),
+        ),
+    ),
+    transpose=True,
+)
+
+
+def decode_rle(encoded_bytes: np.ndarray) -> np.ndarray:
+    """
+    Decodes the run length encoded bytes, repeating the tile value in the
+    low nibble of every byte (high nibble + 1) times
+    """
+    encoded_bytes = np.asarray(encoded_bytes, dtype=np.uint8)
+    run_lengths = (encoded_bytes >> 4).astype(np.int64) + 1
+    return np.repeat(encoded_bytes & 0x0F, run_lengths).astype(np.int64)
+
+
+def insert_barrier(
+    tiles: np.ndarray, row_length: int, barrier_value: int
+) -> np.ndarray:
+    """
+    Inserts the barrier tile as the last column of every full row of the
+    decoded tiles, so each row of row_length tiles ends with the barrier
+    """
+    barrier_count = len(range(row_length, len(tiles), row_length))
+    barrier_positions = (row_length - 1) * np.arange(1, barrier_count + 1)
+    return np.insert(tiles, barrier_positions, barrier_value)
+
+
+def decode_quadrant(
+    rom_data: Union[bytes, mmap.mmap],
+    quadrant: QuadrantLayout,
+    quadrant_shape: Tuple[int, int],
+) -> np.ndarray:
+    """
+    Decodes a single quadrant from the ROM into a quadrant_shape array
+    """
+    start_address, end_address = quadrant.address_range
+    encoded_bytes = np.frombuffer(
+        rom_data,
+        dtype=np.uint8,
+        count=end_address - start_address + 1,
+        offset=start_address,
+    )
+    tiles = decode_rle(encoded_bytes)
+    if quadrant.barrier is not None:
+        tiles = insert_barrier(tiles, quadrant_shape[1], quadrant.barrier)
+
+    quadrant_data = np.resize(tiles, quadrant_shape)
+    for row_slice, col_slice, tile_value in quadrant.fills:
+        quadrant_data[row_slice, col_slice] = tile_value
+    logger.debug(f"Decoded {quadrant} from {len(encoded_bytes)} bytes")
+    return quadrant_data
+
+
+def extract_map_data(rom_path: PathLike, layout: MapLayout) -> np.ndarray:
+    """
+    Extracts the map described by the layout from the ROM file
+    """
+    map_data = np.zeros(layout.map_shape, dtype=np.int64)
+    quadrant_rows, quadrant_cols = layout.quadrant_shape
+    with open(rom_path, "rb") as rom_handle:
+        with mmap.mmap(
+            rom_handle.fileno(), 0, access=mmap.ACCESS_READ
+        ) as rom_data:
+            for quadrant in layout.quadrants:
+                row_start = quadrant.position[0] * quadrant_rows
+                col_start = quadrant.position[1] * quadrant_cols
+                map_data[
+                    row_start : row_start + quadrant_rows,
+                    col_start : col_start + quadrant_cols,
+                ] = decode_quadrant(rom_data, quadrant, layout.quadrant_shape)
+
+    if layout.transpose:
+        map_data = np.ascontiguousarray(map_data.T)
+    logger.info(f"Extracted {map_data.shape} map from {rom_path} [{layout}]")
+    return map_data
+
+
+def extract_rom(
+    rom_path: PathLike, output_path: PathLike, layout: MapLayout
+) -> Path:
+    """
+    Extracts the map data from the ROM and writes it to the output path
+    """
+    return save_map_data(extract_map_data(rom_path, layout), output_path)
+
+
+def extract_roms(
+    rom_paths: Iterable[PathLike],
+    output_directory: PathLike,
+    layout: MapLayout,
+    suffix: str = ".npy",
+    jobs: Optional[int] = None,
+) -> List[Path]:
+    """
+    Extracts the map data from every ROM variant in parallel, writing
+    <output_directory>/<rom stem><suffix> for each ROM
+    """
+    output_directory = Path(output_directory)
+    output_directory.mkdir(parents=True, exist_ok=True)
+    rom_paths = [Path(rom_path) for rom_path in rom_paths]
+    output_paths = [
+        output_directory / f"{rom_path.stem}{suffix}" for rom_path in rom_paths
+    ]
+    if jobs == 1:
+        return [
+            extract_rom(rom_path, output_path, layout)
+            for rom_path, output_path in zip(rom_paths, output_paths)
+        ]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(
+            executor.map(
+                extract_rom,
+                rom_paths,
+                output_paths,
+                [layout] * len(rom_paths),
+            )
+        )
@@ -9,18 +9,185 @@ map data with tile information
 from collections import OrderedDict, deque
 import itertools
 import operator
-from typing import List, Mapping, Set, Tuple
+from typing import (
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Mapping,
+    Set,
+    Tuple,
+    Union,
+)
 
 from loguru import logger
+import numpy as np
 
+from .tilecache import analysis_key
+from .tilecost import cost_clauses, missing_items, split_count
+from .tilegrid import TileGrid
+from .tileinventory import ItemInventory
+from .tilekernels import get_backend
 from .tilelocations import LocationMap
 from .tilemap import TileMap
 from .tilesearch import PartialTileMap
+from .tiletrace import tracer
+
+
+Coord = Tuple[int, int]
+
+# goals value of the TileGraph completing every location of the map
+ALL_LOCATIONS = "all"
+
+
+class UnbeatableResult:
+    """
+    Diagnostics of a TileGraph search that reached a fixed point, a chunk
+    neither collecting an item nor completing a location, before
+    completing graph_end
+    > graph_end <Tuple[int, int]>
+        > Goal location that couldn't be completed
+    > item_inventory <FrozenSet[str]>
+        > Items held once the search stopped
+    > completed_locations <FrozenSet[Tuple[int, int]]>
+        > Every location completed before the search stopped
+    > unreachable_locations <Dict[Tuple[int, int], FrozenSet[str]]>
+        > Every location left uncompleted (restricted to goal_locations
+          for goal directed searches) -> the reward_cost and
+          traversal_cost items of the location missing from the inventory
+    > terrain_items <FrozenSet[str]>
+        > Items missing for the traversal_cost of the tiles bordering the
+          region explored by the final chunk
+    > blocking_items <FrozenSet[str]>
+        > Union of the missing location items and the terrain_items, the
+          items that would let the search progress further
+    > unobtainable_items <FrozenSet[str]>
+        > Blocking items no location rewards at all
+    """
+
+    def __init__(
+        self,
+        graph_end: Coord,
+        item_inventory: FrozenSet[str],
+        completed_locations: FrozenSet[Coord],
+        unreachable_locations: Dict[Coord, FrozenSet[str]],
+        terrain_items: FrozenSet[str],
+        unobtainable_items: FrozenSet[str],
+    ):
+        self.graph_end = graph_end
+        self.item_inventory = item_inventory
+        self.completed_locations = completed_locations
+        self.unreachable_locations = unreachable_locations
+        self.terrain_items = terrain_items
+        self.blocking_items = frozenset(terrain_items).union(
+            *unreachable_locations.values()
+        )
+        self.unobtainable_items = unobtainable_items
+
+    def __str__(self) -> str:
+        return (
+            f"UnbeatableResult Instance [goal={self.graph_end}] "
+            f"[{len(self.unreachable_locations)} unreachable locations] "
+            f"{id(self)}"
+        )
+
+    @property
+    def goal_missing_items(self) -> FrozenSet[str]:
+        """
+        Items missing for the reward_cost and traversal_cost of graph_end
+        """
+        return self.unreachable_locations.get(self.graph_end, frozenset())
+
+    def as_dict(self) -> dict:
+        """
+        JSON serializable form of the diagnostics
+        """
+        return {
+            "graph_end": list(self.graph_end),
+            "item_inventory": sorted(self.item_inventory),
+            "completed_locations": sorted(
+                map(list, self.completed_locations)
+            ),
+            "unreachable_locations": [
+                [list(location), sorted(missing_items)]
+                for location, missing_items in sorted(
+                    self.unreachable_locations.items()
+                )
+            ],
+            "terrain_items": sorted(self.terrain_items),
+            "blocking_items": sorted(self.blocking_items),
+            "unobtainable_items": sorted(self.unobtainable_items),
+        }
+
+    @classmethod
+    def from_dict(cls, unbeatable_data: dict) -> "UnbeatableResult":
+        """
+        Rebuilds the diagnostics from the as_dict form
+        """
+        return cls(
+            tuple(unbeatable_data["graph_end"]),
+            frozenset(unbeatable_data["item_inventory"]),
+            frozenset(map(tuple, unbeatable_data["completed_locations"])),
+            {
+                tuple(location): frozenset(missing_items)
+                for location, missing_items in (
+                    unbeatable_data["unreachable_locations"]
+                )
+            },
+            frozenset(unbeatable_data["terrain_items"]),
+            frozenset(unbeatable_data["unobtainable_items"]),
+        )
 
 
 class TileGraph:
     """
     Graph object for handling the map node connections
+
+    Passing a ReachabilityQuery built from the same TileMap explores
+    each chunk through its cached component labels instead of flood
+    filling the TileMap
+
+    Passing a kernel backend (a name or a KernelBackend) flood fills each
+    chunk on a TileGrid of the TileMap built once for the whole graph,
+    see beedle.tilekernels
+
+    With goal_directed enabled only the locations graph_end depends on
+    (goal_locations) are completed, so location_order and the bottlenecks
+    only cover those locations. Terrain items only join the dependencies
+    when they gate the path towards a location already depending on the
+    goal, every terrain item is followed if that search stalls short of
+    its goals. Chunks whose inventory holds the same
+    traversal_cost items as an earlier chunk reuse its explored region
+    instead of flood filling the TileMap again
+
+    The heuristic option additionally stops the floodfill of chunks
+    without a reusable region once every goal location the inventory
+    could complete has been discovered, exploring the tiles closest to
+    them first. Goal locations left undiscovered don't contribute to the
+    bottlenecks of that chunk
+
+    Passing a ResultCache (see beedle.tilecache) looks the results up by
+    the content hash of the TileMap, graph_start, graph_end and the
+    options before exploring the map, storing them after a miss. The
+    topological_sort output is cached under the same key
+
+    The search stops at the first chunk that neither collects an item nor
+    completes a location. When graph_end wasn't completed by then the map
+    can't be beaten: beatable is False and unbeatable holds the
+    UnbeatableResult describing what blocked the search
+
+    Passing goals (a collection of location entrances, or ALL_LOCATIONS
+    for every location) checks several goals within the same search. The
+    goals always hold graph_end and the search only stops once every goal
+    is completed or at the fixed point. goal_chunks records the chunk
+    completing each goal and unresolved_goals the goals never completed,
+    goal directed searches complete the dependencies of every goal
+
+    The inventory is an ItemInventory of item counts (see
+    beedle.tileinventory), so counted costs ("SmallKey*2") and the
+    consume field of the locations are honoured. inventory_order holds
+    the item names of every chunk and count_order the matching
+    item name -> count mappings
     """
 
     def __init__(
@@ -29,14 +196,64 @@ class TileGraph:
         graph_end: Tuple[int, int],
         tile_map: TileMap,
         location_map: LocationMap,
+        reachability=None,
+        goal_directed: bool = False,
+        heuristic: bool = False,
+        backend=None,
+        cache=None,
+        goals: Union[Iterable[Coord], str, None] = None,
     ):
         self.graph_start = graph_start
         self.graph_end = graph_end
+        if goals == ALL_LOCATIONS:
+            goals = location_map.entrance_locations
+        self.goals = frozenset(map(tuple, goals or ())) | {graph_end}
+        self.goal_chunks = {}
+        self.reachability = reachability
+        self.backend = None
+        self.tile_grid = None
+        if backend is not None and reachability is None:
+            self.backend = get_backend(backend)
+            self.tile_grid = TileGrid(tile_map)
+        self.heuristic = heuristic
+        self.goal_locations = None
+        self.traversal_items = None
+        self._explored_regions = {}
         self.bottlenecks = {}
 
         self._tile_graph = {}
         self.location_order = []
+        self.inventory_order = []
+        self.count_order = []
+        self.unbeatable = None
+
+        self.cache = cache
+        self.cache_key = None
+        if cache is not None:
+            goal_options = {}
+            if len(self.goals) > 1:
+                goal_options["goals"] = sorted(map(list, self.goals))
+            self.cache_key = analysis_key(
+                tile_map,
+                graph_start,
+                graph_end,
+                goal_directed=goal_directed,
+                heuristic=heuristic,
+                **goal_options,
+            )
+            cached_results = cache.get(self.cache_key)
+            if cached_results is not None:
+                logger.info(f"Restoring cached results {self.cache_key}")
+                self.__restore_results(cached_results)
+                return
+
+        if goal_directed:
+            self.goal_locations = self.__goal_dependencies(
+                tile_map, location_map
+            )
         self.bottlenecks = self.__translate_map_data(tile_map, location_map)
+        if cache is not None:
+            cache.put(self.cache_key, self.__cached_results())
 
     def __translate_map_data(
         self, tile_map: TileMap, location_map: LocationMap
@@ -57,7 +274,8 @@ class TileGraph:
             > If the traversal cost is met, update the connections associated
               with that 'key' tile
         End Criteria:
-            > Add the graph_end tile point to the completed_keys set
+            > Add the graph_end tile point (and every other goal) to the
+              completed_keys set
 
         Explore the map in chunks given the constraints provided
         by the configuration. Iterates over the map until the
@@ -65,26 +283,76 @@ class TileGraph:
         completed or we reach the iteration limit set by the
         stage_limit value
         """
-        logger.info("Transforming TileMap {tile_map} into TileGraph")
+        logger.info("Transforming TileMap into TileGraph")
 
         bottlenecks = OrderedDict()
 
         global_completed_locations = set()
-        global_item_inventory = set()
+        global_collected_locations = set()
+        global_item_inventory = ItemInventory()
 
         previous_partial_tile_map = None
         chunk_count = 0
-        while self.graph_end not in global_completed_locations:
+        while not self.goals.issubset(global_completed_locations):
             logger.info(f"Graph Search Chunk #{chunk_count}")
             chunk_count += 1
 
-            partial_tile_map = self.__create_partial_map(
-                tile_map,
-                location_map,
-                global_item_inventory,
-                global_completed_locations,
-            )
+            chunk_inventory = global_item_inventory
+            completed_count = len(global_completed_locations)
+            with tracer.phase("tilegraph.chunk"):
+                partial_tile_map = self.__create_partial_map(
+                    tile_map,
+                    location_map,
+                    chunk_inventory,
+                    global_completed_locations,
+                    global_collected_locations,
+                )
+            global_item_inventory = partial_tile_map.item_counts
+
+            if (
+                len(global_completed_locations) == completed_count
+                and global_item_inventory == chunk_inventory
+            ):
+                if self.goal_locations is not None:
+                    # The gating items may rely on an item the progression
+                    # never collects, retry with every terrain item seeded
+                    goal_locations = self.__goal_dependencies(
+                        tile_map, location_map, gating_only=False
+                    )
+                    if goal_locations != self.goal_locations:
+                        logger.info(
+                            f"Widening the goal locations to "
+                            f"{len(goal_locations)} locations"
+                        )
+                        self.goal_locations = goal_locations
+                        continue
+                if self.graph_end in global_completed_locations:
+                    logger.warning(
+                        f"Search reached a fixed point after "
+                        f"{chunk_count - 1} chunks without completing "
+                        f"{len(self.unresolved_goals)} goals"
+                    )
+                    break
+                self.unbeatable = self.__unbeatable_result(
+                    tile_map,
+                    location_map,
+                    partial_tile_map,
+                    global_item_inventory,
+                    global_completed_locations,
+                )
+                logger.warning(
+                    f"Search reached a fixed point after {chunk_count - 1} "
+                    f"chunks without completing {self.graph_end}, blocked "
+                    f"by {sorted(self.unbeatable.blocking_items)}"
+                )
+                break
 
+            for goal in self.goals.intersection(
+                partial_tile_map.completed_locations
+            ):
+                self.goal_chunks[goal] = len(self.location_order)
+            self.inventory_order.append(chunk_inventory.items)
+            self.count_order.append(chunk_inventory.as_dict())
             self.location_order.append(partial_tile_map.completed_locations)
             for location in partial_tile_map.completed_locations:
                 self.add_node(location)
@@ -104,30 +372,280 @@ class TileGraph:
             previous_partial_tile_map = partial_tile_map
         return bottlenecks
 
+    def __unbeatable_result(
+        self,
+        tile_map: TileMap,
+        location_map: LocationMap,
+        partial_tile_map: PartialTileMap,
+        global_item_inventory: ItemInventory,
+        global_completed_locations: Set[Coord],
+    ) -> UnbeatableResult:
+        """
+        Collects the diagnostics of a search stopped at a fixed point
+
+        The terrain_items only cover the tiles the final PartialTileMap
+        discovered, a heuristic search may have stopped its floodfill
+        before exploring the whole region
+
+        Missing items are the cost items (counted items included) the
+        inventory doesn't hold for the alternative closest to being met,
+        they're unobtainable when the locations reward fewer copies than
+        the count required
+        """
+        held_tokens = global_item_inventory.tokens
+        candidate_locations = (
+            location_map.entrance_locations
+            if self.goal_locations is None
+            else self.goal_locations
+        )
+        unreachable_locations = {}
+        for location in candidate_locations:
+            if location in global_completed_locations:
+                continue
+            location_node = tile_map[location]
+            unreachable_locations[location] = missing_items(
+                location_node.reward_cost
+                | location_node.traversal_cost
+                | location_node.consume,
+                held_tokens,
+            )
+
+        explored_tiles = set(partial_tile_map.partial_map_tiles)
+        terrain_items = set()
+        for tile_coord in explored_tiles:
+            for edge in tile_map[tile_coord].edges:
+                if edge not in explored_tiles:
+                    terrain_items.update(
+                        missing_items(
+                            tile_map[edge].traversal_cost, held_tokens
+                        )
+                    )
+
+        blocking_items = set(terrain_items).union(
+            *unreachable_locations.values()
+        )
+        unobtainable_items = {
+            item
+            for item in blocking_items
+            if location_map.reward_count(item) < split_count(item)[1]
+        }
+        return UnbeatableResult(
+            self.graph_end,
+            global_item_inventory.items,
+            frozenset(global_completed_locations),
+            unreachable_locations,
+            frozenset(terrain_items),
+            frozenset(unobtainable_items),
+        )
+
+    @property
+    def beatable(self) -> bool:
+        """
+        Whether the search completed graph_end
+        """
+        return self.unbeatable is None
+
+    @property
+    def unresolved_goals(self) -> FrozenSet[Coord]:
+        """
+        Goals the search never completed
+        """
+        return self.goals.difference(self.goal_chunks)
+
+    def __goal_dependencies(
+        self,
+        tile_map: TileMap,
+        location_map: LocationMap,
+        gating_only: bool = True,
+    ) -> FrozenSet[Tuple[int, int]]:
+        """
+        Walks backward from the goals through the reward_cost,
+        traversal_cost and consume items to every location rewarding
+        them, returning the locations the goals can depend on
+
+        A location's own costs are only followed once it joins the
+        closure. The terrain items (tile BASE_COST) are seeded from
+        __gating_items, the items gating a path from graph_start towards
+        the locations of the closure, and the walk is repeated until the
+        closure stops growing. With gating_only disabled every terrain
+        item is seeded instead. Every location rewarding a required item
+        is included, as counted items may need all of them
+        """
+        traversal_items = set().union(*tile_map.tile_table.base_cost)
+        for location_properties in location_map.values():
+            traversal_items.update(
+                location_properties.get("traversal_cost", ())
+            )
+        self.traversal_items = frozenset(traversal_items)
+
+        required_items = set()
+        goal_locations = set()
+        search_items = deque()
+
+        def add_costs(location: Coord) -> None:
+            location_node = tile_map[location]
+            for cost_item in itertools.chain(
+                location_node.reward_cost,
+                location_node.traversal_cost,
+                location_node.consume,
+            ):
+                if cost_item not in required_items:
+                    required_items.add(cost_item)
+                    search_items.append(cost_item)
+
+        for goal in self.goals:
+            goal_locations.add(goal)
+            add_costs(goal)
+        terrain_items = traversal_items
+        if gating_only:
+            tile_grid = self.tile_grid
+            if tile_grid is None:
+                tile_grid = TileGrid(tile_map)
+            terrain_items = self.__gating_items(
+                tile_grid, location_map, goal_locations
+            )
+        while True:
+            for item in terrain_items.difference(required_items):
+                required_items.add(item)
+                search_items.append(item)
+            if not search_items:
+                break
+            while search_items:
+                item = search_items.pop()
+                for source in location_map.location_reward_sources(item):
+                    if source not in goal_locations:
+                        goal_locations.add(source)
+                        add_costs(source)
+            if gating_only:
+                terrain_items = self.__gating_items(
+                    tile_grid, location_map, goal_locations
+                )
+
+        logger.info(
+            f"{len(self.goals)} goals depend on {len(goal_locations)} "
+            f"of {len(location_map)} locations"
+        )
+        return frozenset(goal_locations)
+
+    def __gating_items(
+        self,
+        tile_grid: TileGrid,
+        location_map: LocationMap,
+        locations: Iterable[Coord],
+    ) -> FrozenSet[str]:
+        """
+        Terrain items gating a path from graph_start to the locations
+
+        Starting without any terrain item, the region reachable from
+        graph_start is flood filled and the items of the cost classes
+        bordering it (every clause of an alternative) are added, until
+        the region discovers every location or stops growing. An item is
+        only added once a location rewarding it lies within the region,
+        the reward_cost of that location being ignored
+        """
+        backend = self.backend or get_backend(None)
+        item_sources = {}
+        for item in tile_grid.item_table:
+            if location_map.reward_count(item) >= split_count(item)[1]:
+                item_sources[tile_grid.inventory_mask([item])] = tuple(
+                    zip(*location_map.location_reward_sources(item))
+                )
+        location_indexes = tuple(zip(*locations))
+
+        inventory_mask = 0
+        while True:
+            reachable = backend.flood_fill(
+                tile_grid.traversable(inventory_mask),
+                self.graph_start,
+                tile_grid.warp_indexes,
+            )
+            if reachable[location_indexes].all():
+                break
+            border = np.zeros_like(reachable)
+            border[1:, :] |= reachable[:-1, :]
+            border[:-1, :] |= reachable[1:, :]
+            border[:, 1:] |= reachable[:, :-1]
+            border[:, :-1] |= reachable[:, 1:]
+            for warp_entrance, warp_exit in tile_grid.warps:
+                if reachable[warp_entrance]:
+                    border[warp_exit] = True
+            border &= ~reachable
+
+            border_mask = 0
+            for class_index in np.unique(tile_grid.cost_class[border]):
+                for clause_mask in tile_grid.class_clause_masks[class_index]:
+                    border_mask |= clause_mask
+            collectable_mask = 0
+            for item_mask, source_indexes in item_sources.items():
+                if reachable[source_indexes].any():
+                    collectable_mask |= item_mask
+            border_mask &= collectable_mask & ~inventory_mask
+            if not border_mask:
+                break
+            inventory_mask |= border_mask
+        return tile_grid.inventory_items(inventory_mask)
+
     def __create_partial_map(
         self,
         tile_map: TileMap,
         location_map: LocationMap,
-        global_item_inventory: Set[str],
+        global_item_inventory: ItemInventory,
         global_completed_locations: Set[Tuple[int, int]],
+        global_collected_locations: Set[Tuple[int, int]],
     ) -> PartialTileMap:
         """
         Creates an instance of a PartialTileMap and attempts to find all
         completed locations within the explorable region generated by
         the object
+
+        The region is explored with the threshold tokens of the counts,
+        the inventory left after the chunk is read from item_counts of
+        the returned PartialTileMap
         """
+        held_tokens = global_item_inventory.tokens
+
+        target_locations = None
+        region_key = None
+        if self.goal_locations is not None and self.reachability is None:
+            region_key = self.traversal_items.intersection(held_tokens)
+        explored_tiles = self._explored_regions.get(region_key)
+        if (
+            explored_tiles is None
+            and self.heuristic
+            and self.goal_locations
+            and self.tile_grid is None
+        ):
+            target_locations = {
+                location
+                for location in self.goal_locations
+                if location not in global_completed_locations
+                and global_item_inventory.meets(tile_map[location].reward_cost)
+                and global_item_inventory.meets(
+                    tile_map[location].traversal_cost
+                )
+            }
 
         ptile_map = PartialTileMap(
-            tile_map, self.graph_start, global_item_inventory
+            tile_map,
+            self.graph_start,
+            held_tokens,
+            reachability=self.reachability,
+            target_locations=target_locations,
+            explored_tiles=explored_tiles,
+            tile_grid=self.tile_grid,
+            backend=self.backend,
         )
+        if region_key is not None and ptile_map.exhaustive:
+            self._explored_regions[region_key] = ptile_map.partial_map_tiles
 
         ptile_map.find_completed_locations(
             tile_map,
             location_map,
             global_completed_locations,
             global_item_inventory,
+            location_filter=self.goal_locations,
+            collected_locations=global_collected_locations,
         )
-        global_item_inventory.update(ptile_map.search_inventory)
         global_completed_locations.update(ptile_map.completed_locations)
         return ptile_map
 
@@ -161,9 +679,11 @@ class TileGraph:
             logger.info(f"Found item bottleneck {item_bottleneck}")
 
             for item in item_bottleneck:
-                reward_location = location_map.location_reward_search(item)
                 cost_location = location_map.location_cost_search(item)
-                bottleneck_subset[reward_location] = set(cost_location)
+                for reward_location in location_map.location_reward_sources(
+                    item
+                ):
+                    bottleneck_subset[reward_location] = set(cost_location)
 
                 bottleneck_locations = location_map.location_search(item)
                 node_vertices = itertools.permutations(bottleneck_locations, 2)
@@ -171,6 +691,87 @@ class TileGraph:
                     self.update_node_edge(vertex[0], vertex[1])
         return bottleneck_subset
 
+    def __cached_results(self) -> dict:
+        """
+        JSON serializable form of the analysis results, keeping the
+        insertion order of the bottlenecks and graph nodes
+        """
+        return {
+            "location_order": [
+                sorted(completion_group)
+                for completion_group in self.location_order
+            ],
+            "inventory_order": [
+                sorted(inventory) for inventory in self.inventory_order
+            ],
+            "count_order": self.count_order,
+            "goal_chunks": [
+                [goal, chunk_index]
+                for goal, chunk_index in sorted(self.goal_chunks.items())
+            ],
+            "bottlenecks": [
+                [reward_location, sorted(cost_locations)]
+                for reward_location, cost_locations in self.bottlenecks.items()
+            ],
+            "graph": [
+                [node, sorted(connected_nodes)]
+                for node, connected_nodes in self._tile_graph.items()
+            ],
+            "goal_locations": (
+                None
+                if self.goal_locations is None
+                else sorted(self.goal_locations)
+            ),
+            "traversal_items": (
+                None
+                if self.traversal_items is None
+                else sorted(self.traversal_items)
+            ),
+            "unbeatable": (
+                None if self.unbeatable is None else self.unbeatable.as_dict()
+            ),
+        }
+
+    def __restore_results(self, cached_results: dict) -> None:
+        """
+        Rebuilds the analysis results from the __cached_results form
+        """
+        self.location_order = [
+            set(map(tuple, completion_group))
+            for completion_group in cached_results["location_order"]
+        ]
+        self.inventory_order = [
+            frozenset(inventory)
+            for inventory in cached_results["inventory_order"]
+        ]
+        self.count_order = cached_results["count_order"]
+        self.goal_chunks = {
+            tuple(goal): chunk_index
+            for goal, chunk_index in cached_results["goal_chunks"]
+        }
+        self.bottlenecks = OrderedDict(
+            (tuple(reward_location), set(map(tuple, cost_locations)))
+            for reward_location, cost_locations in (
+                cached_results["bottlenecks"]
+            )
+        )
+        self._tile_graph = {
+            tuple(node): set(map(tuple, connected_nodes))
+            for node, connected_nodes in cached_results["graph"]
+        }
+        if cached_results["goal_locations"] is not None:
+            self.goal_locations = frozenset(
+                map(tuple, cached_results["goal_locations"])
+            )
+        if cached_results["traversal_items"] is not None:
+            self.traversal_items = frozenset(
+                cached_results["traversal_items"]
+            )
+        if cached_results["unbeatable"] is not None:
+            self.unbeatable = UnbeatableResult.from_dict(
+                cached_results["unbeatable"]
+            )
+
     @property
     def graph_data(self) -> Mapping[Tuple[int, int], Set[Tuple[int, int]]]:
         """
@@ -191,11 +792,10 @@ class TileGraph:
         """
         if node not in self._tile_graph:
             self._tile_graph[node] = set()
-            logger.info(f"Added new node {node} to graph")
-        else:
-            logger.info(
-                f"Node {node} -> {self._tile_graph[node]} exists in graph"
-            )
+            if tracer.enabled:
+                tracer.event("tilegraph.add_node", node)
+        elif tracer.enabled:
+            tracer.event("tilegraph.existing_node", node)
 
     def update_node_edge(
         self, node: Tuple[int, int], connected_node: Tuple[int, int]
@@ -210,7 +810,8 @@ class TileGraph:
             self.add_node(node)
 
         self._tile_graph[node].add(connected_node)
-        logger.info(f"Update node {node} -> {self._tile_graph[node]}")
+        if tracer.enabled:
+            tracer.event("tilegraph.update_edge", node, connected_node)
 
     def get_node(self, node: Tuple[int, int]) -> Set[Tuple[int, int]]:
         """
@@ -219,11 +820,11 @@ class TileGraph:
         """
         connected_nodes = None
         if node not in self._tile_graph:
-            logger.info(f"Unable to find node {node} in the graph")
+            if tracer.enabled:
+                tracer.event("tilegraph.missing_node", node)
             connected_nodes = set()
         else:
             connected_nodes = self._tile_graph[node]
-            logger.info(f"Found connected nodes {node} -> {connected_nodes}")
         return connected_nodes
 
     def generate_graph_bottlenecks(
@@ -237,43 +838,104 @@ class TileGraph:
         starting_connection = {self.graph_start: None}
         bottleneck = [starting_connection]
         for reward_location, cost_locations in self.bottlenecks.items():
-            logger.info(f"Bottleneck subset length #{len(bottleneck)}")
-            logger.info((
-                f"Current node {reward_location}\n"
-                f"{location_map[reward_location]}"
-            ))
+            if tracer.enabled:
+                tracer.event("tilegraph.bottleneck", reward_location)
             connection = {reward_location: cost_locations}
             bottleneck.append(connection)
         logger.info(bottleneck)
         return bottleneck
 
+    @staticmethod
+    def __met_clause(
+        cost: FrozenSet[str], chunk_inventories: List[ItemInventory]
+    ) -> FrozenSet[str]:
+        """
+        Clause of the cost the progression met first, the inventory of
+        the earliest chunk covering it. Ties (and clauses never met) go
+        to the clause with the fewest items
+        """
+        clauses = cost_clauses(cost)
+        if len(clauses) == 1:
+            return clauses[0]
+
+        def met_chunk(clause: FrozenSet[str]) -> int:
+            return next(
+                (
+                    chunk_index
+                    for chunk_index, chunk_inventory in enumerate(
+                        chunk_inventories
+                    )
+                    if chunk_inventory.meets(clause)
+                ),
+                len(chunk_inventories),
+            )
+
+        return min(
+            clauses,
+            key=lambda clause: (
+                met_chunk(clause),
+                len(clause),
+                sorted(clause),
+            ),
+        )
+
     def topological_sort(self, tile_map: TileMap, location_map: LocationMap):
         """
         Topological sort from the graph-end to graph-start
+
+        Costs holding alternatives only depend on the locations rewarding
+        the items of the clause the progression met first
         """
+        topological_key = None
+        if self.cache is not None:
+            topological_key = f"{self.cache_key}:topological"
+            cached_sort = self.cache.get(topological_key)
+            if cached_sort is not None:
+                return (
+                    [
+                        (completion_index, tuple(location))
+                        for completion_index, location in cached_sort["order"]
+                    ],
+                    {
+                        tuple(location): set(map(tuple, required_locations))
+                        for location, required_locations in cached_sort[
+                            "graph"
+                        ]
+                    },
+                )
+
         logger.info("Generating topological graph")
+        chunk_inventories = [
+            ItemInventory(item_counts) for item_counts in self.count_order
+        ]
         visited_locations = set()
         search_locations = deque()
         topological_graph = {}
 
         current_node = self.graph_end
         while current_node:
-            logger.info(f"Processing graph location {current_node}")
+            if tracer.enabled:
+                tracer.event("tilegraph.topological_node", current_node)
             visited_locations.add(current_node)
             topological_graph[current_node] = set()
 
             current_tile = tile_map[current_node]
-            current_costs = set()
-            current_costs = current_costs.union(current_tile.reward_cost)
-            current_costs = current_costs.union(current_tile.traversal_cost)
+            current_costs = set(current_tile.consume)
+            for cost in (
+                current_tile.reward_cost,
+                current_tile.traversal_cost,
+            ):
+                current_costs.update(
+                    self.__met_clause(cost, chunk_inventories)
+                )
 
             for cost_item in current_costs:
-                required_location = location_map.location_reward_search(
+                for required_location in location_map.location_reward_sources(
                     cost_item
-                )
-                topological_graph[current_node].add(required_location)
-                if required_location not in visited_locations:
-                    search_locations.append(required_location)
+                ):
+                    topological_graph[current_node].add(required_location)
+                    if required_location not in visited_locations:
+                        search_locations.append(required_location)
 
             try:
                 current_node = search_locations.pop()
@@ -291,4 +953,17 @@ class TileGraph:
                     )
         topological_order.sort(key=operator.itemgetter(0))
         logger.debug(f"Output topological order {topological_order}")
+        if topological_key is not None:
+            self.cache.put(
+                topological_key,
+                {
+                    "order": topological_order,
+                    "graph": [
+                        [location, sorted(required_locations)]
+                        for location, required_locations in (
+                            topological_graph.items()
+                        )
+                    ],
+                },
+            )
         return topological_order, topological_graph
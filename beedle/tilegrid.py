@@ -0,0 +1,227 @@
+"""
+TileGrid:
+Dense array representation of the traversal properties of a TileMap
+used by the reachability kernels
+
+Every distinct traversal_cost found in the TileMap is stored once as a
+"cost class" so evaluating which tiles an inventory can traverse only
+compares the inventory against the cost classes rather than every tile
+"""
+
+from typing import FrozenSet, Iterable, List, Set, Tuple
+
+from loguru import logger
+import numpy as np
+
+from .tileconfig import ItemTable
+from .tilecost import compile_cost, cost_masks, masks_met
+from .tilemap import TileMap
+from .tilenode import TileNode
+
+
+Coord = Tuple[int, int]
+
+
+class TileGrid:
+    """
+    Dense representation of the TileMap
+    > shape <Tuple[int, int]>
+        > (map_size_x, map_size_y) dimensions of the map
+    > cost_class <np.ndarray[int32]>
+        > Index into class_costs / class_masks for every tile
+    > class_costs <tuple>
+        > Distinct traversal_cost frozensets (or CostExpressions) found
+          within the TileMap
+    > class_masks <tuple>
+        > Every item referenced by the class_costs as ItemTable bitmasks
+    > class_clause_masks <tuple>
+        > Clauses of the class_costs as ItemTable bitmasks, a cost class
+          is traversable when any of its clause masks is covered
+    > item_table <ItemTable>
+        > Every item referenced by a traversal_cost
+    > warps <tuple>
+        > Collection of (entrance, exit) pairs for every edge between
+          two tiles that aren't adjacent on the map
+    > warp_exits <dict>
+        > Maps each warp entrance to the list of its exits
+    > warp_indexes <np.ndarray[int64]>
+        > (warp count, 2) flat (entrance, exit) indexes of the warps
+          passed to the reachability kernels
+    """
+
+    def __init__(self, tile_map: TileMap):
+        self.shape = (tile_map.map_size_x, tile_map.map_size_y)
+        self.item_table = ItemTable()
+
+        self._class_lookup = {}
+        self.class_costs = ()
+        self.class_masks = ()
+        self.class_clause_masks = ()
+        cost_class = np.empty(self.shape, dtype=np.int32)
+        warps = []
+        for tile_coord, tile_node in tile_map.items():
+            cost_class[tile_coord] = self.__cost_class_index(tile_node)
+            warps.extend(self.__tile_warps(tile_coord, tile_node))
+
+        cost_class.setflags(write=False)
+        self.cost_class = cost_class
+        self.__set_warps(warps)
+
+    def __cost_class_index(self, tile_node: TileNode) -> int:
+        """
+        Returns the cost class of the TileNode traversal_cost, registering
+        a new cost class the first time a traversal_cost is seen
+        """
+        traversal_cost = compile_cost(tile_node.traversal_cost)
+        class_index = self._class_lookup.get(traversal_cost)
+        if class_index is None:
+            class_index = len(self.class_costs)
+            self._class_lookup[traversal_cost] = class_index
+            self.class_costs += (traversal_cost,)
+            self.class_masks += (
+                sum(
+                    1 << self.item_table.intern(item)
+                    for item in traversal_cost
+                ),
+            )
+            self.class_clause_masks += (
+                cost_masks(traversal_cost, self.item_table),
+            )
+        return class_index
+
+    def __tile_warps(
+        self, tile_coord: Coord, tile_node: TileNode
+    ) -> List[Tuple[Coord, Coord]]:
+        """
+        Returns the (entrance, exit) pairs for the edges of the TileNode
+        leading to a tile that isn't adjacent
+        """
+        tile_warps = []
+        for edge in tile_node.edges:
+            edge_distance = abs(edge[0] - tile_coord[0]) + abs(
+                edge[1] - tile_coord[1]
+            )
+            if edge_distance > 1:
+                if self.in_bounds(edge):
+                    tile_warps.append((tile_coord, edge))
+                else:
+                    logger.warning(
+                        f"Ignoring exit {edge} outside the map "
+                        f"for {tile_coord}"
+                    )
+        return tile_warps
+
+    def __set_warps(self, warps: Iterable[Tuple[Coord, Coord]]) -> None:
+        """
+        Stores the warps along with the warp_exits lookup and the flat
+        warp_indexes
+        """
+        self.warps = tuple(warps)
+        self.warp_exits = {}
+        for warp_entrance, warp_exit in self.warps:
+            self.warp_exits.setdefault(warp_entrance, []).append(warp_exit)
+        warp_indexes = np.array(
+            [
+                (
+                    warp_entrance[0] * self.shape[1] + warp_entrance[1],
+                    warp_exit[0] * self.shape[1] + warp_exit[1],
+                )
+                for warp_entrance, warp_exit in self.warps
+            ],
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        warp_indexes.setflags(write=False)
+        self.warp_indexes = warp_indexes
+
+    def update_tiles(
+        self, tile_map: TileMap, tile_coords: Iterable[Coord]
+    ) -> Set[Coord]:
+        """
+        Refreshes the cost classes and warps of the modified tiles from
+        the TileMap without rebuilding the rest of the grid
+
+        Returns the coordinates whose cost class changed
+        """
+        tile_coords = set(tile_coords)
+        cost_class = self.cost_class.copy()
+        changed_tiles = set()
+        warps = [warp for warp in self.warps if warp[0] not in tile_coords]
+        for tile_coord in tile_coords:
+            tile_node = tile_map[tile_coord]
+            class_index = self.__cost_class_index(tile_node)
+            if cost_class[tile_coord] != class_index:
+                cost_class[tile_coord] = class_index
+                changed_tiles.add(tile_coord)
+            warps.extend(self.__tile_warps(tile_coord, tile_node))
+
+        cost_class.setflags(write=False)
+        self.cost_class = cost_class
+        self.__set_warps(warps)
+        return changed_tiles
+
+    def __str__(self) -> str:
+        return (
+            f"TileGrid Instance [{self.shape}] "
+            f"[{len(self.class_costs)} cost classes] {id(self)}"
+        )
+
+    def in_bounds(self, coord: Coord) -> bool:
+        """
+        Checks the coordinate lies within the map dimensions
+        """
+        return 0 <= coord[0] < self.shape[0] and 0 <= coord[1] < self.shape[1]
+
+    def inventory_mask(self, item_inventory: Iterable[str]) -> int:
+        """
+        Converts the inventory into an ItemTable bitmask
+
+        Items that no traversal_cost references are dropped, so any two
+        inventories with the same mask traverse exactly the same tiles
+        """
+        return self.item_table.mask(item_inventory)
+
+    def inventory_items(self, inventory_mask: int) -> FrozenSet[str]:
+        """
+        Converts an inventory bitmask back into the item names
+        """
+        return self.item_table.names(inventory_mask)
+
+    def traversable(self, inventory_mask: int) -> np.ndarray:
+        """
+        Returns the boolean array of the tiles whose traversal_cost is
+        covered by the inventory
+        """
+        class_traversable = np.array(
+            [
+                masks_met(clause_masks, inventory_mask)
+                for clause_masks in self.class_clause_masks
+            ],
+            dtype=bool,
+        )
+        return class_traversable[self.cost_class]
+
+    def adjacent(self, coord: Coord) -> List[Coord]:
+        """
+        Returns the in-bounds coordinates sharing a border with the tile
+        """
+        row_index, col_index = coord
+        neighbor_coords = [
+            (row_index + 1, col_index),
+            (row_index - 1, col_index),
+            (row_index, col_index + 1),
+            (row_index, col_index - 1),
+        ]
+        return [
+            neighbor
+            for neighbor in neighbor_coords
+            if self.in_bounds(neighbor)
+        ]
+
+    def neighbors(self, coord: Coord) -> List[Coord]:
+        """
+        Returns the adjacent in-bounds coordinates along with any
+        non-adjacent exits of the tile
+        """
+        neighbor_coords = self.adjacent(coord)
+        neighbor_coords.extend(self.warp_exits.get(coord, ()))
+        return neighbor_coords
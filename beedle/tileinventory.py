@@ -0,0 +1,260 @@
+"""
+Counted item inventories
+
+Set inventories can't hold several copies of an item, so small keys,
+heart containers or "need 4 of X" costs can't be expressed with them.
+An ItemInventory stores one count per item name instead, within a NumPy
+vector indexed through an ItemTable
+
+Costs reference counted items as "Name*N" (see beedle.tilecost), which
+are met once the inventory holds at least N of the item. Every compiled
+cost is converted once into a requirement matrix of one row per clause,
+so checking a cost is a single vectorized comparison of the counts
+against the matrix
+
+Iterating an ItemInventory yields its threshold tokens: the name of
+every held item along with "Name*K" for K up to the count. The tokens
+are what the set based code (TileGrid.inventory_mask, the floodfill,
+issubset checks) compares costs against, so a cost requiring "Key*2"
+is covered by the tokens of an inventory holding two or more Key
+"""
+
+from typing import Dict, Iterable, Mapping, Optional, Union
+
+import numpy as np
+
+from .tileconfig import ItemTable
+from .tilecost import cost_clauses, count_token, split_count
+
+
+class ItemInventory:
+    """
+    Item-count vector
+    > item_table <ItemTable>
+        > Column of every item name, shared with the copies of the
+          inventory
+    > counts <np.ndarray[int64]>
+        > Number of copies held of every item within the item_table
+    """
+
+    def __init__(
+        self,
+        items: Union[Iterable[str], Mapping[str, int]] = (),
+        item_table: Optional[ItemTable] = None,
+    ):
+        self.item_table = ItemTable() if item_table is None else item_table
+        self.counts = np.zeros(len(self.item_table), dtype=np.int64)
+        self._requirements = {}
+        self._tokens = None
+        self.add(items)
+
+    def __str__(self) -> str:
+        return f"ItemInventory Instance [{len(self)} items] {id(self)}"
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.counts))
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+    def __contains__(self, item: str) -> bool:
+        name, count = split_count(item)
+        return self.count(name) >= count
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ItemInventory):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    @classmethod
+    def from_tokens(
+        cls, tokens: Iterable[str], item_table: Optional[ItemTable] = None
+    ) -> "ItemInventory":
+        """
+        Rebuilds the inventory from a set of threshold tokens, keeping the
+        largest count found for every item name
+        """
+        item_counts = {}
+        for token in tokens:
+            name, count = split_count(token)
+            item_counts[name] = max(item_counts.get(name, 0), count)
+        return cls(item_counts, item_table)
+
+    def copy(self) -> "ItemInventory":
+        """
+        Copy of the counts sharing the item_table and compiled costs
+        """
+        inventory_copy = ItemInventory.__new__(ItemInventory)
+        inventory_copy.item_table = self.item_table
+        inventory_copy.counts = self.counts.copy()
+        inventory_copy._requirements = self._requirements
+        inventory_copy._tokens = self._tokens
+        return inventory_copy
+
+    def __grow(self) -> None:
+        """
+        Pads the counts with zeros up to the size of the item_table
+        """
+        if len(self.counts) < len(self.item_table):
+            self.counts = np.concatenate(
+                (
+                    self.counts,
+                    np.zeros(
+                        len(self.item_table) - len(self.counts),
+                        dtype=np.int64,
+                    ),
+                )
+            )
+
+    def __column(self, name: str) -> int:
+        """
+        Column of the item name, growing the counts for new items
+        """
+        column = self.item_table.intern(name)
+        self.__grow()
+        return column
+
+    def count(self, name: str) -> int:
+        """
+        Number of copies held of the item
+        """
+        column = self.item_table.index.get(name)
+        if column is None or column >= len(self.counts):
+            return 0
+        return int(self.counts[column])
+
+    def add(self, items: Union[Iterable[str], Mapping[str, int]]) -> None:
+        """
+        Adds the items, either counted item strings ("Key*2" adds two
+        Key) or a mapping of item name -> count
+        """
+        if isinstance(items, ItemInventory):
+            items = items.as_dict()
+        if isinstance(items, Mapping):
+            item_counts = items.items()
+        else:
+            item_counts = map(split_count, items)
+        for name, count in item_counts:
+            column = self.__column(name)
+            self.counts[column] += count
+        self._tokens = None
+
+    def consume(self, items: Iterable[str]) -> None:
+        """
+        Removes the counted items from the inventory
+
+        Raises ValueError without removing anything when the inventory
+        holds fewer copies than consumed
+        """
+        consumed_counts = {}
+        for item in items:
+            name, count = split_count(item)
+            consumed_counts[name] = consumed_counts.get(name, 0) + count
+        missing_items = sorted(
+            count_token(name, count)
+            for name, count in consumed_counts.items()
+            if self.count(name) < count
+        )
+        if missing_items:
+            raise ValueError(
+                f"Unable to consume {missing_items} from {self.as_dict()}"
+            )
+        for name, count in consumed_counts.items():
+            column = self.__column(name)
+            self.counts[column] -= count
+        self._tokens = None
+
+    def discard(self, name: str) -> None:
+        """
+        Removes every copy of the item
+        """
+        column = self.item_table.index.get(name)
+        if column is not None and column < len(self.counts):
+            self.counts[column] = 0
+            self._tokens = None
+
+    def requirements(self, cost: Iterable[str]) -> np.ndarray:
+        """
+        Requirement matrix of the compiled cost, one row per clause
+        holding the count required of every item_table column
+
+        Compiled once per cost and shared with the inventory copies
+        """
+        requirement_matrix = self._requirements.get(cost)
+        if requirement_matrix is None:
+            clause_counts = []
+            for clause in cost_clauses(cost):
+                item_counts = {}
+                for item in clause:
+                    name, count = split_count(item)
+                    column = self.__column(name)
+                    item_counts[column] = max(
+                        item_counts.get(column, 0), count
+                    )
+                clause_counts.append(item_counts)
+            requirement_matrix = np.zeros(
+                (len(clause_counts), len(self.item_table)), dtype=np.int64
+            )
+            for clause_index, item_counts in enumerate(clause_counts):
+                for column, count in item_counts.items():
+                    requirement_matrix[clause_index, column] = count
+            requirement_matrix.setflags(write=False)
+            self._requirements[cost] = requirement_matrix
+        return requirement_matrix
+
+    def meets(self, cost: Iterable[str]) -> bool:
+        """
+        Checks whether the counts cover any clause of the compiled cost
+        """
+        if not cost:
+            return True
+        requirement_matrix = self.requirements(cost)
+        item_count = requirement_matrix.shape[1]
+        if len(self.counts) < item_count:
+            self.__grow()
+        return bool(
+            np.any(
+                np.all(
+                    self.counts[:item_count] >= requirement_matrix, axis=1
+                )
+            )
+        )
+
+    @property
+    def items(self) -> frozenset:
+        """
+        Names of every item held at least once
+        """
+        return frozenset(
+            self.item_table.items[column]
+            for column in np.flatnonzero(self.counts).tolist()
+        )
+
+    @property
+    def tokens(self) -> frozenset:
+        """
+        Threshold tokens of the held items, the name along with "Name*K"
+        for every K from two up to the count
+        """
+        if self._tokens is None:
+            tokens = []
+            for column in np.flatnonzero(self.counts).tolist():
+                name = self.item_table.items[column]
+                tokens.extend(
+                    count_token(name, count)
+                    for count in range(1, int(self.counts[column]) + 1)
+                )
+            self._tokens = frozenset(tokens)
+        return self._tokens
+
+    def as_dict(self) -> Dict[str, int]:
+        """
+        JSON serializable item name -> count mapping of the held items
+        """
+        return {
+            self.item_table.items[column]: int(self.counts[column])
+            for column in sorted(
+                np.flatnonzero(self.counts).tolist(),
+                key=lambda column: self.item_table.items[column],
+            )
+        }
@@ -0,0 +1,76 @@
+"""
+Loading helpers for the inputs consumed by the beedle library
+
+map data
+> Plain-text file with one row of whitespace separated integers
+  per line, matching the files generated by the tools/ extractors
+> Binary NumPy ".npy" file holding the 2D array, which loads without
+  parsing any text
+
+configuration
+> JSON file containing the "tiles" and "locations" fields described
+  within the README
+"""
+
+import json
+from pathlib import Path
+from typing import Union
+
+from loguru import logger
+import numpy as np
+
+
+PathLike = Union[str, Path]
+BINARY_MAP_SUFFIX = ".npy"
+
+
+def load_map_data(map_path: PathLike) -> np.ndarray:
+    """
+    Loads the map data into a 2D numpy array
+
+    Expected map data file format:
+    <int> <int> ... <int>\n
+    <int> <int> ... <int>\n
+    ...
+    <int> <int> ... <int>
+
+    Files with the ".npy" suffix are loaded as binary NumPy arrays
+    """
+    map_path = Path(map_path)
+    if map_path.suffix == BINARY_MAP_SUFFIX:
+        map_data = np.load(map_path, allow_pickle=False)
+        logger.debug(f"Loaded map data {map_data.shape} from {map_path}")
+        return map_data
+    with open(map_path, "r", encoding="utf-8") as map_handle:
+        map_data = np.array(
+            [[int(entry) for entry in row.split()] for row in map_handle]
+        )
+    logger.debug(f"Loaded map data {map_data.shape} from {map_path}")
+    return map_data
+
+
+def save_map_data(map_data: np.ndarray, map_path: PathLike) -> Path:
+    """
+    Writes the map data using the format selected by the file suffix,
+    binary for ".npy" and the plain-text format otherwise
+    """
+    map_path = Path(map_path)
+    if map_path.suffix == BINARY_MAP_SUFFIX:
+        with open(map_path, "wb") as map_handle:
+            np.save(map_handle, np.ascontiguousarray(map_data))
+    else:
+        np.savetxt(map_path, map_data, fmt="%d", delimiter=" ", newline="\n")
+    logger.debug(f"Saved map data {map_data.shape} to {map_path}")
+    return map_path
+
+
+def load_configuration(config_path: PathLike) -> dict:
+    """
+    Loads the json configuration file containing the
+    "tiles" and "locations" fields
+    """
+    config_path = Path(config_path)
+    with open(config_path, "r", encoding="utf-8") as config_handle:
+        config_data = json.load(config_handle)
+    logger.debug(f"Loaded configuration from {config_path}")
+    return config_data
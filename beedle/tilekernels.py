@@ -0,0 +1,1062 @@
+"""
+Reachability kernels operating on the dense TileGrid representation
+of the TileMap
+
+The kernels work on flattened boolean "walkable" arrays where index
+(row * map_size_y + col) represents the (row, col) tile coordinate.
+Non-adjacent exits are passed as a (count, 2) array of flat
+(entrance, exit) indexes
+
+Kernels
+> label_components
+    > 4-connected component labelling of the walkable tiles
+> flood_fill
+    > Tiles discovered from a starting tile, always including the
+      starting tile itself to match PartialTileMap.floodfill
+> distance_map
+    > Number of steps from the starting tile to every discovered tile
+> distance_maps
+    > distance_map of several starting tiles at once, sharing the setup
+      of the search graph between the starting tiles
+> reverse_flood_fill
+    > Tiles whose flood fill discovers the end tile, walking the adjacency
+      and the non-adjacent exits backwards from the end tile
+
+Backends
+> python
+    > Pure Python reference implementation, always available
+> scipy
+    > scipy.ndimage.label and scipy.sparse.csgraph
+> numba
+    > Numba JIT compiled breadth first searches
+> sharded
+    > Labels horizontal strips of the map in worker processes over shared
+      memory, stitching the strips back together with a union-find over
+      the labels facing each other across the strip boundaries. Opt-in
+      only, for maps large enough to outweigh the process overhead
+
+The backend is selected with get_backend, either by name, through the
+BEEDLE_BACKEND environment variable, or by taking the first available
+backend of BACKEND_PREFERENCE
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+from typing import Dict, List, Optional, Sequence, Tuple, Type, Union
+
+from loguru import logger
+import numpy as np
+
+
+Coord = Tuple[int, int]
+
+BACKEND_PREFERENCE = ("scipy", "numba", "python")
+NO_WARPS = np.empty((0, 2), dtype=np.int64)
+
+
+def label_components(walkable: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Labels the 4-connected components of the walkable tiles
+
+    Returns
+        > labels <np.ndarray[int32]>
+            > Same shape as walkable, storing the component index of every
+              walkable tile and -1 for the tiles that can't be traversed
+        > component_count <int>
+            > Number of components found
+    """
+    map_size_x, map_size_y = walkable.shape
+    walkable_flat = walkable.ravel().tolist()
+    labels_flat = [-1] * len(walkable_flat)
+
+    component_count = 0
+    search_queue = deque()
+    for seed_index, seed_walkable in enumerate(walkable_flat):
+        if not seed_walkable or labels_flat[seed_index] >= 0:
+            continue
+
+        labels_flat[seed_index] = component_count
+        search_queue.append(seed_index)
+        while search_queue:
+            tile_index = search_queue.pop()
+            row_index, col_index = divmod(tile_index, map_size_y)
+            neighbors = []
+            if row_index > 0:
+                neighbors.append(tile_index - map_size_y)
+            if row_index < map_size_x - 1:
+                neighbors.append(tile_index + map_size_y)
+            if col_index > 0:
+                neighbors.append(tile_index - 1)
+            if col_index < map_size_y - 1:
+                neighbors.append(tile_index + 1)
+            for neighbor_index in neighbors:
+                if (
+                    walkable_flat[neighbor_index]
+                    and labels_flat[neighbor_index] < 0
+                ):
+                    labels_flat[neighbor_index] = component_count
+                    search_queue.append(neighbor_index)
+        component_count += 1
+
+    labels = np.array(labels_flat, dtype=np.int32).reshape(walkable.shape)
+    return labels, component_count
+
+
+def distance_map(
+    walkable: np.ndarray,
+    start_coord: Coord,
+    warp_indexes: np.ndarray = NO_WARPS,
+) -> np.ndarray:
+    """
+    Breadth first search from the starting tile over the walkable tiles
+    and the non-adjacent exits
+
+    Returns the int32 array of the number of steps to every tile,
+    -1 for the tiles that weren't discovered
+    """
+    map_size_y = walkable.shape[1]
+    walkable_flat = walkable.ravel().tolist()
+    distance_flat = [-1] * len(walkable_flat)
+    warp_exits = {}
+    for warp_entrance, warp_exit in np.asarray(warp_indexes).tolist():
+        warp_exits.setdefault(warp_entrance, []).append(warp_exit)
+
+    start_index = start_coord[0] * map_size_y + start_coord[1]
+    distance_flat[start_index] = 0
+    search_queue = deque([start_index])
+    while search_queue:
+        tile_index = search_queue.popleft()
+        neighbors = _adjacent_indexes(tile_index, walkable.shape)
+        neighbors.extend(warp_exits.get(tile_index, ()))
+        next_distance = distance_flat[tile_index] + 1
+        for neighbor_index in neighbors:
+            if (
+                walkable_flat[neighbor_index]
+                and distance_flat[neighbor_index] < 0
+            ):
+                distance_flat[neighbor_index] = next_distance
+                search_queue.append(neighbor_index)
+
+    return np.array(distance_flat, dtype=np.int32).reshape(walkable.shape)
+
+
+def flood_fill(
+    walkable: np.ndarray,
+    start_coord: Coord,
+    warp_indexes: np.ndarray = NO_WARPS,
+) -> np.ndarray:
+    """
+    Returns the boolean array of the tiles discovered from the
+    starting tile, including the starting tile itself
+    """
+    return distance_map(walkable, start_coord, warp_indexes) >= 0
+
+
+def reverse_flood_fill(
+    walkable: np.ndarray,
+    end_coord: Coord,
+    warp_indexes: np.ndarray = NO_WARPS,
+) -> np.ndarray:
+    """
+    Returns the boolean array of the tiles whose flood_fill discovers
+    the end tile
+
+    Walks the reversed edges breadth first from the end tile. Unwalkable
+    tiles next to a reached tile are included, as a flood fill starting
+    on them still steps onto the reached tile, but aren't expanded
+    """
+    map_size_y = walkable.shape[1]
+    walkable_flat = walkable.ravel().tolist()
+    reaching_flat = [False] * len(walkable_flat)
+    warp_entrances = {}
+    for warp_entrance, warp_exit in np.asarray(warp_indexes).tolist():
+        warp_entrances.setdefault(warp_exit, []).append(warp_entrance)
+
+    end_index = end_coord[0] * map_size_y + end_coord[1]
+    reaching_flat[end_index] = True
+    search_queue = deque([end_index] if walkable_flat[end_index] else [])
+    while search_queue:
+        tile_index = search_queue.popleft()
+        predecessors = _adjacent_indexes(tile_index, walkable.shape)
+        predecessors.extend(warp_entrances.get(tile_index, ()))
+        for predecessor_index in predecessors:
+            if not reaching_flat[predecessor_index]:
+                reaching_flat[predecessor_index] = True
+                if walkable_flat[predecessor_index]:
+                    search_queue.append(predecessor_index)
+
+    return np.array(reaching_flat, dtype=bool).reshape(walkable.shape)
+
+
+def reverse_fill_from_labels(
+    walkable: np.ndarray,
+    labels: np.ndarray,
+    component_count: int,
+    end_coord: Coord,
+    warp_indexes: np.ndarray = NO_WARPS,
+) -> np.ndarray:
+    """
+    Same result as reverse_flood_fill computed from a component labelling
+    of the walkable tiles
+
+    Only the components joined by the non-adjacent exits are searched,
+    the tiles are then selected through array operations
+    """
+    reaching = np.zeros(walkable.shape, dtype=bool)
+    reaching[end_coord] = True
+    if not walkable[end_coord]:
+        return reaching
+
+    labels_flat = labels.ravel()
+    warp_indexes = np.asarray(warp_indexes, dtype=np.int64).reshape(-1, 2)
+    entrance_labels = labels_flat[warp_indexes[:, 0]]
+    exit_labels = labels_flat[warp_indexes[:, 1]]
+    linked = (entrance_labels >= 0) & (exit_labels >= 0)
+    component_entrances = {}
+    for entrance_label, exit_label in zip(
+        entrance_labels[linked].tolist(), exit_labels[linked].tolist()
+    ):
+        component_entrances.setdefault(exit_label, set()).add(entrance_label)
+
+    # The extra False entry maps the -1 label of unwalkable tiles
+    component_reaching = np.zeros(component_count + 1, dtype=bool)
+    end_label = int(labels[end_coord])
+    component_reaching[end_label] = True
+    search_queue = deque([end_label])
+    while search_queue:
+        component = search_queue.popleft()
+        for entrance_label in component_entrances.get(component, ()):
+            if not component_reaching[entrance_label]:
+                component_reaching[entrance_label] = True
+                search_queue.append(entrance_label)
+
+    reached_walkable = component_reaching[labels]
+    reaching |= reached_walkable
+    reaching[1:, :] |= reached_walkable[:-1, :]
+    reaching[:-1, :] |= reached_walkable[1:, :]
+    reaching[:, 1:] |= reached_walkable[:, :-1]
+    reaching[:, :-1] |= reached_walkable[:, 1:]
+    reaching_flat = reaching.reshape(-1)
+    reaching_flat[
+        warp_indexes[reached_walkable.ravel()[warp_indexes[:, 1]], 0]
+    ] = True
+    return reaching
+
+
+def fill_from_labels(
+    walkable: np.ndarray,
+    labels: np.ndarray,
+    component_count: int,
+    start_coord: Coord,
+    warp_indexes: np.ndarray = NO_WARPS,
+) -> np.ndarray:
+    """
+    Same result as flood_fill computed from a component labelling of the
+    walkable tiles
+
+    The starting tile seeds the components of its walkable neighbors and
+    warp exits (its own component when walkable), the components joined
+    by the non-adjacent exits are then searched breadth first
+    """
+    map_size_y = walkable.shape[1]
+    labels_flat = labels.ravel()
+    warp_indexes = np.asarray(warp_indexes, dtype=np.int64).reshape(-1, 2)
+    entrance_labels = labels_flat[warp_indexes[:, 0]]
+    exit_labels = labels_flat[warp_indexes[:, 1]]
+    linked = (entrance_labels >= 0) & (exit_labels >= 0)
+    component_exits = {}
+    for entrance_label, exit_label in zip(
+        entrance_labels[linked].tolist(), exit_labels[linked].tolist()
+    ):
+        component_exits.setdefault(entrance_label, set()).add(exit_label)
+
+    start_index = start_coord[0] * map_size_y + start_coord[1]
+    seed_indexes = _adjacent_indexes(start_index, walkable.shape)
+    seed_indexes.extend(
+        warp_indexes[warp_indexes[:, 0] == start_index, 1].tolist()
+    )
+    seed_indexes.append(start_index)
+
+    # The extra False entry maps the -1 label of unwalkable tiles
+    component_reached = np.zeros(component_count + 1, dtype=bool)
+    search_queue = deque()
+    for seed_index in seed_indexes:
+        seed_label = int(labels_flat[seed_index])
+        if seed_label >= 0 and not component_reached[seed_label]:
+            component_reached[seed_label] = True
+            search_queue.append(seed_label)
+    while search_queue:
+        component = search_queue.popleft()
+        for exit_label in component_exits.get(component, ()):
+            if not component_reached[exit_label]:
+                component_reached[exit_label] = True
+                search_queue.append(exit_label)
+
+    reachable = component_reached[labels]
+    reachable[start_coord] = True
+    return reachable
+
+
+class KernelBackend:
+    """
+    Interface shared by every kernel backend
+
+    Backends raise ImportError from their constructor when the libraries
+    they depend on aren't installed
+    """
+
+    name = "base"
+
+    def __str__(self) -> str:
+        return f"KernelBackend {self.name} {id(self)}"
+
+    def label_components(
+        self, walkable: np.ndarray
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Labels the 4-connected components of the walkable tiles
+        """
+        raise NotImplementedError
+
+    def distance_map(
+        self,
+        walkable: np.ndarray,
+        start_coord: Coord,
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        """
+        Number of steps from the starting tile, -1 when not discovered
+        """
+        raise NotImplementedError
+
+    def distance_maps(
+        self,
+        walkable: np.ndarray,
+        start_coords: Sequence[Coord],
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        """
+        Stacked distance_map of every starting tile, shaped
+        (len(start_coords), map_size_x, map_size_y)
+        """
+        distances = np.empty((len(start_coords), *walkable.shape), np.int32)
+        for start_index, start_coord in enumerate(start_coords):
+            distances[start_index] = self.distance_map(
+                walkable, start_coord, warp_indexes
+            )
+        return distances
+
+    def flood_fill(
+        self,
+        walkable: np.ndarray,
+        start_coord: Coord,
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        """
+        Tiles discovered from the starting tile
+        """
+        return self.distance_map(walkable, start_coord, warp_indexes) >= 0
+
+    def reverse_flood_fill(
+        self,
+        walkable: np.ndarray,
+        end_coord: Coord,
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        """
+        Tiles whose flood fill discovers the end tile, computed from the
+        component labelling of the backend
+        """
+        labels, component_count = self.label_components(walkable)
+        return reverse_fill_from_labels(
+            walkable, labels, component_count, end_coord, warp_indexes
+        )
+
+
+class PythonBackend(KernelBackend):
+    """
+    Pure Python reference kernels
+    """
+
+    name = "python"
+
+    def label_components(
+        self, walkable: np.ndarray
+    ) -> Tuple[np.ndarray, int]:
+        return label_components(walkable)
+
+    def distance_map(
+        self,
+        walkable: np.ndarray,
+        start_coord: Coord,
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        return distance_map(walkable, start_coord, warp_indexes)
+
+    def reverse_flood_fill(
+        self,
+        walkable: np.ndarray,
+        end_coord: Coord,
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        return reverse_flood_fill(walkable, end_coord, warp_indexes)
+
+
+class ScipyBackend(KernelBackend):
+    """
+    Kernels built on scipy.ndimage.label and scipy.sparse.csgraph
+
+    Flood fills label the components once and only search the small
+    graph of components joined by the non-adjacent exits
+    """
+
+    name = "scipy"
+
+    def __init__(self):
+        # pylint: disable=import-outside-toplevel
+        from scipy import ndimage, sparse
+        from scipy.sparse import csgraph
+
+        self.ndimage = ndimage
+        self.sparse = sparse
+        self.csgraph = csgraph
+        self.structure = ndimage.generate_binary_structure(2, 1)
+
+    def label_components(
+        self, walkable: np.ndarray
+    ) -> Tuple[np.ndarray, int]:
+        labels, component_count = self.ndimage.label(
+            walkable, structure=self.structure
+        )
+        return (labels - 1).astype(np.int32), int(component_count)
+
+    def flood_fill(
+        self,
+        walkable: np.ndarray,
+        start_coord: Coord,
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        labels, component_count = self.label_components(walkable)
+        labels_flat = labels.ravel()
+        warp_indexes = np.asarray(warp_indexes, dtype=np.int64).reshape(-1, 2)
+        entrance_labels = labels_flat[warp_indexes[:, 0]]
+        exit_labels = labels_flat[warp_indexes[:, 1]]
+
+        start_index = start_coord[0] * walkable.shape[1] + start_coord[1]
+        seed_indexes = list(_adjacent_indexes(start_index, walkable.shape))
+        seed_indexes.extend(
+            warp_indexes[warp_indexes[:, 0] == start_index, 1].tolist()
+        )
+        seed_labels = labels_flat[seed_indexes]
+        if walkable.ravel()[start_index]:
+            seed_labels = np.append(seed_labels, labels_flat[start_index])
+        seed_labels = seed_labels[seed_labels >= 0]
+
+        # The extra node component_count links to every seed component
+        linked = (entrance_labels >= 0) & (exit_labels >= 0)
+        sources = np.concatenate(
+            (
+                entrance_labels[linked],
+                np.full(len(seed_labels), component_count),
+            )
+        )
+        targets = np.concatenate((exit_labels[linked], seed_labels))
+        component_graph = self.sparse.csr_matrix(
+            (np.ones(len(sources), dtype=np.int8), (sources, targets)),
+            shape=(component_count + 1, component_count + 1),
+        )
+        reached_components = self.csgraph.breadth_first_order(
+            component_graph, component_count, return_predecessors=False
+        )
+        component_reached = np.zeros(component_count + 2, dtype=bool)
+        component_reached[reached_components] = True
+        component_reached[component_count] = False
+
+        reachable = component_reached[labels]
+        reachable[start_coord] = True
+        return reachable
+
+    def distance_map(
+        self,
+        walkable: np.ndarray,
+        start_coord: Coord,
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        return self.distance_maps(walkable, [start_coord], warp_indexes)[0]
+
+    def distance_maps(
+        self,
+        walkable: np.ndarray,
+        start_coords: Sequence[Coord],
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        map_size_x, map_size_y = walkable.shape
+        tile_count = map_size_x * map_size_y
+        tile_indexes = np.arange(tile_count).reshape(walkable.shape)
+        walkable_flat = walkable.ravel()
+        start_indexes = np.array(
+            [
+                start_coord[0] * map_size_y + start_coord[1]
+                for start_coord in start_coords
+            ],
+            dtype=np.int64,
+        )
+        if not len(start_indexes):
+            return np.empty((0, *walkable.shape), dtype=np.int32)
+        # Starting tiles are only expanded, they can't be entered unless
+        # walkable so the searches of the other starting tiles are intact
+        expandable = walkable_flat.copy()
+        expandable[start_indexes] = True
+
+        edge_pairs = [
+            (tile_indexes[:, :-1].ravel(), tile_indexes[:, 1:].ravel()),
+            (tile_indexes[:-1, :].ravel(), tile_indexes[1:, :].ravel()),
+        ]
+        sources = []
+        targets = []
+        for first_tiles, second_tiles in edge_pairs:
+            sources.extend((first_tiles, second_tiles))
+            targets.extend((second_tiles, first_tiles))
+        warp_indexes = np.asarray(warp_indexes, dtype=np.int64).reshape(-1, 2)
+        sources.append(warp_indexes[:, 0])
+        targets.append(warp_indexes[:, 1])
+        sources = np.concatenate(sources)
+        targets = np.concatenate(targets)
+        valid = expandable[sources] & walkable_flat[targets]
+
+        tile_graph = self.sparse.csr_matrix(
+            (
+                np.ones(int(valid.sum()), dtype=np.int8),
+                (sources[valid], targets[valid]),
+            ),
+            shape=(tile_count, tile_count),
+        )
+        distances = self.csgraph.shortest_path(
+            tile_graph, unweighted=True, indices=start_indexes
+        )
+        distances[np.isinf(distances)] = -1
+        return distances.astype(np.int32).reshape(
+            (len(start_indexes), *walkable.shape)
+        )
+
+
+class NumbaBackend(KernelBackend):
+    """
+    Numba JIT compiled kernels
+
+    The kernels are compiled on the first call of each signature
+    """
+
+    name = "numba"
+
+    def __init__(self):
+        # pylint: disable=import-outside-toplevel
+        import numba
+
+        self.label_kernel = numba.njit(cache=True)(_label_kernel)
+        self.distance_kernel = numba.njit(cache=True)(_distance_kernel)
+
+    def label_components(
+        self, walkable: np.ndarray
+    ) -> Tuple[np.ndarray, int]:
+        labels, component_count = self.label_kernel(
+            np.ascontiguousarray(walkable.ravel(), dtype=np.bool_),
+            walkable.shape[0],
+            walkable.shape[1],
+        )
+        return labels.reshape(walkable.shape), int(component_count)
+
+    def distance_map(
+        self,
+        walkable: np.ndarray,
+        start_coord: Coord,
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        warp_offsets, warp_exits = _warp_csr(warp_indexes, walkable.size)
+        distances = self.distance_kernel(
+            np.ascontiguousarray(walkable.ravel(), dtype=np.bool_),
+            walkable.shape[0],
+            walkable.shape[1],
+            start_coord[0] * walkable.shape[1] + start_coord[1],
+            warp_offsets,
+            warp_exits,
+        )
+        return distances.reshape(walkable.shape)
+
+    def distance_maps(
+        self,
+        walkable: np.ndarray,
+        start_coords: Sequence[Coord],
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        warp_offsets, warp_exits = _warp_csr(warp_indexes, walkable.size)
+        walkable_flat = np.ascontiguousarray(walkable.ravel(), dtype=np.bool_)
+        distances = np.empty((len(start_coords), *walkable.shape), np.int32)
+        for start_index, start_coord in enumerate(start_coords):
+            distances[start_index] = self.distance_kernel(
+                walkable_flat,
+                walkable.shape[0],
+                walkable.shape[1],
+                start_coord[0] * walkable.shape[1] + start_coord[1],
+                warp_offsets,
+                warp_exits,
+            ).reshape(walkable.shape)
+        return distances
+
+
+class ShardedBackend(KernelBackend):
+    """
+    Component labelling split across worker processes
+
+    The map is cut into horizontal strips of at least min_shard_rows
+    rows. The walkable array and the labels live in shared memory, every
+    worker labels its strips in place with the inner backend, and the
+    strips are stitched with a union-find over the labels facing each
+    other across every strip boundary. The stitched components are then
+    renumbered in row-major order of their first tile, so the labels are
+    identical to a single labelling of the whole map
+
+    Flood fills search the stitched components through the non-adjacent
+    exits (see fill_from_labels). The exits are one-way so they're
+    followed as directed edges rather than merged by the union-find.
+    Distance maps don't split into strips and run on the inner backend
+    > jobs <int>
+        > Worker processes, the strips are labelled in the calling process
+          when set to one
+    > shards <int>
+        > Upper bound on the number of strips
+    > min_shard_rows <int>
+        > Fewest rows of a strip, smaller maps are labelled in one piece
+    > inner <KernelBackend>
+        > Backend labelling every strip and computing the distance maps
+    """
+
+    name = "sharded"
+
+    def __init__(
+        self,
+        jobs: Optional[int] = None,
+        shards: Optional[int] = None,
+        min_shard_rows: int = 16,
+        backend: Union[str, KernelBackend, None] = None,
+    ):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.shards = shards or self.jobs
+        self.min_shard_rows = min_shard_rows
+        if backend is None:
+            self.inner = _preferred_backend()
+        else:
+            self.inner = get_backend(backend)
+        if isinstance(self.inner, ShardedBackend):
+            raise ValueError("ShardedBackend can't label strips with itself")
+        self._executor = None
+
+    def __str__(self) -> str:
+        return (
+            f"KernelBackend {self.name} [{self.inner.name} x {self.jobs}] "
+            f"{id(self)}"
+        )
+
+    def close(self) -> None:
+        """
+        Shuts the worker processes down, they are started again on the
+        next labelling
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def shard_rows(self, map_size_x: int) -> List[Tuple[int, int]]:
+        """
+        (first row, stop row) of every strip of a map with map_size_x rows
+        """
+        shard_count = max(
+            1, min(self.shards, map_size_x // max(self.min_shard_rows, 1))
+        )
+        row_bounds = np.linspace(0, map_size_x, shard_count + 1).astype(int)
+        return list(zip(row_bounds[:-1].tolist(), row_bounds[1:].tolist()))
+
+    def label_components(
+        self, walkable: np.ndarray
+    ) -> Tuple[np.ndarray, int]:
+        shard_rows = self.shard_rows(walkable.shape[0])
+        if len(shard_rows) == 1:
+            return self.inner.label_components(walkable)
+        if self.jobs == 1:
+            labels = np.empty(walkable.shape, dtype=np.int32)
+            shard_counts = [
+                _label_rows(
+                    walkable, labels, row_start, row_stop, self.inner.name
+                )
+                for row_start, row_stop in shard_rows
+            ]
+            return _stitch_shards(labels, shard_rows, shard_counts)
+
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs)
+        walkable_memory = shared_memory.SharedMemory(
+            create=True, size=max(walkable.size, 1)
+        )
+        labels_memory = shared_memory.SharedMemory(
+            create=True, size=max(walkable.size, 1) * 4
+        )
+        try:
+            shared_walkable = np.ndarray(
+                walkable.shape, dtype=np.bool_, buffer=walkable_memory.buf
+            )
+            shared_walkable[:] = walkable
+            shard_counts = list(
+                self._executor.map(
+                    _label_shard,
+                    *zip(
+                        *(
+                            (
+                                walkable_memory.name,
+                                labels_memory.name,
+                                walkable.shape,
+                                row_start,
+                                row_stop,
+                                self.inner.name,
+                            )
+                            for row_start, row_stop in shard_rows
+                        )
+                    ),
+                )
+            )
+            labels = np.ndarray(
+                walkable.shape, dtype=np.int32, buffer=labels_memory.buf
+            ).copy()
+            del shared_walkable
+        finally:
+            for memory in (walkable_memory, labels_memory):
+                memory.close()
+                memory.unlink()
+        return _stitch_shards(labels, shard_rows, shard_counts)
+
+    def distance_map(
+        self,
+        walkable: np.ndarray,
+        start_coord: Coord,
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        return self.inner.distance_map(walkable, start_coord, warp_indexes)
+
+    def distance_maps(
+        self,
+        walkable: np.ndarray,
+        start_coords: Sequence[Coord],
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        return self.inner.distance_maps(walkable, start_coords, warp_indexes)
+
+    def flood_fill(
+        self,
+        walkable: np.ndarray,
+        start_coord: Coord,
+        warp_indexes: np.ndarray = NO_WARPS,
+    ) -> np.ndarray:
+        labels, component_count = self.label_components(walkable)
+        return fill_from_labels(
+            walkable, labels, component_count, start_coord, warp_indexes
+        )
+
+
+def _label_rows(
+    walkable: np.ndarray,
+    labels: np.ndarray,
+    row_start: int,
+    row_stop: int,
+    backend_name: str,
+) -> int:
+    """
+    Labels the strip of rows in place with the named backend, returning
+    the number of components within the strip
+    """
+    shard_labels, component_count = load_backend(
+        backend_name
+    ).label_components(walkable[row_start:row_stop])
+    labels[row_start:row_stop] = shard_labels
+    return component_count
+
+
+def _label_shard(
+    walkable_name: str,
+    labels_name: str,
+    shape: Tuple[int, int],
+    row_start: int,
+    row_stop: int,
+    backend_name: str,
+) -> int:
+    """
+    Worker process entry point labelling a strip of the shared arrays
+    """
+    walkable_memory = shared_memory.SharedMemory(name=walkable_name)
+    labels_memory = shared_memory.SharedMemory(name=labels_name)
+    try:
+        walkable = np.ndarray(
+            shape, dtype=np.bool_, buffer=walkable_memory.buf
+        )
+        labels = np.ndarray(shape, dtype=np.int32, buffer=labels_memory.buf)
+        component_count = _label_rows(
+            walkable, labels, row_start, row_stop, backend_name
+        )
+        del walkable, labels
+    finally:
+        walkable_memory.close()
+        labels_memory.close()
+    return component_count
+
+
+def _stitch_shards(
+    labels: np.ndarray,
+    shard_rows: List[Tuple[int, int]],
+    shard_counts: List[int],
+) -> Tuple[np.ndarray, int]:
+    """
+    Joins the strip labels into labels of the whole map
+
+    The strip labels are offset into a single numbering, the labels
+    facing each other across every boundary are joined by a union-find,
+    and the joined components are renumbered by their first tile
+    """
+    label_offsets = np.cumsum([0] + list(shard_counts))
+    for (row_start, row_stop), label_offset in zip(shard_rows, label_offsets):
+        shard_labels = labels[row_start:row_stop]
+        shard_labels[shard_labels >= 0] += label_offset
+
+    parents = list(range(int(label_offsets[-1])))
+
+    def find(label: int) -> int:
+        while parents[label] != label:
+            parents[label] = parents[parents[label]]
+            label = parents[label]
+        return label
+
+    for row_start, _ in shard_rows[1:]:
+        above = labels[row_start - 1]
+        below = labels[row_start]
+        joined = (above >= 0) & (below >= 0)
+        for above_label, below_label in set(
+            zip(above[joined].tolist(), below[joined].tolist())
+        ):
+            above_root = find(above_label)
+            below_root = find(below_label)
+            if above_root != below_root:
+                parents[max(above_root, below_root)] = min(
+                    above_root, below_root
+                )
+
+    roots = np.array([find(label) for label in range(len(parents))])
+    labels_flat = labels.reshape(-1)
+    walkable_indexes = np.flatnonzero(labels_flat >= 0)
+    tile_roots = roots[labels_flat[walkable_indexes]]
+    unique_roots, first_indexes = np.unique(tile_roots, return_index=True)
+    canonical_labels = np.empty(len(parents), dtype=np.int32)
+    canonical_labels[unique_roots[np.argsort(first_indexes)]] = np.arange(
+        len(unique_roots), dtype=np.int32
+    )
+    labels_flat[walkable_indexes] = canonical_labels[tile_roots]
+    return labels, len(unique_roots)
+
+
+def _adjacent_indexes(tile_index: int, shape: Tuple[int, int]) -> List[int]:
+    """
+    Flat indexes of the in-bounds tiles sharing a border with the tile
+    """
+    row_index, col_index = divmod(tile_index, shape[1])
+    adjacent = []
+    if row_index > 0:
+        adjacent.append(tile_index - shape[1])
+    if row_index < shape[0] - 1:
+        adjacent.append(tile_index + shape[1])
+    if col_index > 0:
+        adjacent.append(tile_index - 1)
+    if col_index < shape[1] - 1:
+        adjacent.append(tile_index + 1)
+    return adjacent
+
+
+def _warp_csr(
+    warp_indexes: np.ndarray, tile_count: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts the (entrance, exit) pairs into compressed sparse row
+    offsets and exits indexed by the entrance
+    """
+    warp_indexes = np.asarray(warp_indexes, dtype=np.int64).reshape(-1, 2)
+    warp_order = np.argsort(warp_indexes[:, 0], kind="stable")
+    warp_counts = np.bincount(warp_indexes[:, 0], minlength=tile_count)
+    warp_offsets = np.zeros(tile_count + 1, dtype=np.int64)
+    np.cumsum(warp_counts, out=warp_offsets[1:])
+    return warp_offsets, np.ascontiguousarray(warp_indexes[warp_order, 1])
+
+
+def _label_kernel(walkable_flat, map_size_x, map_size_y):
+    """
+    Numba kernel labelling the 4-connected components
+    """
+    tile_count = map_size_x * map_size_y
+    labels = np.full(tile_count, -1, dtype=np.int32)
+    search_stack = np.empty(tile_count, dtype=np.int64)
+    component_count = 0
+    for seed_index in range(tile_count):
+        if not walkable_flat[seed_index] or labels[seed_index] >= 0:
+            continue
+        labels[seed_index] = component_count
+        stack_size = 1
+        search_stack[0] = seed_index
+        while stack_size > 0:
+            stack_size -= 1
+            tile_index = search_stack[stack_size]
+            row_index = tile_index // map_size_y
+            col_index = tile_index % map_size_y
+            for neighbor_index in (
+                tile_index - map_size_y if row_index > 0 else -1,
+                tile_index + map_size_y if row_index < map_size_x - 1 else -1,
+                tile_index - 1 if col_index > 0 else -1,
+                tile_index + 1 if col_index < map_size_y - 1 else -1,
+            ):
+                if (
+                    neighbor_index >= 0
+                    and walkable_flat[neighbor_index]
+                    and labels[neighbor_index] < 0
+                ):
+                    labels[neighbor_index] = component_count
+                    search_stack[stack_size] = neighbor_index
+                    stack_size += 1
+        component_count += 1
+    return labels, component_count
+
+
+def _distance_kernel(
+    walkable_flat,
+    map_size_x,
+    map_size_y,
+    start_index,
+    warp_offsets,
+    warp_exits,
+):
+    """
+    Numba kernel for the breadth first search distances
+    """
+    tile_count = map_size_x * map_size_y
+    distances = np.full(tile_count, -1, dtype=np.int32)
+    search_queue = np.empty(tile_count, dtype=np.int64)
+    distances[start_index] = 0
+    search_queue[0] = start_index
+    queue_head = 0
+    queue_tail = 1
+    while queue_head < queue_tail:
+        tile_index = search_queue[queue_head]
+        queue_head += 1
+        next_distance = distances[tile_index] + 1
+        row_index = tile_index // map_size_y
+        col_index = tile_index % map_size_y
+        for neighbor_index in (
+            tile_index - map_size_y if row_index > 0 else -1,
+            tile_index + map_size_y if row_index < map_size_x - 1 else -1,
+            tile_index - 1 if col_index > 0 else -1,
+            tile_index + 1 if col_index < map_size_y - 1 else -1,
+        ):
+            if (
+                neighbor_index >= 0
+                and walkable_flat[neighbor_index]
+                and distances[neighbor_index] < 0
+            ):
+                distances[neighbor_index] = next_distance
+                search_queue[queue_tail] = neighbor_index
+                queue_tail += 1
+        for warp_index in range(
+            warp_offsets[tile_index], warp_offsets[tile_index + 1]
+        ):
+            neighbor_index = warp_exits[warp_index]
+            if walkable_flat[neighbor_index] and distances[neighbor_index] < 0:
+                distances[neighbor_index] = next_distance
+                search_queue[queue_tail] = neighbor_index
+                queue_tail += 1
+    return distances
+
+
+BACKENDS: Dict[str, Type[KernelBackend]] = {
+    PythonBackend.name: PythonBackend,
+    ScipyBackend.name: ScipyBackend,
+    NumbaBackend.name: NumbaBackend,
+    ShardedBackend.name: ShardedBackend,
+}
+_backend_instances: Dict[str, KernelBackend] = {}
+
+
+def register_backend(backend_class: Type[KernelBackend]) -> None:
+    """
+    Registers an additional KernelBackend under its name
+    """
+    BACKENDS[backend_class.name] = backend_class
+    _backend_instances.pop(backend_class.name, None)
+
+
+def load_backend(name: str) -> KernelBackend:
+    """
+    Returns the shared instance of the named backend
+
+    Raises ValueError for unknown backends and ImportError when the
+    libraries the backend depends on aren't installed
+    """
+    backend = _backend_instances.get(name)
+    if backend is None:
+        if name not in BACKENDS:
+            raise ValueError(
+                f"Unknown kernel backend {name!r}, "
+                f"expected one of {sorted(BACKENDS)}"
+            )
+        backend = BACKENDS[name]()
+        _backend_instances[name] = backend
+    return backend
+
+
+def available_backends() -> List[str]:
+    """
+    Names of the registered backends that can be loaded
+    """
+    available = []
+    for name in BACKENDS:
+        try:
+            load_backend(name)
+        except ImportError:
+            continue
+        available.append(name)
+    return available
+
+
+def get_backend(backend: Optional[object] = None) -> KernelBackend:
+    """
+    Resolves the kernel backend to use
+
+    > KernelBackend instance
+        > Returned as is
+    > str
+        > Loaded by name
+    > None
+        > BEEDLE_BACKEND environment variable when set, otherwise the
+          first available backend of BACKEND_PREFERENCE
+    """
+    if isinstance(backend, KernelBackend):
+        return backend
+    if backend is None:
+        backend = os.environ.get("BEEDLE_BACKEND")
+    if backend is not None:
+        return load_backend(backend)
+    return _preferred_backend()
+
+
+def _preferred_backend() -> KernelBackend:
+    """
+    First available backend of BACKEND_PREFERENCE
+    """
+    for name in BACKEND_PREFERENCE:
+        try:
+            return load_backend(name)
+        except ImportError:
+            logger.debug(f"Kernel backend {name} is unavailable")
+    return load_backend(PythonBackend.name)
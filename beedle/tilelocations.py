@@ -14,65 +14,233 @@ Example location dictionary structure
       "reward": []
     }
 
-New transformed location dictionary structure
+New transformed location dictionary structure (FrozenLocation)
     {
       "description": str
       "entrance": Tuple[int, int],
       "exit": Tuple[int, int]
-      "traversal_cost": Set,
-      "reward_cost": Set,
-      "reward": Set
+      "traversal_cost": FrozenSet,
+      "reward_cost": FrozenSet,
+      "reward": FrozenSet
     }
+
+The traversal_cost and reward_cost fields are compiled through
+beedle.tilecost.compile_cost, so they also accept boolean expressions
+such as "Hammer OR Fairy" and hold a CostExpression when they do
+
+Items may carry a count ("SmallKey*2"). The optional "consume" field
+lists the counted items spent when the location is completed, the
+reward and consume fields sum the counts of repeated names. The same
+item may be rewarded by several locations, see LocationMap.reward_index
+
+The LocationMap never modifies the location data passed in. Variants
+of an existing LocationMap are created through LocationMap.with_changes
+which layers the changed entries over the original map so unchanged
+entries are shared rather than rebuilt
 """
 
-from collections import UserDict
-from typing import Any, List, Set, Tuple
+from collections.abc import Mapping
+import hashlib
+import json
+from typing import Any, FrozenSet, Iterable, List, Optional, Tuple
 
 from loguru import logger
 
+from .tilecost import (
+    canonical_cost,
+    compile_cost,
+    item_name,
+    normalize_items,
+    split_count,
+)
+from .tilespatial import SpatialIndex
+from .tiletrace import tracer
+
+Coord = Tuple[int, int]
+
+LOCATION_COORDINATE_FIELDS = ("entrance", "exit")
+LOCATION_ITEM_FIELDS = ("traversal_cost", "reward_cost", "reward")
+LOCATION_COST_FIELDS = ("traversal_cost", "reward_cost")
+LOCATION_COUNTED_FIELDS = ("reward", "consume")
+
+# Maximum number of stacked with_changes layers before a variant
+# collapses the layers into a single dictionary
+MAX_LAYER_DEPTH = 8
+
+HASH_MODULUS = 1 << 256
+
 
-class LocationMap(UserDict):
+class FrozenLocation(dict):
+    """
+    Immutable dictionary storing the transformed location properties
+
+    Remains a dict instance so existing consumers of the location
+    properties are unaffected, but every mutating method raises
+    """
+
+    __slots__ = ("_digest",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._digest = None
+
+    def _immutable(self, *args, **kwargs):
+        frozen_location_msg = (
+            f"Location {self.get('entrance')} is immutable "
+            "Unable to modify stored data\n"
+            f"Passed arguments {args}:{kwargs}"
+        )
+        logger.error(frozen_location_msg)
+        raise AttributeError(frozen_location_msg)
+
+    __setitem__ = _immutable
+    __delitem__ = _immutable
+    __ior__ = _immutable
+    clear = _immutable
+    pop = _immutable
+    popitem = _immutable
+    setdefault = _immutable
+    update = _immutable
+
+    def __reduce__(self):
+        return (FrozenLocation, (dict(self),))
+
+    def __hash__(self) -> int:
+        return int.from_bytes(self.digest[:8], "big")
+
+    @property
+    def digest(self) -> bytes:
+        """
+        SHA-256 digest of the canonical JSON form of the location
+        """
+        if self._digest is None:
+            canonical_location = {
+                key: canonical_cost(value)
+                if isinstance(value, (set, frozenset))
+                else value
+                for key, value in self.items()
+            }
+            self._digest = hashlib.sha256(
+                json.dumps(
+                    canonical_location, sort_keys=True, default=list
+                ).encode("utf-8")
+            ).digest()
+        return self._digest
+
+
+EMPTY_LOCATION = FrozenLocation()
+
+
+def freeze_location(location_entry: Mapping) -> FrozenLocation:
+    """
+    Builds the transformed FrozenLocation from a location entry
+    without modifying the entry passed in
+    """
+    frozen_entry = dict(location_entry)
+    for field_name in LOCATION_COORDINATE_FIELDS:
+        if field_name in frozen_entry:
+            frozen_entry[field_name] = tuple(frozen_entry[field_name])
+    for field_name in LOCATION_ITEM_FIELDS:
+        if field_name in LOCATION_COST_FIELDS:
+            frozen_entry[field_name] = compile_cost(
+                frozen_entry.get(field_name, ())
+            )
+        else:
+            frozen_entry[field_name] = normalize_items(
+                frozen_entry.get(field_name, ())
+            )
+    if "consume" in frozen_entry:
+        frozen_entry["consume"] = normalize_items(frozen_entry["consume"])
+    return FrozenLocation(frozen_entry)
+
+
+class LocationMap(Mapping):
     """
     Creates a custom dictionary for passing in coordinate pairs in
     the forms of tuples to the dictionary to access dictionary values
     that represent location specific data from the map data
-    """
 
-    def __init__(self, location_data: List[dict]):
-        _location_map = self._form_location_map(location_data)
-        super().__init__()
-        for key, value in _location_map.items():
-            super().__setitem__(key, value)
+    The LocationMap is immutable and hashable. The content_hash is
+    stable across processes and independent of the location order,
+    so equal configurations always produce equal hashes
+    """
 
+    def __init__(self, location_data: Iterable[Mapping]):
+        self._parent = None
+        self._depth = 0
+        self._layer = self._form_location_map(location_data)
+        self._size = len(self._layer)
+        self._hash_value = sum(
+            int.from_bytes(location.digest, "big")
+            for location in self._layer.values()
+        ) % HASH_MODULUS
+        self.__flat_data = self._layer
         self.__entrance_locations = None
+        self.__reward_index = None
+        self.__item_indexes = {}
+        self.__spatial_indexes = {}
+
+    @classmethod
+    def _from_layer(
+        cls,
+        parent: "LocationMap",
+        layer: dict,
+        size: int,
+        hash_value: int,
+    ) -> "LocationMap":
+        """
+        Creates a variant stacking the layer of changed entries over the
+        parent LocationMap. A None value within the layer marks a location
+        removed from the parent
+        """
+        variant = cls.__new__(cls)
+        variant._parent = parent
+        variant._depth = parent._depth + 1
+        variant._layer = layer
+        variant._size = size
+        variant._hash_value = hash_value
+        variant.__flat_data = None
+        variant.__entrance_locations = None
+        variant.__reward_index = None
+        variant.__item_indexes = {}
+        variant.__spatial_indexes = {}
+        if variant._depth > MAX_LAYER_DEPTH:
+            variant._layer = variant.data
+            variant._parent = None
+            variant._depth = 0
+        return variant
 
     def __str__(self) -> str:
         location_map_str = f"LocationMap Instance {id(self)}"
         return location_map_str
 
-    def _form_location_map(self, location_data: List[dict]) -> dict:
+    def _form_location_map(self, location_data: Iterable[Mapping]) -> dict:
         """
         Iterates over the locations dictionary transforming
-        (X, Y) -> dict of location specific data
+        (X, Y) -> FrozenLocation of location specific data
         """
         location_map = {}
         for location_entry in location_data:
-            location_entry["entrance"] = tuple(location_entry["entrance"])
-            location_entry["exit"] = tuple(location_entry["exit"])
-
-            location_entry["traversal_cost"] = set(
-                location_entry["traversal_cost"]
-            )
-            location_entry["reward_cost"] = set(location_entry["reward_cost"])
-            location_entry["reward"] = set(location_entry["reward"])
-
-            location_coordinates = location_entry["entrance"]
-            location_map[location_coordinates] = location_entry
-
-            logger.debug(f"Added entry [{location_coordinates}] to {self}")
+            frozen_entry = freeze_location(location_entry)
+            location_coordinates = frozen_entry["entrance"]
+            location_map[location_coordinates] = frozen_entry
+        tracer.count("locationmap.entries", len(location_map))
         return location_map
 
-    def __missing__(self, key: Any) -> dict:
+    def _lookup(self, key: Any) -> Optional[FrozenLocation]:
+        """
+        Walks the stacked layers returning the stored entry or
+        None if the location doesn't exist
+        """
+        location_map = self
+        while location_map is not None:
+            layer = location_map._layer
+            if key in layer:
+                return layer[key]
+            location_map = location_map._parent
+        return None
+
+    def __getitem__(self, key: Any) -> dict:
         """
         Handles the cases where we attempt to access
         additional location properties for tiles
@@ -80,12 +248,48 @@ class LocationMap(UserDict):
 
         Defaults to returning an empty dict
         """
-        default_resp = {}
-        missing_msg = f"Unable to find key {key}"
-        logger.debug(missing_msg)
-        return default_resp
+        try:
+            location = self._lookup(key)
+        except TypeError:
+            location = None
+        if location is None:
+            if tracer.enabled:
+                tracer.event("locationmap.missing", key)
+            return EMPTY_LOCATION
+        return location
+
+    def __contains__(self, key: Any) -> bool:
+        try:
+            return self._lookup(key) is not None
+        except TypeError:
+            return False
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if key in self:
+            return self[key]
+        return default
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __hash__(self) -> int:
+        return self._hash_value >> 192
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, LocationMap):
+            return (
+                self._hash_value == other._hash_value
+                and self._size == other._size
+            )
+        return super().__eq__(other)
+
+    def __reduce__(self):
+        return (LocationMap, (list(self.values()),))
 
-    def __set_item__(self, key: Any, value: Any):
+    def __setitem__(self, key: Any, value: Any):
         frozen_location_msg = (
             f"{self} object is immutable "
             "Unable to modify stored data\n"
@@ -94,30 +298,199 @@ class LocationMap(UserDict):
         logger.error(frozen_location_msg)
         raise AttributeError(frozen_location_msg)
 
-    def __del_item__(self, key: Any, value: Any):
+    def __delitem__(self, key: Any):
         frozen_location_msg = (
             f"{self} object is immutable "
             "Unable to modify stored data\n"
-            f"Passed arguments {key}:{value}"
+            f"Passed arguments {key}"
         )
         logger.error(frozen_location_msg)
         raise AttributeError(frozen_location_msg)
 
     @property
-    def entrance_locations(self) -> Set[Tuple[int, int]]:
+    def content_hash(self) -> str:
+        """
+        Hexadecimal content hash of the stored locations
+
+        Combines the SHA-256 digest of every location by summation so the
+        hash of a variant is derived from its parent in O(changes)
+        """
+        return f"{self._hash_value:064x}"
+
+    @property
+    def data(self) -> dict:
+        """
+        Flattened dictionary of every stored location
+        Variants build the dictionary from their layers on first access
+        """
+        if self.__flat_data is None:
+            layers = []
+            location_map = self
+            while location_map is not None:
+                layers.append(location_map._layer)
+                location_map = location_map._parent
+
+            flat_data = {}
+            for layer in reversed(layers):
+                for key, location in layer.items():
+                    if location is None:
+                        flat_data.pop(key, None)
+                    else:
+                        flat_data[key] = location
+            self.__flat_data = flat_data
+        return self.__flat_data
+
+    def with_changes(
+        self, changes: Mapping[Coord, Optional[Mapping]]
+    ) -> "LocationMap":
+        """
+        Returns a new LocationMap with the changes applied while sharing
+        every unchanged entry with this LocationMap
+
+        changes maps the entrance coordinate to:
+            > None to remove the location
+            > A mapping of the properties to replace. Unspecified
+              properties keep the value of the existing location, so new
+              locations must provide at least the exit
+
+        Runs in O(changes) independent of the number of stored locations
+        """
+        layer = {}
+        size = self._size
+        hash_value = self._hash_value
+        for entrance, location_changes in changes.items():
+            entrance = tuple(entrance)
+            previous_location = self._lookup(entrance)
+            if location_changes is None:
+                if previous_location is None:
+                    raise KeyError(f"Unable to find location {entrance}")
+                layer[entrance] = None
+                size -= 1
+                hash_value -= int.from_bytes(previous_location.digest, "big")
+                continue
+
+            changed_entry = dict(previous_location or {})
+            changed_entry.update(location_changes)
+            changed_entry.setdefault("entrance", entrance)
+            location = freeze_location(changed_entry)
+            if location["entrance"] != entrance:
+                raise ValueError(
+                    f"Location {entrance} can't change entrance to "
+                    f"{location['entrance']}"
+                )
+            if "exit" not in location:
+                raise ValueError(f"New location {entrance} requires an exit")
+
+            layer[entrance] = location
+            if previous_location is None:
+                size += 1
+            else:
+                hash_value -= int.from_bytes(previous_location.digest, "big")
+            hash_value += int.from_bytes(location.digest, "big")
+
+        return LocationMap._from_layer(
+            self, layer, size, hash_value % HASH_MODULUS
+        )
+
+    def changed_locations(self, other: "LocationMap") -> FrozenSet[Coord]:
+        """
+        Returns the entrances whose location differs between this
+        LocationMap and the other LocationMap
+
+        Runs in O(changes) when this LocationMap was derived directly from
+        the other through with_changes
+        """
+        if self._parent is other:
+            return frozenset(self._layer)
+        return frozenset(
+            entrance
+            for entrance in self.data.keys() | other.data.keys()
+            if self._lookup(entrance) != other._lookup(entrance)
+        )
+
+    def with_swapped_rewards(
+        self, location: Coord, other_location: Coord
+    ) -> "LocationMap":
+        """
+        Returns a new LocationMap with the rewards of the two
+        locations exchanged
+        """
+        return self.with_changes(
+            {
+                location: {"reward": self[other_location]["reward"]},
+                other_location: {"reward": self[location]["reward"]},
+            }
+        )
+
+    @property
+    def entrance_locations(self) -> FrozenSet[Tuple[int, int]]:
         """
         Extracts the location entrance from the specified locations
         and transforms it into a set of coordinate locations
-        key_view -> set[tuple]
+        key_view -> frozenset[tuple]
+
+        As the LocationMap is immutable the cached value can't go stale
         """
         if self.__entrance_locations is None:
             logger.debug("Populating __entrance_locations property")
             location_properties = self.data.values()
-            self.__entrance_locations = {
+            self.__entrance_locations = frozenset(
                 location["entrance"] for location in location_properties
-            }
+            )
         return self.__entrance_locations
 
+    def spatial_index(self, field: str = "entrance") -> SpatialIndex:
+        """
+        Returns the SpatialIndex over the "entrance" or "exit" coordinate
+        of every location, with the location entrances as the keys
+
+        Built on first use and cached, as the LocationMap is immutable
+        """
+        if field not in LOCATION_COORDINATE_FIELDS:
+            raise ValueError(
+                f"Unknown coordinate field {field!r}, "
+                f"expected one of {LOCATION_COORDINATE_FIELDS}"
+            )
+        location_index = self.__spatial_indexes.get(field)
+        if location_index is None:
+            location_properties = sorted(
+                self.data.values(), key=lambda location: location["entrance"]
+            )
+            location_index = SpatialIndex(
+                [location[field] for location in location_properties],
+                [location["entrance"] for location in location_properties],
+            )
+            self.__spatial_indexes[field] = location_index
+            logger.debug(f"Populated {location_index} for {field}")
+        return location_index
+
+    @property
+    def reward_index(self) -> Mapping[str, Tuple[Tuple[Coord, int], ...]]:
+        """
+        Maps every rewarded item name to the (entrance, count) pairs of
+        the locations rewarding it, ordered by entrance
+
+        Built on first use and cached, as the LocationMap is immutable
+        """
+        if self.__reward_index is None:
+            reward_index = {}
+            for entrance in sorted(self.data):
+                for reward in self.data[entrance].get("reward", ()):
+                    name, count = split_count(reward)
+                    reward_index.setdefault(name, []).append((entrance, count))
+            self.__reward_index = {
+                name: tuple(sources) for name, sources in reward_index.items()
+            }
+        return self.__reward_index
+
+    def reward_count(self, item: str) -> int:
+        """
+        Total number of copies of the item rewarded across every location
+        """
+        return sum(
+            count for _, count in self.reward_index.get(item_name(item), ())
+        )
+
     def location_search(self, item: str) -> List[Tuple[int, int]]:
         """
         Given an item value to search with in the LocationMap dictionary,
@@ -125,12 +498,11 @@ class LocationMap(UserDict):
         of coordinates that match having the specified item as a
             > {reward, reward_cost, traversal_cost}
 
-        Specific to the reward property, this should be unique to one specific
-        location as multiple of the same reward cannot exist within the logic
-        of the map configuration, so this method always returns a single value
+        Every location rewarding the item is included, see
+        location_reward_sources
         """
         origin_locations = self.location_cost_search(item)
-        origin_locations.append(self.location_reward_search(item))
+        origin_locations.extend(self.location_reward_sources(item))
         return origin_locations
 
     def location_cost_search(self, item: str) -> List[Tuple[int, int]]:
@@ -144,18 +516,26 @@ class LocationMap(UserDict):
         cost_origin_locations.extend(self.location_traversal_cost_search(item))
         return cost_origin_locations
 
+    def location_reward_sources(self, item: str) -> List[Tuple[int, int]]:
+        """
+        Entrances of every location rewarding the item, ignoring the
+        count of a counted item, read from the reward_index
+        """
+        return [
+            entrance
+            for entrance, _ in self.reward_index.get(item_name(item), ())
+        ]
+
     def location_reward_search(self, item: str) -> Tuple[int, int]:
         """
         Given an item value to search with in the LocationMap dictionary,
-        will iterate over all stored locations and return list collection
-        of coordinates that match having the specified item as a
-            > {reward}
+        returns the first location (by entrance) rewarding the item, or
+        an empty list when no location rewards it
 
-        Specific to the reward property, this should be unique to one specific
-        location as multiple of the same reward cannot exist within the logic
-        of the map configuration, so this method always returns a single value
+        Items rewarded by several locations should be looked up through
+        location_reward_sources instead
         """
-        reward_origin_locations = self.__property_search("reward", item)
+        reward_origin_locations = self.location_reward_sources(item)
         if reward_origin_locations:
             reward_origin_locations = reward_origin_locations[0]
         return reward_origin_locations
@@ -193,10 +573,24 @@ class LocationMap(UserDict):
         Base method for searching through the location properties stored
         as keys to the LocationMap underlying dict
 
+        Counted items match any count of the same item name. The item
+        name -> locations index of every property is built on first use
+
         Returns all coordinates that matched in a list collection
         """
-        found_locations = []
-        for location_coordinates, location_properties in self.data.items():
-            if item in location_properties.get(property_name, []):
-                found_locations.append(location_coordinates)
-        return found_locations
+        property_index = self.__item_indexes.get(property_name)
+        if property_index is None:
+            property_index = {}
+            for location_coordinates, location_properties in self.data.items():
+                location_names = {
+                    item_name(property_item)
+                    for property_item in location_properties.get(
+                        property_name, ()
+                    )
+                }
+                for name in location_names:
+                    property_index.setdefault(name, []).append(
+                        location_coordinates
+                    )
+            self.__item_indexes[property_name] = property_index
+        return list(property_index.get(item_name(item), ()))
@@ -7,15 +7,18 @@ Maps (xcoord, ycoord) -> TileNode
 """
 
 from collections import UserDict
+import hashlib
 import itertools
-from typing import Any, Tuple
+from typing import Any, Iterable, Optional, Set, Tuple, Union
 
 from loguru import logger
 import numpy as np
 
 from .exceptions import TileMapIndexError
+from .tileconfig import TileTable
 from .tilelocations import LocationMap
 from .tilenode import TileNode
+from .tiletrace import tracer
 
 
 class TileMap(UserDict):
@@ -27,14 +30,28 @@ class TileMap(UserDict):
     """
 
     def __init__(
-        self, map_data: np.array, location_map: LocationMap, tile_table: dict
+        self,
+        map_data: np.array,
+        location_map: LocationMap,
+        tile_table: Union[dict, TileTable],
     ):
         map_dim = map_data.shape
         self.map_size_x = map_dim[0]
         self.map_size_y = map_dim[1]
 
-        _tile_map = self._form_tile_map(map_data, location_map, tile_table)
-        super().__init__(_tile_map)
+        if not isinstance(tile_table, TileTable):
+            tile_table = TileTable(tile_table)
+        tile_table.validate_map(map_data)
+        self.tile_table = tile_table
+        self.location_map = location_map
+        self.dirty_tiles = set()
+        self._content_hash = None
+
+        with tracer.phase("tilemap.form"):
+            _tile_map = self._form_tile_map(
+                map_data, location_map, tile_table
+            )
+            super().__init__(_tile_map)
 
     def __str__(self) -> str:
         map_data_repr = f"[{self.map_size_x, self.map_size_y}]"
@@ -42,22 +59,31 @@ class TileMap(UserDict):
         return tilemap_str
 
     def _form_tile_map(
-        self, map_data: np.array, location_map: LocationMap, tile_table
+        self,
+        map_data: np.array,
+        location_map: LocationMap,
+        tile_table: TileTable,
     ) -> dict:
         """
         Iterates over the coordinates of the map based off dimensions and
         creates a graph with the associated map logic for
         transforming (X, Y) -> TileNode()
+
+        The tile properties are read from the dense TileTable indexed
+        directly by the tile value, which has already been validated
+        against the map data
         """
         tile_map = {}
+        tile_properties_table = tile_table.properties
+        map_rows = map_data.tolist()
         map_axis_x = range(self.map_size_x)
         map_axis_y = range(self.map_size_y)
         map_traversal = itertools.product(map_axis_x, map_axis_y)
         for (row_index, col_index) in map_traversal:
             tile_coord = (row_index, col_index)
-            tile_value = map_data[tile_coord]
+            tile_value = map_rows[row_index][col_index]
             location_properties = location_map[tile_coord]
-            tile_properties = tile_table[str(tile_value)]
+            tile_properties = tile_properties_table[tile_value]
 
             tile_node = TileNode(
                 tile_coord,
@@ -68,7 +94,7 @@ class TileMap(UserDict):
             )
 
             tile_map[tile_coord] = tile_node
-            logger.debug(f"Added new TileNode@{self}+{tile_node}")
+        tracer.count("tilemap.tile_nodes", len(tile_map))
         return tile_map
 
     def __missing__(self, key: Any):
@@ -97,3 +123,87 @@ class TileMap(UserDict):
         else:
             logger.error(f"Invalid input to {self}")
             raise TileMapIndexError(self, key, value)
+
+    def set_tile(self, tile_coord: Tuple[int, int], tile_value: int) -> None:
+        """
+        Replaces the tile value stored at the coordinate, rebuilding the
+        TileNode and marking the tile as dirty
+        """
+        tile_node = TileNode(
+            tile_coord,
+            tile_value,
+            (self.map_size_x, self.map_size_y),
+            self.location_map[tile_coord],
+            self.tile_table[tile_value],
+        )
+        self[tile_coord] = tile_node
+        self.dirty_tiles.add(tile_coord)
+        self._content_hash = None
+        if tracer.enabled:
+            tracer.event("tilemap.set_tile", tile_coord, tile_value)
+
+    def update_locations(
+        self,
+        location_map: LocationMap,
+        changed_locations: Optional[Iterable[Tuple[int, int]]] = None,
+    ) -> None:
+        """
+        Switches the TileMap over to a modified LocationMap, rebuilding
+        the TileNode of every changed location and marking them as dirty
+
+        If the changed locations aren't provided they're determined by
+        comparing the LocationMap against the current one
+        """
+        if changed_locations is None:
+            changed_locations = location_map.changed_locations(
+                self.location_map
+            )
+        self.location_map = location_map
+        self._content_hash = None
+        for location in changed_locations:
+            tile_node = self[location]
+            self.data[location] = TileNode(
+                location,
+                tile_node.identifier,
+                (self.map_size_x, self.map_size_y),
+                location_map[location],
+                self.tile_table[tile_node.identifier],
+            )
+            self.dirty_tiles.add(location)
+            if tracer.enabled:
+                tracer.event("tilemap.update_location", location)
+
+    @property
+    def content_hash(self) -> str:
+        """
+        Hexadecimal sha256 of the map dimensions, the tile value of every
+        tile, the TileTable and the LocationMap content hash
+
+        Computed on first use and recomputed after set_tile or
+        update_locations modify the TileMap
+        """
+        if self._content_hash is None:
+            map_coords = itertools.product(
+                range(self.map_size_x), range(self.map_size_y)
+            )
+            tile_values = np.fromiter(
+                (self.data[map_coord].identifier for map_coord in map_coords),
+                dtype=np.int64,
+                count=self.map_size_x * self.map_size_y,
+            )
+            map_hash = hashlib.sha256()
+            map_hash.update(f"{self.map_size_x}x{self.map_size_y}".encode())
+            map_hash.update(tile_values.tobytes())
+            map_hash.update(self.tile_table.content_hash.encode())
+            map_hash.update(self.location_map.content_hash.encode())
+            self._content_hash = map_hash.hexdigest()
+        return self._content_hash
+
+    def pop_dirty_tiles(self) -> Set[Tuple[int, int]]:
+        """
+        Returns the coordinates modified since the last call
+        and resets the dirty tracking
+        """
+        dirty_tiles = self.dirty_tiles
+        self.dirty_tiles = set()
+        return dirty_tiles
@@ -9,6 +9,8 @@ data based off the configuration
 import operator
 from typing import Tuple
 
+from .tilecost import conjunction
+
 
 class TileNode:
     """
@@ -48,6 +50,9 @@ class TileNode:
           the designated tile
           No reward is represented by '|'.
           Multiple rewards may be available on the tile
+    > consume <frozenset>
+        > Counted items spent from the inventory when the location on the
+          tile is completed, empty for most tiles
     > edges <tuple>
         > Collection of nodes that connect the current TileNode to
           other TileNodes on the may for traversal
@@ -67,6 +72,7 @@ class TileNode:
         self.description = location_properties.get("description", None)
         self.reward_cost = location_properties.get("reward_cost", set())
         self.reward = location_properties.get("reward", set())
+        self.consume = location_properties.get("consume", frozenset())
         self.traversal_cost = self.__determine_traversal_cost(
             location_properties, tile_properties
         )
@@ -112,7 +118,7 @@ class TileNode:
 
     def __determine_traversal_cost(
         self, location_properties: dict, tile_properties: dict
-    ) -> set:
+    ) -> frozenset:
         """
         Determines the traversal cost of a node based off three factors:
             > LocationMap entry for "traversal_cost"
@@ -122,15 +128,14 @@ class TileNode:
             > Whether the tile is walkable or not
                 > Tiles with an unwalkable traversal_cost use "unwalkable"
                 as the only entry in the "traversal_cost" field
+
+        Both costs have to be met, so costs holding alternatives are
+        combined through beedle.tilecost.conjunction
         """
-        traversal_cost = set()
-        traversal_cost.update(location_properties.get("traversal_cost", set()))
+        location_cost = location_properties.get("traversal_cost", frozenset())
         if tile_properties["WALKABLE"]:
-            base_traversal_cost = set(tile_properties["BASE_COST"])
-            traversal_cost.update(base_traversal_cost)
-        else:
-            traversal_cost.add("unwalkable")
-        return traversal_cost
+            return conjunction(location_cost, tile_properties["BASE_COST"])
+        return conjunction(location_cost, ("unwalkable",))
 
     def __get_node_edges(
         self, map_size: Tuple[int, int], exit_edge: Tuple[int, int]
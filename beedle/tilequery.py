@@ -0,0 +1,529 @@
+"""
+Reachability queries answered from precomputed component labels
+
+Rather than flood filling the TileMap for every question, the walkable
+tiles for an inventory are labelled into connected components once.
+Non-adjacent exits become edges between components, so a query reduces
+to a label lookup and a bit test against the components reachable from
+the starting tile
+
+The answers match the discovered tiles of a PartialTileMap built from
+the same starting coordinate and inventory
+
+The label lookups are shared with the MapSnapshot through two bases
+> ComponentClosures, the closure lookups of a labelling, subclassed by
+  ComponentLabels and the read-only FrozenLabels
+> LabelQueries, the questions answered from the labelling of an
+  inventory, subclassed by ReachabilityQuery and MapSnapshot
+"""
+
+from collections import OrderedDict, deque
+from typing import FrozenSet, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .exceptions import TileMapIndexError
+from .tilegrid import TileGrid
+from .tilekernels import (
+    KernelBackend,
+    get_backend,
+    reverse_fill_from_labels,
+)
+from .tilelocations import LocationMap
+from .tilemap import TileMap
+
+
+Coord = Tuple[int, int]
+
+
+class ComponentClosures:
+    """
+    Closure lookups shared by the component labellings, subclasses hold
+    > tile_grid <TileGrid>
+        > TileGrid the labelling was computed from
+    > walkable <np.ndarray[bool]>
+        > Tiles traversable with the inventory
+    > labels <np.ndarray[int32]>
+        > Component index of every walkable tile, -1 otherwise
+    > component_count <int>
+        > Number of component indexes in use
+    along with closure(component)
+    """
+
+    __slots__ = ()
+
+    def closure(self, component: int) -> int:
+        """
+        Returns the bitmask of every component reachable from the
+        component, including the component itself
+        """
+        raise NotImplementedError
+
+    def reachable_components(self, start_coord: Coord) -> int:
+        """
+        Returns the bitmask of the components reachable from the
+        starting coordinate
+
+        The starting tile itself doesn't need to be walkable, matching
+        the floodfill which always discovers the starting tile
+        """
+        if self.walkable[start_coord]:
+            return self.closure(int(self.labels[start_coord]))
+
+        component_mask = 0
+        for neighbor in self.tile_grid.neighbors(start_coord):
+            if self.walkable[neighbor]:
+                component_mask |= self.closure(int(self.labels[neighbor]))
+        return component_mask
+
+    def component_array(self, component_mask: int) -> np.ndarray:
+        """
+        Converts the component bitmask into a new boolean array indexed
+        by the component labels
+
+        The array holds one extra False entry at the end, so indexing
+        it with the -1 label of an unwalkable tile returns False
+        """
+        mask_bytes = component_mask.to_bytes(
+            self.component_count // 8 + 1, "little"
+        )
+        return np.unpackbits(
+            np.frombuffer(mask_bytes, dtype=np.uint8), bitorder="little"
+        )[: self.component_count + 1].astype(bool)
+
+
+class ComponentLabels(ComponentClosures):
+    """
+    Connected component labelling of the TileGrid for one inventory
+    > inventory_mask <int>
+        > TileGrid bitmask of the inventory used for the labelling
+    > walkable <np.ndarray[bool]>
+        > Tiles traversable with the inventory
+    > labels <np.ndarray[int32]>
+        > Component index of every walkable tile, -1 otherwise
+    > component_edges <dict>
+        > Component index -> set of component indexes connected through
+          the non-adjacent exits of the map
+    > backend <KernelBackend>
+        > Kernel backend labelling the components
+    """
+
+    def __init__(
+        self,
+        tile_grid: TileGrid,
+        inventory_mask: int,
+        backend: Union[str, KernelBackend, None] = None,
+    ):
+        self.tile_grid = tile_grid
+        self.inventory_mask = inventory_mask
+        self.backend = get_backend(backend)
+        self.walkable = tile_grid.traversable(inventory_mask)
+        self.labels, self.component_count = self.backend.label_components(
+            self.walkable
+        )
+        self.__connect_components()
+
+    def __connect_components(self) -> None:
+        """
+        Forms the component_edges from the warps of the TileGrid and
+        resets the cached closures
+        """
+        self.component_edges = {}
+        for warp_entrance, warp_exit in self.tile_grid.warps:
+            if self.walkable[warp_entrance] and self.walkable[warp_exit]:
+                entrance_label = int(self.labels[warp_entrance])
+                exit_label = int(self.labels[warp_exit])
+                if entrance_label != exit_label:
+                    self.component_edges.setdefault(
+                        entrance_label, set()
+                    ).add(exit_label)
+
+        self._closures = {}
+        self._component_arrays = {}
+
+    def update_tiles(self, tile_coords: Iterable[Coord]) -> None:
+        """
+        Patches the labelling after the TileGrid has been updated
+
+        Tiles that become walkable merge the components surrounding them,
+        while tiles that become unwalkable relabel only the component they
+        belonged to within its bounding box. Component indexes emptied by
+        a merge are left unused rather than renumbering the labels
+        """
+        walkable = self.tile_grid.traversable(self.inventory_mask)
+        labels = self.labels.copy()
+        for tile_coord in tile_coords:
+            if walkable[tile_coord] == self.walkable[tile_coord]:
+                continue
+            if walkable[tile_coord]:
+                self.__merge_tile(labels, tile_coord)
+            else:
+                self.__split_tile(labels, tile_coord)
+        self.walkable = walkable
+        self.labels = labels
+        self.__connect_components()
+
+    def __merge_tile(self, labels: np.ndarray, tile_coord: Coord) -> None:
+        """
+        Labels the newly walkable tile, joining every labelled
+        adjacent component into a single component
+        """
+        neighbor_labels = set()
+        for neighbor in self.tile_grid.adjacent(tile_coord):
+            if labels[neighbor] >= 0:
+                neighbor_labels.add(int(labels[neighbor]))
+        if not neighbor_labels:
+            labels[tile_coord] = self.component_count
+            self.component_count += 1
+            return
+
+        component = min(neighbor_labels)
+        labels[tile_coord] = component
+        if len(neighbor_labels) > 1:
+            labels[np.isin(labels, list(neighbor_labels))] = component
+
+    def __split_tile(self, labels: np.ndarray, tile_coord: Coord) -> None:
+        """
+        Removes the newly unwalkable tile from its component, relabelling
+        the remaining tiles of the component within its bounding box
+        """
+        component = int(labels[tile_coord])
+        labels[tile_coord] = -1
+        component_tiles = labels == component
+        rows = np.flatnonzero(component_tiles.any(axis=1))
+        if len(rows) == 0:
+            return
+        cols = np.flatnonzero(component_tiles.any(axis=0))
+        bounds = (
+            slice(rows[0], rows[-1] + 1),
+            slice(cols[0], cols[-1] + 1),
+        )
+        box_labels, box_count = self.backend.label_components(
+            component_tiles[bounds]
+        )
+        box_labels = np.where(
+            box_labels > 0, box_labels + self.component_count - 1, box_labels
+        )
+        box_labels[box_labels == 0] = component
+        labels[bounds] = np.where(
+            component_tiles[bounds], box_labels, labels[bounds]
+        )
+        self.component_count += box_count - 1
+
+    def closure(self, component: int) -> int:
+        """
+        Returns the bitmask of every component reachable from the
+        component, including the component itself
+        """
+        component_closure = self._closures.get(component)
+        if component_closure is None:
+            component_closure = 1 << component
+            search_queue = deque([component])
+            while search_queue:
+                current_component = search_queue.pop()
+                for next_component in self.component_edges.get(
+                    current_component, ()
+                ):
+                    if not component_closure >> next_component & 1:
+                        component_closure |= 1 << next_component
+                        search_queue.append(next_component)
+            self._closures[component] = component_closure
+        return component_closure
+
+    def component_array(self, component_mask: int) -> np.ndarray:
+        """
+        Converts the component bitmask into a boolean array indexed
+        by the component labels, cached per bitmask
+        """
+        cached_array = self._component_arrays.get(component_mask)
+        if cached_array is None:
+            cached_array = super().component_array(component_mask)
+            self._component_arrays[component_mask] = cached_array
+        return cached_array
+
+
+class LabelQueries:
+    """
+    Reachability questions answered from the ComponentClosures of an
+    inventory, subclasses hold
+    > location_index <SpatialIndex>
+        > SpatialIndex of the location entrances
+    > location_coords <Sequence[Tuple[int, int]]>
+        > Sorted location entrances
+    > _location_indexes <np.ndarray[int64]>
+        > Flat map index of every location_coords entrance
+    along with _labels(item_inventory) returning the ComponentClosures
+    and _check_coord(coord) raising the TileMapIndexError
+    """
+
+    __slots__ = ()
+
+    def _labels(self, item_inventory: Iterable[str]) -> ComponentClosures:
+        """
+        Returns the component labelling of the inventory
+        """
+        raise NotImplementedError
+
+    def _check_coord(self, coord: Coord) -> None:
+        """
+        Raises the TileMapIndexError for coordinates outside the map
+        """
+        raise NotImplementedError
+
+    def is_reachable(
+        self,
+        start_coord: Coord,
+        end_coord: Coord,
+        item_inventory: Optional[Iterable[str]] = None,
+    ) -> bool:
+        """
+        Checks whether the end coordinate is discovered when exploring
+        from the start coordinate with the inventory
+        """
+        self._check_coord(start_coord)
+        self._check_coord(end_coord)
+        if start_coord == end_coord:
+            return True
+
+        labels = self._labels(item_inventory or ())
+        if not labels.walkable[end_coord]:
+            return False
+        component_mask = labels.reachable_components(start_coord)
+        return bool(component_mask >> int(labels.labels[end_coord]) & 1)
+
+    def reachable_tiles(
+        self,
+        start_coord: Coord,
+        item_inventory: Optional[Iterable[str]] = None,
+    ) -> np.ndarray:
+        """
+        Returns the boolean array of every tile discovered when exploring
+        from the start coordinate with the inventory
+        """
+        self._check_coord(start_coord)
+        labels = self._labels(item_inventory or ())
+        component_array = labels.component_array(
+            labels.reachable_components(start_coord)
+        )
+        reachable = component_array[labels.labels]
+        reachable[start_coord] = True
+        return reachable
+
+    def reachable_locations(
+        self,
+        start_coord: Coord,
+        item_inventory: Optional[Iterable[str]] = None,
+    ) -> FrozenSet[Coord]:
+        """
+        Returns the location entrances discovered when exploring from
+        the start coordinate with the inventory
+        """
+        self._check_coord(start_coord)
+        labels = self._labels(item_inventory or ())
+        component_array = labels.component_array(
+            labels.reachable_components(start_coord)
+        )
+        location_labels = labels.labels.ravel()[self._location_indexes]
+        reached = component_array[location_labels]
+
+        reachable_locations = {
+            self.location_coords[location_index]
+            for location_index in np.flatnonzero(reached).tolist()
+        }
+        if self._is_location(start_coord, labels.labels.shape[1]):
+            reachable_locations.add(start_coord)
+        return frozenset(reachable_locations)
+
+    def reaching_tiles(
+        self, end_coord: Coord, item_inventory: Optional[Iterable[str]] = None
+    ) -> np.ndarray:
+        """
+        Returns the boolean array of every tile from which exploring with
+        the inventory discovers the end coordinate
+
+        The reverse of reachable_tiles, the two only differ once the map
+        holds one-way exits
+        """
+        self._check_coord(end_coord)
+        labels = self._labels(item_inventory or ())
+        return reverse_fill_from_labels(
+            labels.walkable,
+            labels.labels,
+            labels.component_count,
+            end_coord,
+            labels.tile_grid.warp_indexes,
+        )
+
+    def nearest_reachable_locations(
+        self,
+        start_coord: Coord,
+        item_inventory: Optional[Iterable[str]] = None,
+        k: int = 1,
+        origin: Optional[Coord] = None,
+        metric: str = "manhattan",
+    ) -> List[Tuple[Coord, float]]:
+        """
+        Returns the (location, distance) pairs of the k location entrances
+        closest to the origin among those discovered when exploring from
+        the start coordinate, closest first
+
+        The origin defaults to the start coordinate and the distance is
+        measured on the map rather than along the explored path
+        """
+        reachable_tiles = self.reachable_tiles(start_coord, item_inventory)
+        return self.location_index.nearest(
+            start_coord if origin is None else origin,
+            k=k,
+            metric=metric,
+            reachable=reachable_tiles,
+        )
+
+    def _is_location(self, coord: Coord, map_size_y: int) -> bool:
+        """
+        Checks whether the coordinate is one of the location entrances
+        """
+        flat_index = coord[0] * map_size_y + coord[1]
+        location_index = np.searchsorted(self._location_indexes, flat_index)
+        return bool(
+            location_index < len(self._location_indexes)
+            and self._location_indexes[location_index] == flat_index
+        )
+
+
+class ReachabilityQuery(LabelQueries):
+    """
+    Answers reachability questions for a TileMap
+
+    Component labels are computed lazily per inventory and cached, with
+    the labels for every inventory of a TileGraph progression computed
+    up front when a TileGraph is provided
+
+    Inventories are reduced to the items referenced by a traversal_cost
+    before the cache lookup, so inventories differing only in irrelevant
+    items share the same labels
+
+    Edits made through TileMap.set_tile or TileMap.update_locations are
+    picked up by refresh, which patches the cached labels rather than
+    discarding them
+
+    The labelling runs on the kernel backend selected by get_backend
+    """
+
+    def __init__(
+        self,
+        tile_map: TileMap,
+        location_map: LocationMap,
+        tile_graph=None,
+        cache_size: int = 128,
+        backend: Union[str, KernelBackend, None] = None,
+    ):
+        self.tile_map = tile_map
+        self.tile_grid = TileGrid(tile_map)
+        self.backend = get_backend(backend)
+        self.cache_size = cache_size
+        self._component_labels = OrderedDict()
+
+        self.__index_locations(location_map)
+
+        if tile_graph is not None:
+            for item_inventory in tile_graph.inventory_order:
+                self.component_labels(item_inventory)
+
+    def __str__(self) -> str:
+        return (
+            f"ReachabilityQuery Instance "
+            f"[{len(self._component_labels)} labellings] {id(self)}"
+        )
+
+    def refresh(self, location_map: Optional[LocationMap] = None) -> None:
+        """
+        Applies the tiles modified on the TileMap since the last refresh
+        to the TileGrid and patches every cached labelling in place
+
+        The location entrances are reloaded when the LocationMap is given
+        """
+        dirty_tiles = self.tile_map.pop_dirty_tiles()
+        if dirty_tiles:
+            changed_tiles = self.tile_grid.update_tiles(
+                self.tile_map, dirty_tiles
+            )
+            for labels in self._component_labels.values():
+                labels.update_tiles(changed_tiles)
+        if location_map is not None:
+            self.__index_locations(location_map)
+
+    def __index_locations(self, location_map: LocationMap) -> None:
+        """
+        Stores the sorted location entrances along with their flat indexes
+        and the SpatialIndex of the entrances
+        """
+        self.location_index = location_map.spatial_index()
+        self.location_coords = sorted(location_map.entrance_locations)
+        self._location_indexes = np.array(
+            [
+                coord[0] * self.tile_grid.shape[1] + coord[1]
+                for coord in self.location_coords
+            ],
+            dtype=np.int64,
+        )
+
+    def component_labels(
+        self, item_inventory: Iterable[str]
+    ) -> ComponentLabels:
+        """
+        Returns the cached ComponentLabels for the inventory, labelling
+        the TileGrid if the inventory hasn't been seen before
+        """
+        inventory_mask = self.tile_grid.inventory_mask(item_inventory)
+        labels = self._component_labels.get(inventory_mask)
+        if labels is None:
+            labels = ComponentLabels(
+                self.tile_grid, inventory_mask, backend=self.backend
+            )
+            self._component_labels[inventory_mask] = labels
+            if len(self._component_labels) > self.cache_size:
+                self._component_labels.popitem(last=False)
+        else:
+            self._component_labels.move_to_end(inventory_mask)
+        return labels
+
+    _labels = component_labels
+
+    def _check_coord(self, coord: Coord) -> None:
+        """
+        Raises the TileMapIndexError for coordinates outside the map
+        """
+        if not (isinstance(coord, tuple) and self.tile_grid.in_bounds(coord)):
+            raise TileMapIndexError(self.tile_map, coord, None)
+
+    def soft_lock_tiles(
+        self,
+        graph_start: Coord,
+        graph_end: Coord,
+        item_inventory: Optional[Iterable[str]] = None,
+    ) -> np.ndarray:
+        """
+        Returns the boolean array of the tiles reachable from graph_start
+        with the inventory from which neither graph_start nor graph_end
+        can be reached again
+
+        Entering such a tile without the items needed to leave it ends
+        the progression
+        """
+        return (
+            self.reachable_tiles(graph_start, item_inventory)
+            & ~self.reaching_tiles(graph_start, item_inventory)
+            & ~self.reaching_tiles(graph_end, item_inventory)
+        )
+
+    def soft_locks(self, tile_graph) -> List[np.ndarray]:
+        """
+        Returns the soft_lock_tiles of every chunk of the TileGraph,
+        using the inventory held at the start of the chunk
+        """
+        return [
+            self.soft_lock_tiles(
+                tile_graph.graph_start, tile_graph.graph_end, item_inventory
+            )
+            for item_inventory in tile_graph.inventory_order
+        ]
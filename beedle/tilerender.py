@@ -0,0 +1,313 @@
+"""
+Rendering the map data into RGB images without a plotting library
+
+Tile values are converted to colors through a dense lookup table indexed
+by the tile value, so colorizing the map is a single array indexing
+operation. The images are encoded as PNG files directly through zlib
+
+Overlays drawn on top of the map
+> chunks
+    > Tiles first reached during each TileGraph search chunk, tinted
+      with a distinct color per chunk
+> locations
+    > Entrances of the LocationMap
+> bottlenecks
+    > Reward and cost locations of the TileGraph bottlenecks
+
+Large maps can be split into a zoom pyramid of fixed size image tiles
+where every level halves the resolution of the previous one
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import math
+from pathlib import Path
+import struct
+from typing import Iterable, List, Mapping, Optional, Tuple, Union
+import zlib
+
+from loguru import logger
+import numpy as np
+
+from .exceptions import ConfigurationError
+from .tileconfig import TileTable
+
+
+Coord = Tuple[int, int]
+PathLike = Union[str, Path]
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+LOCATION_COLOR = "#ff00ff"
+BOTTLENECK_REWARD_COLOR = "#ff2020"
+BOTTLENECK_COST_COLOR = "#ffff00"
+UNDEFINED_COLOR = "#000000"
+
+
+def parse_color(color: str) -> Tuple[int, int, int]:
+    """
+    Converts a "#rrggbb" hex string into an (r, g, b) tuple
+    """
+    hex_value = color.lstrip("#")
+    if len(hex_value) != 6:
+        raise ConfigurationError([f"Invalid color {color!r}"])
+    try:
+        return tuple(
+            int(hex_value[index : index + 2], 16) for index in (0, 2, 4)
+        )
+    except ValueError as color_error:
+        raise ConfigurationError([f"Invalid color {color!r}"]) from color_error
+
+
+def color_lookup(
+    color_definitions: Optional[Mapping[str, dict]] = None,
+    tile_table: Optional[Union[dict, TileTable]] = None,
+) -> np.ndarray:
+    """
+    Builds the (tile count, 3) uint8 lookup table converting tile values
+    into RGB colors
+
+    Colors come from the "COLOR" field of the tile configuration and are
+    overridden by the color definitions used by tools/visualize_map.py
+    > color_definitions
+        > {"MAP_TILE_DESCRIPTION": {"index": <int>, "color": <str>}, ...}
+    """
+    tile_colors = {}
+    if tile_table is not None:
+        if not isinstance(tile_table, TileTable):
+            tile_table = TileTable(tile_table)
+        for tile_value, tile_properties in enumerate(tile_table.properties):
+            if tile_properties is not None:
+                tile_colors[tile_value] = tile_properties["COLOR"]
+    for color_definition in (color_definitions or {}).values():
+        tile_colors[int(color_definition["index"])] = color_definition["color"]
+    if not tile_colors:
+        raise ConfigurationError(["No tile colors were provided"])
+
+    lookup = np.empty((max(tile_colors) + 1, 3), dtype=np.uint8)
+    lookup[:] = parse_color(UNDEFINED_COLOR)
+    for tile_value, tile_color in tile_colors.items():
+        lookup[tile_value] = parse_color(tile_color)
+    return lookup
+
+
+def chunk_palette(chunk_count: int) -> np.ndarray:
+    """
+    Returns chunk_count distinct (r, g, b) colors spreading the hues
+    around the color wheel by the golden ratio
+    """
+    hue = (np.arange(chunk_count) * 0.618033988749895) % 1.0
+    saturation, value = 0.85, 0.95
+    sector = np.floor(hue * 6).astype(int) % 6
+    fraction = hue * 6 - np.floor(hue * 6)
+    p_value = np.full(chunk_count, value * (1 - saturation))
+    q_value = value * (1 - fraction * saturation)
+    t_value = value * (1 - (1 - fraction) * saturation)
+    v_value = np.full(chunk_count, value)
+    sector_channels = (
+        (v_value, q_value, p_value, p_value, t_value, v_value),
+        (t_value, v_value, v_value, q_value, p_value, p_value),
+        (p_value, p_value, t_value, v_value, v_value, q_value),
+    )
+    palette = np.stack(
+        [np.choose(sector, channel) for channel in sector_channels], axis=1
+    )
+    return np.round(palette * 255).astype(np.uint8)
+
+
+def chunk_regions(tile_graph, reachability) -> np.ndarray:
+    """
+    Labels every tile with the index of the TileGraph search chunk that
+    first reached it, -1 for the tiles never reached
+
+    The reachable tiles of each chunk are read from the ReachabilityQuery
+    using the inventory the TileGraph held at the start of the chunk
+    """
+    regions = np.full(reachability.tile_grid.shape, -1, dtype=np.int32)
+    for chunk_index, item_inventory in enumerate(tile_graph.inventory_order):
+        reachable_tiles = reachability.reachable_tiles(
+            tile_graph.graph_start, item_inventory
+        )
+        regions[reachable_tiles & (regions < 0)] = chunk_index
+    return regions
+
+
+def render_map(
+    map_data: np.ndarray,
+    lookup: np.ndarray,
+    regions: Optional[np.ndarray] = None,
+    locations: Iterable[Coord] = (),
+    bottlenecks: Optional[Mapping[Coord, Iterable[Coord]]] = None,
+    tile_scale: int = 1,
+    alpha: float = 0.45,
+) -> np.ndarray:
+    """
+    Renders the map data into a (rows, cols, 3) uint8 RGB image
+
+    > regions
+        > Chunk index per tile from chunk_regions, blended on top of the
+          tile colors with the alpha opacity
+    > locations
+        > Coordinates drawn with LOCATION_COLOR
+    > bottlenecks
+        > TileGraph.bottlenecks, reward locations drawn with
+          BOTTLENECK_REWARD_COLOR and cost locations with
+          BOTTLENECK_COST_COLOR
+    > tile_scale
+        > Width in pixels of a single tile
+    """
+    if map_data.min() < 0 or map_data.max() >= len(lookup):
+        raise ConfigurationError(
+            ["Map data contains tile values without a color"]
+        )
+    image = lookup[map_data]
+
+    if regions is not None and (regions >= 0).any():
+        palette = chunk_palette(int(regions.max()) + 1)
+        reached = regions >= 0
+        image[reached] = np.round(
+            image[reached] * (1 - alpha) + palette[regions[reached]] * alpha
+        ).astype(np.uint8)
+
+    markers = [(locations, LOCATION_COLOR)]
+    if bottlenecks:
+        cost_locations = set()
+        for cost_group in bottlenecks.values():
+            cost_locations.update(cost_group or ())
+        markers.append((cost_locations, BOTTLENECK_COST_COLOR))
+        markers.append(
+            (
+                [location for location in bottlenecks if location],
+                BOTTLENECK_REWARD_COLOR,
+            )
+        )
+    for marker_coords, marker_color in markers:
+        marker_coords = [
+            coord
+            for coord in marker_coords
+            if 0 <= coord[0] < image.shape[0]
+            and 0 <= coord[1] < image.shape[1]
+        ]
+        if marker_coords:
+            rows, cols = zip(*marker_coords)
+            image[list(rows), list(cols)] = parse_color(marker_color)
+
+    if tile_scale > 1:
+        image = np.repeat(image, tile_scale, axis=0)
+        image = np.repeat(image, tile_scale, axis=1)
+    return image
+
+
+def encode_png(image: np.ndarray, compression: int = 6) -> bytes:
+    """
+    Encodes a (rows, cols, 3) RGB or (rows, cols, 4) RGBA uint8 image
+    as PNG bytes
+    """
+    height, width, channels = image.shape
+    color_type = {3: 2, 4: 6}[channels]
+    scanlines = np.zeros((height, width * channels + 1), dtype=np.uint8)
+    scanlines[:, 1:] = image.reshape(height, width * channels)
+
+    def png_chunk(chunk_type: bytes, chunk_data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(chunk_data))
+            + chunk_type
+            + chunk_data
+            + struct.pack(">I", zlib.crc32(chunk_type + chunk_data))
+        )
+
+    header = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+    return b"".join(
+        (
+            PNG_SIGNATURE,
+            png_chunk(b"IHDR", header),
+            png_chunk(
+                b"IDAT", zlib.compress(scanlines.tobytes(), compression)
+            ),
+            png_chunk(b"IEND", b""),
+        )
+    )
+
+
+def write_png(
+    image_path: PathLike, image: np.ndarray, compression: int = 6
+) -> Path:
+    """
+    Writes the image to the path as a PNG file
+    """
+    image_path = Path(image_path)
+    image_path.write_bytes(encode_png(image, compression))
+    logger.debug(f"Wrote {image.shape} image to {image_path}")
+    return image_path
+
+
+def downsample(image: np.ndarray) -> np.ndarray:
+    """
+    Halves the image resolution by averaging every 2x2 block of pixels,
+    padding odd dimensions by repeating the last row / column
+    """
+    height, width = image.shape[:2]
+    padded = np.pad(
+        image, ((0, height % 2), (0, width % 2), (0, 0)), mode="edge"
+    ).astype(np.uint16)
+    blocks = (
+        padded[0::2, 0::2]
+        + padded[1::2, 0::2]
+        + padded[0::2, 1::2]
+        + padded[1::2, 1::2]
+    )
+    return ((blocks + 2) // 4).astype(np.uint8)
+
+
+def render_pyramid(
+    image: np.ndarray,
+    output_directory: PathLike,
+    tile_size: int = 256,
+    jobs: Optional[int] = None,
+) -> List[Path]:
+    """
+    Splits the image into a zoom pyramid of tile_size PNG tiles written
+    as <output_directory>/<level>/<row>_<col>.png
+
+    Level 0 fits the whole image within a single tile and every following
+    level doubles the resolution up to the full size image. The tiles are
+    encoded in parallel across a thread pool, zlib releasing the GIL
+    while compressing
+    """
+    output_directory = Path(output_directory)
+    largest_dimension = max(image.shape[:2])
+    level_count = max(
+        1, math.ceil(math.log2(largest_dimension / tile_size)) + 1
+    )
+
+    levels = [image]
+    for _ in range(level_count - 1):
+        levels.append(downsample(levels[-1]))
+    levels.reverse()
+
+    pyramid_tiles = []
+    for level_index, level_image in enumerate(levels):
+        level_directory = output_directory / str(level_index)
+        level_directory.mkdir(parents=True, exist_ok=True)
+        row_count = math.ceil(level_image.shape[0] / tile_size)
+        col_count = math.ceil(level_image.shape[1] / tile_size)
+        for row_index in range(row_count):
+            for col_index in range(col_count):
+                tile_image = level_image[
+                    row_index * tile_size : (row_index + 1) * tile_size,
+                    col_index * tile_size : (col_index + 1) * tile_size,
+                ]
+                tile_path = level_directory / f"{row_index}_{col_index}.png"
+                pyramid_tiles.append(
+                    (tile_path, np.ascontiguousarray(tile_image))
+                )
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        written_tiles = list(
+            executor.map(
+                lambda pyramid_tile: write_png(*pyramid_tile), pyramid_tiles
+            )
+        )
+    logger.info(
+        f"Wrote {len(written_tiles)} pyramid tiles across "
+        f"{level_count} levels to {output_directory}"
+    )
+    return written_tiles
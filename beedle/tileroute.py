@@ -0,0 +1,599 @@
+"""
+Progression routes: a walking order over the locations of a TileGraph
+
+topological_sort orders the locations by dependency but says nothing
+about the distance walked between them. The RoutePlanner orders the
+locations completed by a TileGraph progression into a single walk from
+graph_start, ending at graph_end, that respects the item dependencies
+while keeping the number of steps walked low
+
+A location can be visited once
+> The walk from the previous location reaches its entrance with the
+  items collected so far (traversal_cost of every tile on the way)
+> The items collected so far meet its reward_cost, traversal_cost and
+  consume, the consume items being spent on the visit
+
+As within complete_locations the reward of a location only depends on
+its reward_cost, so graph_start collects its reward whenever its
+reward_cost is met even though the route never has to complete it
+
+Step counts between the location entrances are precomputed once per
+traversal inventory by LocationDistances, a single batched
+KernelBackend.distance_maps call per ItemTable mask. The route is built
+with the nearest feasible location heuristic, then improved with
+Or-opt (moving runs of up to max_segment locations) and 2-opt (reversing
+runs) moves, only accepting moves keeping every visit feasible. Moves are
+limited to window positions apart, so a pass stays quadratic in the
+window rather than the number of locations
+
+Only the locations between the two ends of a move see a different
+inventory, so every move is checked by replaying those visits from the
+stored inventory before the move
+"""
+
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+from loguru import logger
+import numpy as np
+
+from .tilecost import conjunction, cost_clauses, split_count
+from .tilegraph import TileGraph
+from .tilegrid import TileGrid
+from .tilekernels import KernelBackend, get_backend
+from .tilelocations import LocationMap
+from .tilemap import TileMap
+from .tiletrace import tracer
+
+
+Coord = Tuple[int, int]
+ItemCounts = Tuple[int, ...]
+VisitState = Tuple[ItemCounts, int, int]
+
+
+class LocationDistances:
+    """
+    Step counts between location entrances, computed once per traversal
+    inventory
+    > locations <Tuple[Tuple[int, int], ...]>
+        > Sorted entrances indexing the rows and columns of the matrices
+    > tile_grid <TileGrid>
+        > Dense TileMap the traversable tiles are derived from
+    > backend <KernelBackend>
+        > Kernel backend running the breadth first searches
+    """
+
+    def __init__(
+        self,
+        tile_map: TileMap,
+        locations: Iterable[Coord],
+        tile_grid: Optional[TileGrid] = None,
+        backend: Union[str, KernelBackend, None] = None,
+    ):
+        self.tile_grid = TileGrid(tile_map) if tile_grid is None else tile_grid
+        self.backend = get_backend(backend)
+        self.locations = tuple(sorted(set(locations)))
+        self.index = {
+            location: location_index
+            for location_index, location in enumerate(self.locations)
+        }
+        self._location_indexes = (
+            np.array([location[0] for location in self.locations], np.int64),
+            np.array([location[1] for location in self.locations], np.int64),
+        )
+        self._matrices = {}
+        self._reverse_warps = {}
+        for warp_entrance, warp_exit in self.tile_grid.warp_indexes.tolist():
+            self._reverse_warps.setdefault(
+                divmod(warp_exit, self.tile_grid.shape[1]), []
+            ).append(divmod(warp_entrance, self.tile_grid.shape[1]))
+
+    def __str__(self) -> str:
+        return (
+            f"LocationDistances Instance [{len(self.locations)} locations] "
+            f"[{len(self._matrices)} inventories] {id(self)}"
+        )
+
+    def matrix(self, inventory_mask: int) -> np.ndarray:
+        """
+        Read-only (location count, location count) matrix of the steps
+        from every entrance to every entrance with the inventory mask,
+        -1 when the walk can't reach the entrance
+        """
+        distance_matrix = self._matrices.get(inventory_mask)
+        if distance_matrix is None:
+            with tracer.phase("tileroute.distances"):
+                distance_maps = self.backend.distance_maps(
+                    self.tile_grid.traversable(inventory_mask),
+                    self.locations,
+                    self.tile_grid.warp_indexes,
+                )
+            distance_matrix = distance_maps[
+                :, self._location_indexes[0], self._location_indexes[1]
+            ]
+            distance_matrix.setflags(write=False)
+            self._matrices[inventory_mask] = distance_matrix
+        return distance_matrix
+
+    def paths(
+        self, legs: Sequence[Tuple[Coord, Coord, int]]
+    ) -> List[List[Coord]]:
+        """
+        Shortest tile path of every (start, end, inventory mask) leg,
+        from the start entrance to the end entrance included
+
+        Raises ValueError for the legs whose end can't be reached
+        """
+        leg_groups = {}
+        for leg_index, (_, _, inventory_mask) in enumerate(legs):
+            leg_groups.setdefault(inventory_mask, []).append(leg_index)
+
+        leg_paths = [None] * len(legs)
+        for inventory_mask, leg_indexes in leg_groups.items():
+            distance_maps = self.backend.distance_maps(
+                self.tile_grid.traversable(inventory_mask),
+                [legs[leg_index][0] for leg_index in leg_indexes],
+                self.tile_grid.warp_indexes,
+            )
+            for distances, leg_index in zip(distance_maps, leg_indexes):
+                leg_paths[leg_index] = self.__walk_back(
+                    distances, *legs[leg_index][:2]
+                )
+        return leg_paths
+
+    def __walk_back(
+        self, distances: np.ndarray, start_coord: Coord, end_coord: Coord
+    ) -> List[Coord]:
+        """
+        Follows decreasing distances from the end back to the start,
+        through the adjacent tiles and the non-adjacent exits leading to
+        every tile
+        """
+        if distances[end_coord] < 0:
+            raise ValueError(
+                f"{end_coord} can't be reached from {start_coord}"
+            )
+        tile_path = [end_coord]
+        tile_coord = end_coord
+        while distances[tile_coord] > 0:
+            previous_distance = distances[tile_coord] - 1
+            for neighbor in self.tile_grid.adjacent(
+                tile_coord
+            ) + self._reverse_warps.get(tile_coord, []):
+                if distances[neighbor] == previous_distance:
+                    tile_coord = neighbor
+                    break
+            tile_path.append(tile_coord)
+        tile_path.reverse()
+        return tile_path
+
+
+class RouteLeg:
+    """
+    Walk between two consecutive locations of a route
+    > start, end <Tuple[int, int]>
+        > Entrances the leg walks between
+    > cost <int>
+        > Number of steps walked
+    > path <List[Tuple[int, int]]>
+        > Tiles walked, from the start to the end entrance included
+    """
+
+    def __init__(
+        self, start: Coord, end: Coord, cost: int, path: List[Coord]
+    ):
+        self.start = start
+        self.end = end
+        self.cost = cost
+        self.path = path
+
+    def __str__(self) -> str:
+        return (
+            f"RouteLeg Instance [{self.start} -> {self.end}] "
+            f"[{self.cost} steps] {id(self)}"
+        )
+
+    def as_dict(self) -> dict:
+        """
+        JSON serializable form of the leg
+        """
+        return {
+            "start": list(self.start),
+            "end": list(self.end),
+            "cost": self.cost,
+            "path": [list(tile_coord) for tile_coord in self.path],
+        }
+
+
+class RoutePlanner:
+    """
+    Dependency respecting walking order over the locations of a TileGraph
+    progression
+
+    The locations default to every location completed by the TileGraph,
+    so a goal directed TileGraph only routes the locations graph_end
+    depends on. graph_end is always visited last when routed
+    > order <List[Tuple[int, int]]>
+        > Locations in visiting order, starting from graph_start
+    > legs <List[RouteLeg]>
+        > Walk between every two consecutive locations of the order
+    > total_cost <int>
+        > Number of steps walked over every leg
+    > distances <LocationDistances>
+        > Precomputed step counts, reusable by other planners of the map
+    """
+
+    def __init__(
+        self,
+        tile_graph: TileGraph,
+        tile_map: TileMap,
+        location_map: LocationMap,
+        locations: Optional[Iterable[Coord]] = None,
+        distances: Optional[LocationDistances] = None,
+        max_segment: int = 3,
+        window: int = 12,
+        max_passes: int = 8,
+        backend: Union[str, KernelBackend, None] = None,
+    ):
+        self.graph_start = tile_graph.graph_start
+        self.graph_end = tile_graph.graph_end
+        if locations is None:
+            locations = set().union(*tile_graph.location_order)
+        locations = set(locations) - {self.graph_start}
+        stops = sorted(locations | {self.graph_start})
+        if distances is None or not set(stops).issubset(distances.index):
+            distances = LocationDistances(tile_map, stops, backend=backend)
+        self.distances = distances
+        self.max_segment = max_segment
+        self.window = window
+        self.__index_items(tile_map, location_map, stops)
+
+        # Distance rows as lists, indexed by the stop order of the route
+        self._rows = {}
+        self._stop_indexes = [distances.index[stop] for stop in stops]
+        self._stops = stops
+        stop_index = {stop: index for index, stop in enumerate(stops)}
+        self._start = stop_index[self.graph_start]
+        self._end = (
+            stop_index[self.graph_end] if self.graph_end in locations else None
+        )
+
+        with tracer.phase("tileroute.construct"):
+            route = self.__nearest_neighbor(
+                sorted(stop_index[location] for location in locations)
+            )
+        initial_cost = sum(state[2] for state in self.__replay(route))
+        with tracer.phase("tileroute.improve"):
+            for _ in range(max_passes):
+                if not (self.__or_opt(route) | self.__two_opt(route)):
+                    break
+        states = self.__replay(route)
+        logger.debug(
+            f"Route of {len(route)} locations improved from {initial_cost} "
+            f"to {sum(state[2] for state in states)} steps"
+        )
+
+        leg_specs = [
+            (stops[route[position - 1]], stops[route[position]], state[1])
+            for position, state in enumerate(states[:-1], 1)
+        ]
+        leg_paths = distances.paths(leg_specs)
+        self.order = [stops[stop] for stop in route]
+        self.legs = [
+            RouteLeg(start, end, len(leg_path) - 1, leg_path)
+            for (start, end, _), leg_path in zip(leg_specs, leg_paths)
+        ]
+        self.total_cost = sum(leg.cost for leg in self.legs)
+
+    def __str__(self) -> str:
+        return (
+            f"RoutePlanner Instance [{len(self.order)} locations] "
+            f"[{self.total_cost} steps] {id(self)}"
+        )
+
+    def as_dict(self) -> dict:
+        """
+        JSON serializable form of the route
+        """
+        return {
+            "order": [list(location) for location in self.order],
+            "total_cost": self.total_cost,
+            "legs": [leg.as_dict() for leg in self.legs],
+        }
+
+    def __index_items(
+        self, tile_map: TileMap, location_map: LocationMap, stops: List[Coord]
+    ) -> None:
+        """
+        Converts the costs and rewards of every stop into (column, count)
+        pairs over a local item index, along with the (bit, column, count)
+        of every item the traversal masks reference
+        """
+        item_columns = {}
+
+        def counted(items: Iterable[str]) -> Tuple[Tuple[int, int], ...]:
+            item_counts = []
+            for item in items:
+                name, count = split_count(item)
+                column = item_columns.setdefault(name, len(item_columns))
+                item_counts.append((column, count))
+            return tuple(item_counts)
+
+        self._clauses = []
+        self._reward_clauses = []
+        self._consume = []
+        self._reward = []
+        for stop in stops:
+            if stop in location_map.entrance_locations:
+                tile_node = tile_map[stop]
+                total_cost = conjunction(
+                    tile_node.reward_cost, tile_node.traversal_cost
+                )
+                self._clauses.append(
+                    tuple(map(counted, cost_clauses(total_cost)))
+                )
+                self._reward_clauses.append(
+                    tuple(map(counted, cost_clauses(tile_node.reward_cost)))
+                )
+                self._consume.append(counted(tile_node.consume))
+                self._reward.append(counted(tile_node.reward))
+            else:
+                self._clauses.append(((),))
+                self._reward_clauses.append(((),))
+                self._consume.append(())
+                self._reward.append(())
+
+        item_table = self.distances.tile_grid.item_table
+        self._mask_bits = tuple(
+            (1 << bit, *counted([item])[0])
+            for bit, item in enumerate(item_table.items)
+        )
+        self._item_count = len(item_columns)
+
+        # Counts never exceed every reward of the stops collected at once,
+        # so the distances of that mask bound the distances of any route
+        bound_counts = [0] * self._item_count
+        for stop_reward in self._reward:
+            for column, count in stop_reward:
+                bound_counts[column] += count
+        self._bound_mask = self.__mask(tuple(bound_counts))
+
+    def __mask(self, item_counts: ItemCounts) -> int:
+        """
+        ItemTable traversal mask of the item counts
+        """
+        inventory_mask = 0
+        for bit, column, count in self._mask_bits:
+            if item_counts[column] >= count:
+                inventory_mask |= bit
+        return inventory_mask
+
+    def __row(self, stop: int, inventory_mask: int) -> List[int]:
+        """
+        Steps from the stop to every stop with the inventory mask
+        """
+        row = self._rows.get((stop, inventory_mask))
+        if row is None:
+            distance_matrix = self.distances.matrix(inventory_mask)
+            row = distance_matrix[
+                self._stop_indexes[stop], self._stop_indexes
+            ].tolist()
+            self._rows[(stop, inventory_mask)] = row
+        return row
+
+    @staticmethod
+    def __met(item_counts: ItemCounts, clauses) -> bool:
+        """
+        Checks the item counts cover any of the counted clauses
+        """
+        return any(
+            all(item_counts[column] >= count for column, count in clause)
+            for clause in clauses
+        )
+
+    def __visit(
+        self, item_counts: ItemCounts, stop: int, required: bool = True
+    ) -> Optional[ItemCounts]:
+        """
+        Item counts after visiting the stop, None when the counts don't
+        meet its costs
+
+        The reward is collected once the reward_cost is met and the
+        consume items are only spent once every cost is met, following
+        complete_locations. Stops that aren't required (graph_start) are
+        never rejected, only collecting what their costs allow
+        """
+        completed = self.__met(item_counts, self._clauses[stop]) and all(
+            item_counts[column] >= count
+            for column, count in self._consume[stop]
+        )
+        if completed:
+            rewarded = True
+        elif required:
+            return None
+        else:
+            rewarded = self.__met(item_counts, self._reward_clauses[stop])
+        if not (rewarded and (self._consume[stop] or self._reward[stop])):
+            return item_counts
+        item_counts = list(item_counts)
+        if completed:
+            for column, count in self._consume[stop]:
+                item_counts[column] -= count
+        for column, count in self._reward[stop]:
+            item_counts[column] += count
+        return tuple(item_counts)
+
+    def __nearest_neighbor(self, locations: List[int]) -> List[int]:
+        """
+        Builds the route by always walking to the closest location that
+        can be visited, keeping graph_end for last
+
+        Raises ValueError when no remaining location can be visited
+        """
+        item_counts = self.__visit(
+            (0,) * self._item_count, self._start, required=False
+        )
+        route = [self._start]
+        remaining = set(locations)
+        while remaining:
+            row = self.__row(route[-1], self.__mask(item_counts))
+            candidates = sorted(
+                (row[stop], stop)
+                for stop in remaining
+                if row[stop] >= 0
+                and (stop != self._end or len(remaining) == 1)
+            )
+            for _, stop in candidates:
+                visited_counts = self.__visit(item_counts, stop)
+                if visited_counts is not None:
+                    break
+            else:
+                raise ValueError(
+                    f"None of {sorted(self._stops[s] for s in remaining)} "
+                    f"can be visited from {self._stops[route[-1]]}"
+                )
+            route.append(stop)
+            remaining.remove(stop)
+            item_counts = visited_counts
+        return route
+
+    def __replay(
+        self,
+        route: List[int],
+        first: int = 1,
+        last: Optional[int] = None,
+        state: Optional[VisitState] = None,
+    ) -> Optional[List[VisitState]]:
+        """
+        (item counts, traversal mask, steps of the leg reaching it) after
+        every position of the route from first - 1 up to last, starting
+        from the state after the position first - 1. Returns None when a
+        visit is infeasible
+        """
+        if last is None:
+            last = len(route) - 1
+        if state is None:
+            item_counts = (0,) * self._item_count
+            for position, stop in enumerate(route[:first]):
+                item_counts = self.__visit(item_counts, stop, position > 0)
+            state = (item_counts, self.__mask(item_counts), 0)
+        states = [state]
+        item_counts, inventory_mask, _ = state
+        for position in range(first, last + 1):
+            stop = route[position]
+            leg_cost = self.__row(route[position - 1], inventory_mask)[stop]
+            if leg_cost < 0:
+                return None
+            item_counts = self.__visit(item_counts, stop)
+            if item_counts is None:
+                return None
+            inventory_mask = self.__mask(item_counts)
+            states.append((item_counts, inventory_mask, leg_cost))
+        return states
+
+    def __movable(self, route: List[int]) -> Tuple[int, int]:
+        """
+        First and last positions moves may change, graph_start and
+        graph_end stay in place
+        """
+        last = len(route) - 1
+        if self._end is not None:
+            last -= 1
+        return 1, last
+
+    def __try_move(
+        self,
+        route: List[int],
+        states: List[VisitState],
+        candidate: List[int],
+        first: int,
+        last: int,
+    ) -> bool:
+        """
+        Applies the candidate positions first..last in place when every
+        visit stays feasible and fewer steps are walked
+
+        Candidates whose legs already walk as many steps with the bound
+        mask are rejected before replaying the visits
+        """
+        last = min(last + 1, len(route) - 1)
+        current_cost = sum(
+            leg_cost for _, _, leg_cost in states[first : last + 1]
+        )
+        moved_route = (
+            route[:first] + candidate + route[first + len(candidate) :]
+        )
+        bound_cost = 0
+        for position in range(first, last + 1):
+            bound_distance = self.__row(
+                moved_route[position - 1], self._bound_mask
+            )[moved_route[position]]
+            if bound_distance < 0:
+                return False
+            bound_cost += bound_distance
+        if bound_cost >= current_cost:
+            return False
+        moved_states = self.__replay(
+            moved_route, first, last, states[first - 1]
+        )
+        if moved_states is None or current_cost <= sum(
+            leg_cost for _, _, leg_cost in moved_states[1:]
+        ):
+            return False
+        route[first : first + len(candidate)] = candidate
+        states[first - 1 : last + 1] = moved_states
+        return True
+
+    def __or_opt(self, route: List[int]) -> bool:
+        """
+        Moves runs of up to max_segment locations up to window positions
+        earlier or later, returning whether the route was improved
+        """
+        first_movable, last_movable = self.__movable(route)
+        states = self.__replay(route, 1)
+        improved = False
+        for segment_length in range(1, self.max_segment + 1):
+            for segment_start in range(
+                first_movable, last_movable - segment_length + 2
+            ):
+                segment_end = segment_start + segment_length
+                for target in range(
+                    max(first_movable, segment_start - self.window),
+                    min(last_movable + 1, segment_end + self.window)
+                    - segment_length
+                    + 1,
+                ):
+                    if target == segment_start:
+                        continue
+                    first = min(segment_start, target)
+                    last = max(segment_end, target + segment_length) - 1
+                    remainder = (
+                        route[first:segment_start]
+                        + route[segment_end : last + 1]
+                    )
+                    offset = target - first
+                    candidate = (
+                        remainder[:offset]
+                        + route[segment_start:segment_end]
+                        + remainder[offset:]
+                    )
+                    if self.__try_move(route, states, candidate, first, last):
+                        improved = True
+                        break
+        return improved
+
+    def __two_opt(self, route: List[int]) -> bool:
+        """
+        Reverses runs of up to window locations, returning whether the
+        route was improved
+        """
+        first_movable, last_movable = self.__movable(route)
+        states = self.__replay(route, 1)
+        improved = False
+        for first in range(first_movable, last_movable):
+            for last in range(
+                first + 1, min(last_movable, first + self.window) + 1
+            ):
+                candidate = route[first : last + 1][::-1]
+                if self.__try_move(route, states, candidate, first, last):
+                    improved = True
+        return improved
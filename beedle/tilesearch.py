@@ -5,19 +5,75 @@ subsequent search
 """
 
 from collections import deque
-from typing import Mapping, Tuple, Set
+import heapq
+from typing import (
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Set,
+    Union,
+)
 
 from loguru import logger
+import numpy as np
 
+from .tilecost import item_name
+from .tilegrid import TileGrid
+from .tileinventory import ItemInventory
+from .tilekernels import KernelBackend, get_backend
 from .tilelocations import LocationMap
 from .tilemap import TileMap
 from .tilenode import TileNode
+from .tiletrace import tracer
 
 
 Coord = Tuple[int, int]
 LinkMap = Mapping[TileNode, Coord]
 
 
+def complete_locations(
+    location_nodes: Iterable[Tuple[Hashable, TileNode]],
+    item_counts: ItemInventory,
+    collected_locations: Set[Hashable],
+) -> Tuple[Set[Hashable], List[frozenset]]:
+    """
+    Completion step of a search chunk over the (location, TileNode)
+    pairs of the discovered locations, in visiting order
+
+    A location rewards once its reward_cost is met, unless it's within
+    collected_locations, and is completed once its reward_cost,
+    traversal_cost and consume are met. A completed location spends its
+    consume items from item_counts before the next location is checked,
+    the rewards of the chunk are only added to item_counts at the end
+
+    Updates item_counts and collected_locations in place, returning the
+    completed locations and the reward collection of every rewarding
+    location
+    """
+    completed_locations = set()
+    chunk_rewards = []
+    for location, location_node in location_nodes:
+        reward_cost = location_node.reward_cost
+        if location not in collected_locations and item_counts.meets(
+            reward_cost
+        ):
+            collected_locations.add(location)
+            chunk_rewards.append(location_node.reward)
+
+        if item_counts.meets(
+            reward_cost | location_node.traversal_cost
+        ) and item_counts.meets(location_node.consume):
+            item_counts.consume(location_node.consume)
+            completed_locations.add(location)
+
+    for reward_collection in chunk_rewards:
+        item_counts.add(reward_collection)
+    return completed_locations, chunk_rewards
+
+
 class PartialTileMap:
     """
     Represents a subset of the total TileMap explored via
@@ -26,18 +82,77 @@ class PartialTileMap:
     The item_inventory and configuration determine the total
     subset explorable by the floodfill argument based off the
     traversal_cost requirements for the TileNodes in the TileMap
+
+    When a ReachabilityQuery is provided the explorable region is read
+    from its component labels instead of flood filling the TileMap, and
+    partial_map_tiles is only materialized when accessed
+
+    When target_locations are provided the floodfill explores the tiles
+    closest to the targets first and stops as soon as every target has
+    been discovered, so partial_map_tiles may only hold part of the
+    explorable region
+
+    When a TileGrid of the TileMap is provided the explorable region is
+    flood filled by the kernel backend selected by get_backend, which
+    always explores the complete region so target_locations are ignored
+
+    explored_tiles reuses the partial_map_tiles of an earlier
+    PartialTileMap whose inventory traverses exactly the same tiles
+
+    exhaustive records whether partial_map_tiles holds the complete
+    explorable region
     """
 
     def __init__(
-        self, tile_map: TileMap, start_coord: Coord, item_inventory: Set[str]
+        self,
+        tile_map: TileMap,
+        start_coord: Coord,
+        item_inventory: Set[str],
+        reachability=None,
+        target_locations: Optional[Iterable[Coord]] = None,
+        explored_tiles: Optional[deque] = None,
+        tile_grid: Optional[TileGrid] = None,
+        backend: Union[str, KernelBackend, None] = None,
     ):
         self.reward_collection = set()
         self.cost_collection = set()
         self.search_inventory = set()
         self.completed_locations = set()
-        self.partial_map_tiles = self.floodfill(
-            tile_map, start_coord, item_inventory
-        )
+        self.item_counts = None
+
+        self.start_coord = start_coord
+        self.item_inventory = frozenset(item_inventory or ())
+        self.reachability = reachability
+        self._partial_map_tiles = explored_tiles
+        self.exhaustive = True
+        if explored_tiles is not None:
+            tracer.count("tilesearch.reused_regions")
+        elif reachability is None and tile_grid is not None:
+            self._partial_map_tiles = self.kernel_floodfill(
+                tile_grid, start_coord, item_inventory, backend
+            )
+        elif reachability is None and target_locations is not None:
+            self._partial_map_tiles = self.directed_floodfill(
+                tile_map, start_coord, target_locations, item_inventory
+            )
+        elif reachability is None:
+            self._partial_map_tiles = self.floodfill(
+                tile_map, start_coord, item_inventory
+            )
+
+    @property
+    def partial_map_tiles(self) -> deque:
+        """
+        Coordinates of every tile discovered from the start coordinate
+        """
+        if self._partial_map_tiles is None:
+            reachable_tiles = self.reachability.reachable_tiles(
+                self.start_coord, self.item_inventory
+            )
+            self._partial_map_tiles = deque(
+                map(tuple, np.argwhere(reachable_tiles).tolist())
+            )
+        return self._partial_map_tiles
 
     def floodfill(
         self, tile_map: TileMap, start_coord: tuple, item_inventory: set = None
@@ -58,29 +173,121 @@ class PartialTileMap:
                 > These TileNodes are added by examining the edges for each
                 TileNode in the TileMap
 
+        Every coordinate ever queued is also stored in the queued set, so
+        checking whether an edge was already seen doesn't scan the queues
+
         Returns
             > discover_queue processed from the TileMap
         """
-        logger.info(f"Running floodfill algorithm @ {start_coord}")
+        logger.debug(f"Running floodfill algorithm @ {start_coord}")
 
         if item_inventory is None:
             item_inventory = set()
 
         search_queue = deque()
         discover_queue = deque()
+        queued = {start_coord}
+
+        with tracer.phase("tilesearch.floodfill"):
+            search_queue.append(start_coord)
+            while len(search_queue) > 0:
+                search_coord = search_queue.pop()
+                discover_queue.append(search_coord)
+
+                tile_node = tile_map[search_coord]
+                for edge in tile_node.edges:
+                    if edge not in queued:
+                        tcost = tile_map[edge].traversal_cost
+                        if tcost.issubset(item_inventory):
+                            queued.add(edge)
+                            search_queue.append(edge)
+        tracer.count("tilesearch.discovered_tiles", len(discover_queue))
+        logger.debug(f"Generated queue of length {len(discover_queue)}")
+        return discover_queue
+
+    def kernel_floodfill(
+        self,
+        tile_grid: TileGrid,
+        start_coord: Coord,
+        item_inventory: set = None,
+        backend: Union[str, KernelBackend, None] = None,
+    ) -> deque:
+        """
+        Flood fill of the dense TileGrid on a kernel backend
+
+        Discovers the same tiles as the floodfill, ordered by row and
+        column rather than by discovery
+        """
+        backend = get_backend(backend)
+        with tracer.phase(f"tilesearch.kernel_floodfill.{backend.name}"):
+            walkable = tile_grid.traversable(
+                tile_grid.inventory_mask(item_inventory or ())
+            )
+            reachable_tiles = backend.flood_fill(
+                walkable, start_coord, tile_grid.warp_indexes
+            )
+            discover_queue = deque(
+                map(tuple, np.argwhere(reachable_tiles).tolist())
+            )
+        tracer.count("tilesearch.discovered_tiles", len(discover_queue))
+        return discover_queue
+
+    def directed_floodfill(
+        self,
+        tile_map: TileMap,
+        start_coord: Coord,
+        target_locations: Iterable[Coord],
+        item_inventory: set = None,
+    ) -> deque:
+        """
+        Best-first variant of the floodfill that stops once every target
+        location has been discovered
+
+        Tiles are expanded in order of their Manhattan distance to the
+        nearest target, computed once for the whole map. Non-adjacent
+        exits make the distance a guide rather than a bound, so targets
+        that can't be reached still exhaust the explorable region
+        """
+        if item_inventory is None:
+            item_inventory = set()
+
+        remaining_targets = set(target_locations)
+        distant_targets = sorted(remaining_targets - {start_coord})
+        if distant_targets:
+            target_rows, target_cols = np.array(distant_targets).T[
+                :, :, None, None
+            ]
+            map_rows, map_cols = np.indices(
+                (tile_map.map_size_x, tile_map.map_size_y)
+            )
+            target_distance = np.min(
+                np.abs(map_rows - target_rows)
+                + np.abs(map_cols - target_cols),
+                axis=0,
+            ).tolist()
+
+        discover_queue = deque()
+        queued = {start_coord}
+        search_heap = [(0, start_coord)]
+        with tracer.phase("tilesearch.directed_floodfill"):
+            while search_heap:
+                _, search_coord = heapq.heappop(search_heap)
+                discover_queue.append(search_coord)
+                remaining_targets.discard(search_coord)
+                if not remaining_targets:
+                    self.exhaustive = False
+                    break
 
-        search_queue.append(start_coord)
-        while len(search_queue) > 0:
-            search_coord = search_queue.pop()
-            discover_queue.append(search_coord)
-
-            tile_node = tile_map[search_coord]
-            for edge in tile_node.edges:
-                if edge not in discover_queue and edge not in search_queue:
-                    tcost = tile_map[edge].traversal_cost
-                    if tcost.issubset(item_inventory):
-                        search_queue.append(edge)
-        logger.info(f"Generated queue of length {len(discover_queue)}")
+                for edge in tile_map[search_coord].edges:
+                    if edge not in queued:
+                        tcost = tile_map[edge].traversal_cost
+                        if tcost.issubset(item_inventory):
+                            queued.add(edge)
+                            heapq.heappush(
+                                search_heap,
+                                (target_distance[edge[0]][edge[1]], edge),
+                            )
+        tracer.count("tilesearch.discovered_tiles", len(discover_queue))
         return discover_queue
 
     def find_completed_locations(
@@ -88,7 +295,9 @@ class PartialTileMap:
         tile_map: TileMap,
         location_map: LocationMap,
         completed_locations: set,
-        search_inventory: set,
+        search_inventory: Union[Iterable[str], ItemInventory],
+        location_filter: Optional[Set[Coord]] = None,
+        collected_locations: Optional[Set[Coord]] = None,
     ) -> None:
         """
         After having performed the floodfill algorithm to complete the
@@ -109,26 +318,50 @@ class PartialTileMap:
             with any rewards that were discovered in the unique_location
             > Checks if the total_cost has been met by the search_inventory
             in order to mark the location as having been completed
-        """
-        discovered_locations = self.discovered_locations(location_map)
-        unique_locations = discovered_locations.difference(completed_locations)
 
-        for location in unique_locations:
-            unique_node = tile_map[location]
+        Locations outside of the location_filter are ignored when it's
+        provided
 
-            reward_collection = unique_node.reward
-            reward_cost = unique_node.reward_cost
-            traversal_cost = unique_node.traversal_cost
-            total_cost = reward_cost | traversal_cost
+        The costs are checked against the ItemInventory counts of the
+        search_inventory (set inventories hold one copy of every item).
+        The locations are visited in entrance order by complete_locations:
+        a completed location spends its consume items before the next
+        location is checked. Rewards are collected once per location:
+        locations within collected_locations don't reward again, and every
+        location rewarding in this chunk is added to collected_locations.
+        The counts held after the chunk, consumed items removed and
+        rewards added, are stored within item_counts
+        """
+        if not isinstance(search_inventory, ItemInventory):
+            search_inventory = ItemInventory.from_tokens(search_inventory)
+        if collected_locations is None:
+            collected_locations = set()
+        item_counts = search_inventory.copy()
 
-            self.reward_collection.update(reward_collection)
-            self.cost_collection.update(total_cost)
+        discovered_locations = self.discovered_locations(location_map)
+        unique_locations = discovered_locations.difference(completed_locations)
+        if location_filter is not None:
+            unique_locations = unique_locations.intersection(location_filter)
 
-            if reward_cost.issubset(search_inventory):
-                self.search_inventory.update(reward_collection)
+        location_nodes = [
+            (location, tile_map[location])
+            for location in sorted(unique_locations)
+        ]
+        for _, unique_node in location_nodes:
+            self.reward_collection.update(map(item_name, unique_node.reward))
+            self.cost_collection.update(
+                map(
+                    item_name,
+                    unique_node.reward_cost | unique_node.traversal_cost,
+                )
+            )
 
-            if total_cost.issubset(search_inventory):
-                self.completed_locations.add(location)
+        completed_locations, chunk_rewards = complete_locations(
+            location_nodes, item_counts, collected_locations
+        )
+        self.completed_locations.update(completed_locations)
+        self.search_inventory.update(*chunk_rewards)
+        self.item_counts = item_counts
 
     def discovered_locations(self, location_map: LocationMap) -> set:
         """
@@ -136,6 +369,14 @@ class PartialTileMap:
         of key locations and returns the intersection
         """
         full_location_set = location_map.entrance_locations
+        if self.reachability is not None:
+            return set(
+                full_location_set.intersection(
+                    self.reachability.reachable_locations(
+                        self.start_coord, self.item_inventory
+                    )
+                )
+            )
         partial_set = set(self.partial_map_tiles)
         discovered_locations = full_location_set.intersection(partial_set)
         return discovered_locations
@@ -0,0 +1,244 @@
+"""
+Frozen snapshots of a TileMap for concurrent read queries
+
+TileMap and ReachabilityQuery keep mutable state (dirty tiles, cached
+labellings patched in place, lazily filled closures) so they can't be
+shared between threads. A MapSnapshot copies everything the reachability
+queries read out of the TileMap and LocationMap once
+> The TileGrid arrays, stored read-only
+> The lazy LocationMap properties (data, entrance_locations, spatial
+  indexes, content_hash), populated up front
+> One FrozenLabels per inventory, holding read-only labels and the
+  component closures computed before the labelling is published
+
+The questions themselves are the LabelQueries shared with the
+ReachabilityQuery, answered from the FrozenLabels rather than the
+mutable ComponentLabels
+
+Queries never modify shared state: the component arrays and result
+arrays are scratch buffers allocated per query. The only write is the
+publication of the labelling for an inventory seen for the first time,
+a single dict.setdefault, so two threads missing on the same inventory
+both compute the labelling and keep whichever was stored first. Passing
+every expected inventory to the constructor avoids the write entirely
+
+Later edits of the TileMap don't reach the snapshot, build a new one
+from the edited TileMap instead
+"""
+
+from types import MappingProxyType
+from typing import Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+from .exceptions import TileMapIndexError
+from .tilegrid import TileGrid
+from .tilekernels import KernelBackend, get_backend
+from .tilelocations import LOCATION_COORDINATE_FIELDS, LocationMap
+from .tilemap import TileMap
+from .tilequery import ComponentClosures, ComponentLabels, LabelQueries
+
+
+Coord = Tuple[int, int]
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    """
+    Returns a copy of the array that refuses writes
+    """
+    array = np.array(array, copy=True)
+    array.setflags(write=False)
+    return array
+
+
+class FrozenLabels(ComponentClosures):
+    """
+    Read-only component labelling of the snapshot for one inventory
+    > tile_grid <TileGrid>
+        > TileGrid of the snapshot, never updated
+    > walkable <np.ndarray[bool]>
+        > Tiles traversable with the inventory
+    > labels <np.ndarray[int32]>
+        > Component index of every walkable tile, -1 otherwise
+    > component_count <int>
+        > Number of component indexes in use
+    > closures <MappingProxyType>
+        > Component index -> bitmask of the components reachable through
+          the non-adjacent exits, only for the components holding one
+    """
+
+    __slots__ = (
+        "tile_grid",
+        "walkable",
+        "labels",
+        "component_count",
+        "closures",
+    )
+
+    def __init__(self, component_labels: ComponentLabels):
+        self.tile_grid = component_labels.tile_grid
+        self.walkable = _read_only(component_labels.walkable)
+        self.labels = _read_only(component_labels.labels)
+        self.component_count = component_labels.component_count
+        self.closures = MappingProxyType(
+            {
+                component: component_labels.closure(component)
+                for component in component_labels.component_edges
+            }
+        )
+
+    def closure(self, component: int) -> int:
+        """
+        Returns the bitmask of every component reachable from the
+        component, including the component itself
+        """
+        return self.closures.get(component, 1 << component)
+
+
+class MapSnapshot(LabelQueries):
+    """
+    Immutable view of a TileMap answering the ReachabilityQuery questions
+    from any number of threads without locking
+    > content_hash <str>
+        > TileMap.content_hash at the time of the snapshot
+    > shape <Tuple[int, int]>
+        > (map_size_x, map_size_y) dimensions of the map
+    > location_map <LocationMap>
+        > Immutable LocationMap with its lazy properties populated
+    > tile_values <np.ndarray[int64]>
+        > Read-only tile identifier of every coordinate
+    > backend <KernelBackend>
+        > Kernel backend labelling the inventories and computing the
+          distance maps
+    > max_labellings <int>
+        > Number of inventory labellings kept, inventories seen once the
+          limit is reached are labelled for every query instead
+    """
+
+    __slots__ = (
+        "content_hash",
+        "shape",
+        "location_map",
+        "tile_values",
+        "backend",
+        "max_labellings",
+        "location_index",
+        "location_coords",
+        "_tile_grid",
+        "_location_indexes",
+        "_labellings",
+        "_frozen",
+    )
+
+    def __init__(
+        self,
+        tile_map: TileMap,
+        location_map: Optional[LocationMap] = None,
+        inventories: Iterable[Iterable[str]] = (),
+        backend: Union[str, KernelBackend, None] = None,
+        max_labellings: int = 1024,
+    ):
+        location_map = (
+            tile_map.location_map if location_map is None else location_map
+        )
+        self.content_hash = tile_map.content_hash
+        self.shape = (tile_map.map_size_x, tile_map.map_size_y)
+        self.location_map = location_map
+        tile_values = np.empty(self.shape, dtype=np.int64)
+        for tile_coord, tile_node in tile_map.items():
+            tile_values[tile_coord] = tile_node.identifier
+        tile_values.setflags(write=False)
+        self.tile_values = tile_values
+        self.backend = get_backend(backend)
+        self.max_labellings = max_labellings
+        self._tile_grid = TileGrid(tile_map)
+
+        # Populates the lazy LocationMap properties before sharing it
+        location_map.data  # pylint: disable=pointless-statement
+        location_map.content_hash  # pylint: disable=pointless-statement
+        for field in LOCATION_COORDINATE_FIELDS:
+            location_map.spatial_index(field)
+        self.location_index = location_map.spatial_index()
+        self.location_coords = tuple(sorted(location_map.entrance_locations))
+        self._location_indexes = _read_only(
+            np.array(
+                [
+                    coord[0] * self.shape[1] + coord[1]
+                    for coord in self.location_coords
+                ],
+                dtype=np.int64,
+            )
+        )
+
+        self._labellings = {}
+        for item_inventory in inventories:
+            self.labels(item_inventory)
+        self._frozen = True
+
+    def __setattr__(self, name: str, value) -> None:
+        if getattr(self, "_frozen", False):
+            raise AttributeError(
+                f"{self} is immutable, unable to set {name}"
+            )
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{self} is immutable, unable to delete {name}")
+
+    def __str__(self) -> str:
+        return (
+            f"MapSnapshot Instance [{self.shape}] "
+            f"[{len(self._labellings)} labellings] {id(self)}"
+        )
+
+    @property
+    def warp_indexes(self) -> np.ndarray:
+        """
+        Read-only (warp count, 2) flat indexes of the non-adjacent exits
+        """
+        return self._tile_grid.warp_indexes
+
+    def labels(self, item_inventory: Iterable[str]) -> FrozenLabels:
+        """
+        Returns the FrozenLabels of the inventory, labelling the map and
+        publishing the labelling if the inventory hasn't been seen before
+        """
+        inventory_mask = self._tile_grid.inventory_mask(item_inventory)
+        frozen_labels = self._labellings.get(inventory_mask)
+        if frozen_labels is None:
+            frozen_labels = FrozenLabels(
+                ComponentLabels(
+                    self._tile_grid, inventory_mask, backend=self.backend
+                )
+            )
+            if len(self._labellings) < self.max_labellings:
+                frozen_labels = self._labellings.setdefault(
+                    inventory_mask, frozen_labels
+                )
+        return frozen_labels
+
+    _labels = labels
+
+    def _check_coord(self, coord: Coord) -> None:
+        """
+        Raises the TileMapIndexError for coordinates outside the map
+        """
+        if not (
+            isinstance(coord, tuple) and self._tile_grid.in_bounds(coord)
+        ):
+            raise TileMapIndexError(self, coord, None)
+
+    def distance_map(
+        self,
+        start_coord: Coord,
+        item_inventory: Optional[Iterable[str]] = None,
+    ) -> np.ndarray:
+        """
+        Returns the number of steps from the start coordinate to every
+        tile with the inventory, -1 for the tiles never discovered
+        """
+        self._check_coord(start_coord)
+        frozen_labels = self.labels(item_inventory or ())
+        return self.backend.distance_map(
+            frozen_labels.walkable, start_coord, self.warp_indexes
+        )
@@ -0,0 +1,424 @@
+"""
+Minimal required item sets per location
+
+The TileGraph follows a single greedy progression, collecting every
+reward as soon as it can. The RequirementSolver instead finds, for every
+location, each inclusion-minimal set of items that has to be collected
+starting from an empty inventory in order to reach and complete it
+
+Inventories are stored as ItemTable bitmasks and every collection of
+candidate inventories is kept as an antichain, pruning any inventory
+that is a superset of (dominated by) another candidate
+
+Process:
+    > Group the tiles into regions of adjacent tiles sharing the same
+      traversal_cost and connect the regions through adjacency and the
+      non-adjacent exits of the map
+    > Costs holding alternatives (see beedle.tilecost) contribute one
+      candidate inventory per clause
+    > Propagate the minimal inventories required to enter every region
+      from the starting tile (memoized reachability for every location)
+    > Combine the inventories required to reach a location with its
+      reward_cost, then iterate to a fixed point replacing every item by
+      the minimal item sets of the locations rewarding it
+"""
+
+from collections import deque
+from typing import (
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from loguru import logger
+import numpy as np
+
+from .tilecost import cost_masks
+from .tilegrid import TileGrid
+from .tilekernels import KernelBackend, get_backend
+from .tilelocations import LocationMap
+from .tilemap import TileMap
+
+
+Coord = Tuple[int, int]
+ItemSets = Tuple[FrozenSet[str], ...]
+
+
+def iterate_bits(item_mask: int) -> Iterable[int]:
+    """
+    Yields the index of every bit set within the mask
+    """
+    while item_mask:
+        lowest_bit = item_mask & -item_mask
+        yield lowest_bit.bit_length() - 1
+        item_mask ^= lowest_bit
+
+
+def minimize_antichain(item_masks: Iterable[int]) -> List[int]:
+    """
+    Removes every mask that is a superset of another mask within the
+    collection, returning the inclusion-minimal masks
+    """
+    minimal_masks = []
+    sorted_masks = sorted(
+        set(item_masks), key=lambda mask: bin(mask).count("1")
+    )
+    for item_mask in sorted_masks:
+        if all(kept_mask & ~item_mask for kept_mask in minimal_masks):
+            minimal_masks.append(item_mask)
+    return minimal_masks
+
+
+def insert_antichain(antichain: List[int], item_mask: int) -> bool:
+    """
+    Inserts the mask into the antichain unless it's dominated by an
+    existing mask, dropping every existing mask it dominates
+
+    Returns whether the antichain changed
+    """
+    for kept_mask in antichain:
+        if kept_mask & ~item_mask == 0:
+            return False
+    antichain[:] = [
+        kept_mask for kept_mask in antichain if item_mask & ~kept_mask
+    ]
+    antichain.append(item_mask)
+    return True
+
+
+class RequirementSolver:
+    """
+    Computes the minimal item sets required to reach and complete every
+    location of the LocationMap starting from graph_start
+
+    Only items referenced by a cost can be part of a minimal item set,
+    rewards that are never required are ignored. Items rewarded together
+    by a single location are always collected together, so they appear
+    together within the item sets
+
+    Configurations offering many alternative sources for the same items
+    can have exponentially many minimal item sets. max_item_sets bounds
+    the search by only keeping the smallest item sets found for each
+    location, which keeps every returned item set valid but may miss
+    some of the minimal item sets
+
+    The regions of each cost class are labelled on the kernel backend
+    selected by get_backend
+    """
+
+    def __init__(
+        self,
+        graph_start: Coord,
+        tile_map: TileMap,
+        location_map: LocationMap,
+        max_item_sets: Optional[int] = None,
+        backend: Union[str, KernelBackend, None] = None,
+    ):
+        self.graph_start = graph_start
+        self.max_item_sets = max_item_sets
+        self.backend = get_backend(backend)
+        self.tile_grid = TileGrid(tile_map)
+        self.item_table = self.tile_grid.item_table
+
+        location_costs = {}
+        for location, location_properties in location_map.items():
+            location_costs[location] = cost_masks(
+                location_properties["reward_cost"], self.item_table
+            )
+
+        self.location_costs = {}
+        self.location_bundles = {}
+        self.item_sources = {}
+        for location, location_properties in location_map.items():
+            traversal_masks = self.tile_grid.class_clause_masks[
+                self.tile_grid.cost_class[location]
+            ]
+            self.location_costs[location] = minimize_antichain(
+                reward_cost_mask | traversal_mask
+                for reward_cost_mask in location_costs[location]
+                for traversal_mask in traversal_masks
+            )
+            bundle_mask = self.item_table.mask(location_properties["reward"])
+            self.location_bundles[location] = bundle_mask
+            for item_index in iterate_bits(bundle_mask):
+                self.item_sources.setdefault(item_index, []).append(location)
+
+        self.unobtainable_mask = 0
+        for item_index in range(len(self.item_table)):
+            if item_index not in self.item_sources:
+                self.unobtainable_mask |= 1 << item_index
+
+        self.region_labels, self.region_costs = self.__form_regions()
+        self.region_requirements = self.__propagate_regions()
+        self.location_requirements = self.__solve_locations()
+
+    def __form_regions(self) -> Tuple[np.ndarray, List[List[int]]]:
+        """
+        Labels regions of adjacent tiles sharing the same cost class,
+        storing the clause masks of the cost class for every region
+
+        Clauses containing an item that no location rewards are dropped,
+        regions left without a clause can never be entered and are
+        labelled -1
+        """
+        cost_class = self.tile_grid.cost_class
+        region_labels = np.full(cost_class.shape, -1, dtype=np.int64)
+        region_costs = []
+        for class_index, clause_masks in enumerate(
+            self.tile_grid.class_clause_masks
+        ):
+            class_masks = [
+                clause_mask
+                for clause_mask in clause_masks
+                if not clause_mask & self.unobtainable_mask
+            ]
+            if not class_masks:
+                continue
+            class_labels, class_count = self.backend.label_components(
+                cost_class == class_index
+            )
+            class_tiles = class_labels >= 0
+            region_labels[class_tiles] = class_labels[class_tiles] + len(
+                region_costs
+            )
+            region_costs.extend([class_masks] * class_count)
+        return region_labels, region_costs
+
+    def __region_edges(self) -> Dict[int, Set[int]]:
+        """
+        Connects the regions sharing a border along with the regions
+        joined through non-adjacent exits
+        """
+        region_labels = self.region_labels
+        border_pairs = [
+            (region_labels[:, :-1].ravel(), region_labels[:, 1:].ravel()),
+            (region_labels[:-1, :].ravel(), region_labels[1:, :].ravel()),
+        ]
+        region_edges = {}
+        for first_regions, second_regions in border_pairs:
+            border = (
+                (first_regions != second_regions)
+                & (first_regions >= 0)
+                & (second_regions >= 0)
+            )
+            region_pairs = np.unique(
+                np.stack((first_regions[border], second_regions[border])),
+                axis=1,
+            )
+            for first_region, second_region in region_pairs.T.tolist():
+                region_edges.setdefault(first_region, set()).add(second_region)
+                region_edges.setdefault(second_region, set()).add(first_region)
+
+        for warp_entrance, warp_exit in self.tile_grid.warps:
+            entrance_region = int(region_labels[warp_entrance])
+            exit_region = int(region_labels[warp_exit])
+            if entrance_region >= 0 and exit_region >= 0:
+                region_edges.setdefault(entrance_region, set()).add(
+                    exit_region
+                )
+        return region_edges
+
+    def __propagate_regions(self) -> List[List[int]]:
+        """
+        Propagates the minimal inventories required to enter each region
+        starting from the neighbors of graph_start
+
+        Every region stores an antichain of inventories, and a region is
+        only revisited when a new non-dominated inventory reaches it
+        """
+        region_edges = self.__region_edges()
+        region_requirements = [[] for _ in self.region_costs]
+
+        search_stack = []
+        for neighbor in self.tile_grid.neighbors(self.graph_start):
+            neighbor_region = int(self.region_labels[neighbor])
+            if neighbor_region < 0:
+                continue
+            for neighbor_mask in self.region_costs[neighbor_region]:
+                if insert_antichain(
+                    region_requirements[neighbor_region], neighbor_mask
+                ):
+                    search_stack.append((neighbor_region, neighbor_mask))
+
+        while search_stack:
+            region, item_mask = search_stack.pop()
+            if item_mask not in region_requirements[region]:
+                continue
+            for next_region in region_edges.get(region, ()):
+                for clause_mask in self.region_costs[next_region]:
+                    next_mask = item_mask | clause_mask
+                    if insert_antichain(
+                        region_requirements[next_region], next_mask
+                    ):
+                        search_stack.append((next_region, next_mask))
+        return region_requirements
+
+    def __possession_requirements(self, location: Coord) -> List[int]:
+        """
+        Minimal inventories that need to be held to reach and
+        complete the location
+        """
+        location_masks = [
+            location_mask
+            for location_mask in self.location_costs[location]
+            if not location_mask & self.unobtainable_mask
+        ]
+        if not location_masks:
+            return []
+
+        reach_masks = []
+        location_region = int(self.region_labels[location])
+        if location_region >= 0:
+            reach_masks.extend(self.region_requirements[location_region])
+        if location == self.graph_start:
+            reach_masks.append(0)
+        return minimize_antichain(
+            reach_mask | location_mask
+            for reach_mask in reach_masks
+            for location_mask in location_masks
+        )
+
+    def __solve_locations(self) -> Dict[Coord, ItemSets]:
+        """
+        Iterates the minimal collected item sets of every location to a
+        fixed point
+
+        A location's item sets are formed by taking each inventory that
+        needs to be held and replacing every item with the reward of a
+        location providing it combined with that location's item sets
+
+        Locations are re-evaluated from a worklist only when the item sets
+        of a location rewarding one of their required items change
+        """
+        possession = {
+            location: self.__possession_requirements(location)
+            for location in self.location_costs
+        }
+        dependents = {}
+        for location, possession_masks in possession.items():
+            for possession_mask in possession_masks:
+                for item_index in iterate_bits(possession_mask):
+                    dependents.setdefault(item_index, set()).add(location)
+
+        requirements = {location: [] for location in self.location_costs}
+        item_options = {}
+        worklist = deque(
+            location for location, masks in possession.items() if masks
+        )
+        queued = set(worklist)
+        evaluation_count = 0
+        while worklist:
+            location = worklist.popleft()
+            queued.discard(location)
+            evaluation_count += 1
+
+            candidate_masks = []
+            for possession_mask in possession[location]:
+                candidate_masks.extend(
+                    self.__expand_possession(
+                        possession_mask, requirements, item_options
+                    )
+                )
+
+            changed = False
+            for candidate_mask in minimize_antichain(candidate_masks):
+                if insert_antichain(requirements[location], candidate_mask):
+                    changed = True
+            if not changed:
+                continue
+
+            if self.max_item_sets is not None:
+                requirements[location] = minimize_antichain(
+                    requirements[location]
+                )[: self.max_item_sets]
+            for item_index in iterate_bits(self.location_bundles[location]):
+                item_options.pop(item_index, None)
+                for dependent in dependents.get(item_index, ()):
+                    if dependent not in queued:
+                        queued.add(dependent)
+                        worklist.append(dependent)
+        logger.info(
+            f"Item requirements converged after {evaluation_count} "
+            "location evaluations"
+        )
+
+        return {
+            location: tuple(
+                sorted(
+                    (self.item_table.names(mask) for mask in location_masks),
+                    key=lambda item_set: (len(item_set), sorted(item_set)),
+                )
+            )
+            for location, location_masks in requirements.items()
+        }
+
+    def __expand_possession(
+        self,
+        possession_mask: int,
+        requirements: Dict[Coord, List[int]],
+        item_options: Dict[int, List[int]],
+    ) -> List[int]:
+        """
+        Replaces every held item with the collected item sets of the
+        locations rewarding it, keeping only the minimal combinations
+        """
+        partial_masks = [0]
+        for item_index in iterate_bits(possession_mask):
+            options = item_options.get(item_index)
+            if options is None:
+                options = minimize_antichain(
+                    self.location_bundles[source] | source_mask
+                    for source in self.item_sources.get(item_index, ())
+                    for source_mask in requirements[source]
+                )
+                item_options[item_index] = options
+            if not options:
+                return []
+
+            partial_masks = minimize_antichain(
+                partial_mask
+                if partial_mask >> item_index & 1
+                else partial_mask | option_mask
+                for partial_mask in partial_masks
+                for option_mask in options
+            )
+            if self.max_item_sets is not None:
+                partial_masks = partial_masks[: self.max_item_sets]
+        return partial_masks
+
+    def minimal_item_sets(self, location: Coord) -> ItemSets:
+        """
+        Every inclusion-minimal item set for the location ordered by size
+        An empty result means the location can't be completed
+        """
+        return self.location_requirements.get(location, ())
+
+    def smallest_item_sets(self, location: Coord) -> ItemSets:
+        """
+        The minimal item sets for the location with the fewest items
+        """
+        item_sets = self.minimal_item_sets(location)
+        if not item_sets:
+            return ()
+        smallest_size = len(item_sets[0])
+        return tuple(
+            item_set
+            for item_set in item_sets
+            if len(item_set) == smallest_size
+        )
+
+    @property
+    def unreachable_locations(self) -> FrozenSet[Coord]:
+        """
+        Locations that can't be completed with any item set
+        """
+        return frozenset(
+            location
+            for location, item_sets in self.location_requirements.items()
+            if not item_sets
+        )
@@ -0,0 +1,279 @@
+"""
+Spatial index over location coordinates
+
+The SpatialIndex buckets the coordinates into a uniform grid of
+bucket_size x bucket_size cells. The points are sorted by bucket in row
+major order, so the buckets overlapping a rectangle are read as one
+contiguous slice per bucket row and filtered with array operations
+rather than scanning every location
+
+Queries
+> range_query
+    > Points within an inclusive rectangle
+> radius_query
+    > Points within a distance of a center, sorted by distance
+> nearest
+    > k nearest points to a center, growing the searched rectangle
+      until the k-th distance is covered
+
+Every query accepts a reachable filter, either a boolean array of the
+map (ReachabilityQuery.reachable_tiles) indexed by the point coordinate
+or a callable taking the point coordinate
+"""
+
+from typing import Callable, Hashable, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+
+Coord = Tuple[int, int]
+ReachableFilter = Union[np.ndarray, Callable[[Coord], bool], None]
+
+DISTANCE_METRICS = ("manhattan", "euclidean", "chebyshev")
+
+
+class SpatialIndex:
+    """
+    Grid bucket index over 2D integer points
+    > points <np.ndarray[int64]>
+        > (point count, 2) coordinates sorted by bucket
+    > keys <list>
+        > Value returned for every point, the point coordinate itself
+          unless keys were provided
+    > bucket_size <int>
+        > Width of the square buckets in tiles
+    > origin, corner <np.ndarray[int64]>
+        > Smallest / largest coordinates of the indexed points
+    > bucket_offsets <np.ndarray[int64]>
+        > Start of every bucket within points, indexed by the row major
+          bucket number, with a final entry holding the point count
+    """
+
+    def __init__(
+        self,
+        points: Iterable[Coord],
+        keys: Optional[Iterable[Hashable]] = None,
+        bucket_size: int = 16,
+    ):
+        points = np.array(list(points), dtype=np.int64).reshape(-1, 2)
+        keys = (
+            [tuple(point) for point in points.tolist()]
+            if keys is None
+            else list(keys)
+        )
+        if len(keys) != len(points):
+            raise ValueError(
+                f"Expected {len(points)} keys, found {len(keys)} keys"
+            )
+        self.bucket_size = max(1, int(bucket_size))
+
+        if len(points):
+            self.origin = points.min(axis=0)
+            self.corner = points.max(axis=0)
+            self.grid_shape = tuple(
+                ((self.corner - self.origin) // self.bucket_size + 1)
+                .tolist()
+            )
+        else:
+            self.origin = np.zeros(2, dtype=np.int64)
+            self.corner = np.zeros(2, dtype=np.int64)
+            self.grid_shape = (1, 1)
+
+        bucket_ids = self.__bucket_ids(points)
+        point_order = np.argsort(bucket_ids, kind="stable")
+        self.points = points[point_order]
+        self.keys = [keys[point_index] for point_index in point_order]
+        bucket_counts = np.bincount(
+            bucket_ids, minlength=self.grid_shape[0] * self.grid_shape[1]
+        )
+        self.bucket_offsets = np.zeros(len(bucket_counts) + 1, dtype=np.int64)
+        np.cumsum(bucket_counts, out=self.bucket_offsets[1:])
+
+    def __str__(self) -> str:
+        return (
+            f"SpatialIndex Instance [{len(self.points)} points] "
+            f"[{self.grid_shape} buckets] {id(self)}"
+        )
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def __bucket_ids(self, points: np.ndarray) -> np.ndarray:
+        """
+        Row major bucket number of every point
+        """
+        bucket_coords = (points - self.origin) // self.bucket_size
+        return bucket_coords[:, 0] * self.grid_shape[1] + bucket_coords[:, 1]
+
+    def __candidates(self, min_coord: Coord, max_coord: Coord) -> np.ndarray:
+        """
+        Indexes of the points stored within the buckets overlapping the
+        inclusive rectangle
+        """
+        if not len(self.points):
+            return np.empty(0, dtype=np.int64)
+        min_bucket = np.maximum(
+            (np.asarray(min_coord) - self.origin) // self.bucket_size, 0
+        )
+        max_bucket = np.minimum(
+            (np.asarray(max_coord) - self.origin) // self.bucket_size,
+            np.array(self.grid_shape) - 1,
+        )
+        if (min_bucket > max_bucket).any():
+            return np.empty(0, dtype=np.int64)
+
+        bucket_rows = np.arange(min_bucket[0], max_bucket[0] + 1)
+        row_starts = self.bucket_offsets[
+            bucket_rows * self.grid_shape[1] + min_bucket[1]
+        ]
+        row_ends = self.bucket_offsets[
+            bucket_rows * self.grid_shape[1] + max_bucket[1] + 1
+        ]
+        return np.concatenate(
+            [
+                np.arange(row_start, row_end)
+                for row_start, row_end in zip(row_starts, row_ends)
+            ]
+        )
+
+    def __filter(
+        self, point_indexes: np.ndarray, reachable: ReachableFilter
+    ) -> np.ndarray:
+        """
+        Keeps the point indexes passing the reachable filter
+        """
+        if reachable is None or not len(point_indexes):
+            return point_indexes
+        points = self.points[point_indexes]
+        if isinstance(reachable, np.ndarray):
+            in_bounds = (
+                (points[:, 0] >= 0)
+                & (points[:, 0] < reachable.shape[0])
+                & (points[:, 1] >= 0)
+                & (points[:, 1] < reachable.shape[1])
+            )
+            point_indexes = point_indexes[in_bounds]
+            points = points[in_bounds]
+            return point_indexes[reachable[points[:, 0], points[:, 1]]]
+        return point_indexes[
+            [bool(reachable(tuple(point))) for point in points.tolist()]
+        ]
+
+    def __distances(
+        self, point_indexes: np.ndarray, center: Coord, metric: str
+    ) -> np.ndarray:
+        """
+        Distance from the center to every point index
+        """
+        offsets = np.abs(self.points[point_indexes] - np.asarray(center))
+        if metric == "manhattan":
+            return offsets.sum(axis=1).astype(float)
+        if metric == "euclidean":
+            return np.hypot(offsets[:, 0], offsets[:, 1])
+        if metric == "chebyshev":
+            return offsets.max(axis=1).astype(float)
+        raise ValueError(
+            f"Unknown distance metric {metric!r}, "
+            f"expected one of {DISTANCE_METRICS}"
+        )
+
+    def range_query(
+        self,
+        min_coord: Coord,
+        max_coord: Coord,
+        reachable: ReachableFilter = None,
+    ) -> List[Hashable]:
+        """
+        Returns the keys of the points within the inclusive rectangle
+        spanning min_coord to max_coord
+        """
+        point_indexes = self.__candidates(min_coord, max_coord)
+        points = self.points[point_indexes]
+        inside = (
+            (points[:, 0] >= min_coord[0])
+            & (points[:, 0] <= max_coord[0])
+            & (points[:, 1] >= min_coord[1])
+            & (points[:, 1] <= max_coord[1])
+        )
+        point_indexes = self.__filter(point_indexes[inside], reachable)
+        return [self.keys[point_index] for point_index in point_indexes]
+
+    def radius_query(
+        self,
+        center: Coord,
+        radius: float,
+        metric: str = "manhattan",
+        reachable: ReachableFilter = None,
+    ) -> List[Tuple[Hashable, float]]:
+        """
+        Returns the (key, distance) pairs of the points within the radius
+        of the center, closest first
+        """
+        reach = int(np.floor(radius))
+        point_indexes = self.__candidates(
+            (center[0] - reach, center[1] - reach),
+            (center[0] + reach, center[1] + reach),
+        )
+        point_indexes = self.__filter(point_indexes, reachable)
+        distances = self.__distances(point_indexes, center, metric)
+        within = distances <= radius
+        return self.__sorted_results(
+            point_indexes[within], distances[within], len(point_indexes)
+        )
+
+    def nearest(
+        self,
+        center: Coord,
+        k: int = 1,
+        metric: str = "manhattan",
+        reachable: ReachableFilter = None,
+    ) -> List[Tuple[Hashable, float]]:
+        """
+        Returns the (key, distance) pairs of the k points closest to the
+        center, closest first
+
+        Every point within distance r of the center lies inside the
+        square of half width r for all three metrics, so the square is
+        doubled until it holds k points no farther than r or covers
+        every indexed point
+        """
+        if not len(self.points) or k <= 0:
+            return []
+        center_array = np.asarray(center)
+        extent = int(
+            max(
+                np.abs(self.origin - center_array).max(),
+                np.abs(self.corner - center_array).max(),
+            )
+        )
+        reach = self.bucket_size
+        while True:
+            point_indexes = self.__candidates(
+                (center[0] - reach, center[1] - reach),
+                (center[0] + reach, center[1] + reach),
+            )
+            point_indexes = self.__filter(point_indexes, reachable)
+            distances = self.__distances(point_indexes, center, metric)
+            if reach >= extent:
+                break
+            covered = distances <= reach
+            if covered.sum() >= k:
+                point_indexes = point_indexes[covered]
+                distances = distances[covered]
+                break
+            reach *= 2
+        return self.__sorted_results(point_indexes, distances, k)
+
+    def __sorted_results(
+        self, point_indexes: np.ndarray, distances: np.ndarray, limit: int
+    ) -> List[Tuple[Hashable, float]]:
+        """
+        Returns the closest (key, distance) pairs, breaking distance ties
+        by the point coordinate
+        """
+        points = self.points[point_indexes]
+        result_order = np.lexsort((points[:, 1], points[:, 0], distances))
+        return [
+            (self.keys[point_indexes[result]], float(distances[result]))
+            for result in result_order[:limit]
+        ]
@@ -0,0 +1,200 @@
+"""
+Tracing the hot loops of the library without per-element logging
+
+Formatting a log message for every tile, node or edge costs more than
+the analysis itself, so the hot loops report to the module level tracer
+instead. While disabled every call site is guarded by a single attribute
+check:
+
+    if tracer.enabled:
+        tracer.event("tilegraph.edge", node, connected_node)
+
+When enabled the tracer aggregates rather than formats
+> counters
+    > Number of occurrences per event name
+> phases
+    > Call count and accumulated wall time per named phase
+> events
+    > Ring buffer holding the most recent sampled events, keeping every
+      sample_rate-th occurrence of each event name
+
+The tracer is enabled by setting the BEEDLE_TRACE environment variable
+or by calling tracer.enable()
+"""
+
+from collections import Counter, deque
+import os
+import time
+from typing import Any, Optional
+
+from loguru import logger
+
+
+class TracePhase:
+    """
+    Context manager accumulating the wall time of a phase on the tracer
+    """
+
+    __slots__ = ("tracer", "name", "start_time")
+
+    def __init__(self, tracer: "Tracer", name: str):
+        self.tracer = tracer
+        self.name = name
+        self.start_time = 0.0
+
+    def __enter__(self) -> "TracePhase":
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        elapsed = time.perf_counter() - self.start_time
+        phase_totals = self.tracer.phases.setdefault(self.name, [0, 0.0])
+        phase_totals[0] += 1
+        phase_totals[1] += elapsed
+
+
+class DisabledPhase:
+    """
+    Shared no-op context manager returned while the tracer is disabled
+    """
+
+    __slots__ = ()
+
+    def __enter__(self) -> "DisabledPhase":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+DISABLED_PHASE = DisabledPhase()
+
+
+class Tracer:
+    """
+    Aggregating tracer for the hot loops of the library
+    > enabled <bool>
+        > Whether events are recorded, checked by every call site
+    > sample_rate <int>
+        > Only every sample_rate-th occurrence of an event name is stored
+          in the ring buffer, the counters still see every occurrence
+    > counters <Counter>
+        > Event name -> number of occurrences
+    > phases <dict>
+        > Phase name -> [call count, accumulated seconds]
+    > events <deque>
+        > Ring buffer of (timestamp, event name, payload) tuples
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        buffer_size: int = 1024,
+        sample_rate: int = 1,
+    ):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.counters = Counter()
+        self.phases = {}
+        self.events = deque(maxlen=buffer_size)
+
+    def __str__(self) -> str:
+        return (
+            f"Tracer Instance [enabled={self.enabled}] "
+            f"[{sum(self.counters.values())} events] {id(self)}"
+        )
+
+    def enable(
+        self,
+        buffer_size: Optional[int] = None,
+        sample_rate: Optional[int] = None,
+    ) -> None:
+        """
+        Starts recording, optionally resizing the ring buffer and
+        changing the sample rate
+        """
+        if buffer_size is not None:
+            self.events = deque(self.events, maxlen=buffer_size)
+        if sample_rate is not None:
+            self.sample_rate = max(1, sample_rate)
+        self.enabled = True
+
+    def disable(self) -> None:
+        """
+        Stops recording while keeping everything recorded so far
+        """
+        self.enabled = False
+
+    def reset(self) -> None:
+        """
+        Clears the counters, phases and buffered events
+        """
+        self.counters.clear()
+        self.phases.clear()
+        self.events.clear()
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """
+        Increments the counter for the event name without buffering
+        """
+        if self.enabled:
+            self.counters[name] += amount
+
+    def event(self, name: str, *payload: Any) -> None:
+        """
+        Counts the event and buffers it when it falls on the sample rate
+
+        The payload is stored as given and never formatted
+        """
+        if not self.enabled:
+            return
+        occurrence = self.counters[name]
+        self.counters[name] = occurrence + 1
+        if occurrence % self.sample_rate == 0:
+            self.events.append((time.perf_counter(), name, payload))
+
+    def phase(self, name: str):
+        """
+        Returns a context manager timing the enclosed block as the phase
+        """
+        if not self.enabled:
+            return DISABLED_PHASE
+        return TracePhase(self, name)
+
+    def summary(self) -> dict:
+        """
+        Returns the aggregated counters, phase timings and buffered
+        events as a JSON serializable dictionary
+        """
+        return {
+            "counters": dict(self.counters),
+            "phases": {
+                phase_name: {
+                    "calls": calls,
+                    "seconds": seconds,
+                    "mean_seconds": seconds / calls if calls else 0.0,
+                }
+                for phase_name, (calls, seconds) in self.phases.items()
+            },
+            "events": [
+                [timestamp, name, list(payload)]
+                for timestamp, name, payload in self.events
+            ],
+        }
+
+    def log_summary(self, level: str = "INFO") -> None:
+        """
+        Writes one log message per counter and phase
+        """
+        for name, occurrences in sorted(self.counters.items()):
+            logger.log(level, f"[trace] {name}: {occurrences}")
+        for name, (calls, seconds) in sorted(self.phases.items()):
+            logger.log(
+                level, f"[trace] {name}: {calls} calls in {seconds:.6f}s"
+            )
+
+
+tracer = Tracer(
+    enabled=os.environ.get("BEEDLE_TRACE", "").lower()
+    not in ("", "0", "false", "no")
+)
@@ -0,0 +1,610 @@
+"""
+TileWorld:
+Container for a game world made of several maps (the overworld along
+with towns, caves and palaces), each stored as its own layer
+
+Every layer is a 2D map with its own LocationMap and is only loaded and
+compiled into a TileMap / ReachabilityQuery the first time a search
+reaches it. Layers are addressed by name and tiles across the world by
+WorldCoord (layer, x, y) tuples
+
+Links join a (layer, x, y) entrance to a (layer, x, y) exit, usually
+within another layer. Like the non-adjacent exits of a single map the
+links are directed, so a door leading back out is a separate link
+
+Example world configuration, map paths are relative to the
+configuration file
+    {
+      "tiles": {...},
+      "layers": {
+        "overworld": {"map": "zelda2map.dat", "locations": [...]},
+        "trophy_cave": {"map": "trophy_cave.dat", "locations": [...]}
+      },
+      "links": [
+        {
+          "entrance": ["overworld", 29, 2],
+          "exit": ["trophy_cave", 2, 0],
+          "traversal_cost": []
+        }
+      ]
+    }
+"""
+
+from collections import deque
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from loguru import logger
+import numpy as np
+
+from .exceptions import ConfigurationError
+from .tileconfig import TileTable
+from .tilecost import compile_cost, missing_items, split_count
+from .tilegraph import UnbeatableResult
+from .tileinventory import ItemInventory
+from .tileio import load_map_data
+from .tilelocations import LocationMap
+from .tilemap import TileMap
+from .tilequery import ReachabilityQuery
+from .tilesearch import complete_locations
+from .tiletrace import tracer
+
+
+WorldCoord = Tuple[Hashable, int, int]
+PathLike = Union[str, Path]
+MapSource = Union[np.ndarray, PathLike, Callable[[], np.ndarray]]
+
+
+def _location_order(location: WorldCoord) -> tuple:
+    """
+    Sort key of the world locations, visited layer by layer in entrance
+    order like the locations of a TileGraph chunk
+    """
+    return (str(location[0]), location[1:])
+
+
+class WorldLayer:
+    """
+    Single map of the TileWorld, compiled on first use
+    > name <Hashable>
+        > Layer name used within the WorldCoord
+    > map_source <MapSource>
+        > 2D map data array, path to a map data file or a callable
+          returning the map data
+    > locations <list>
+        > Location configuration entries of the layer, with the
+          coordinates local to the layer
+    > tiles <Optional[dict]>
+        > Tile configuration of the layer, None to use the tiles of the
+          TileWorld
+
+    Once loaded
+    > location_map <LocationMap>
+    > tile_map <TileMap>
+    > reachability <ReachabilityQuery>
+    """
+
+    def __init__(
+        self,
+        name: Hashable,
+        map_source: MapSource,
+        locations: Iterable[dict] = (),
+        tiles: Optional[Union[dict, TileTable]] = None,
+    ):
+        self.name = name
+        self.map_source = map_source
+        self.locations = list(locations)
+        self.tiles = tiles
+        self.location_map = None
+        self.tile_map = None
+        self.reachability = None
+
+    def __str__(self) -> str:
+        state = "loaded" if self.loaded else "unloaded"
+        return f"WorldLayer {self.name} [{state}] {id(self)}"
+
+    @property
+    def loaded(self) -> bool:
+        """
+        Whether the layer has been compiled
+        """
+        return self.tile_map is not None
+
+    def load(
+        self, world_tiles: Union[dict, TileTable], backend=None
+    ) -> "WorldLayer":
+        """
+        Loads the map data and compiles the LocationMap, TileMap and
+        ReachabilityQuery of the layer
+        """
+        if self.loaded:
+            return self
+        with tracer.phase("tileworld.load_layer"):
+            if isinstance(self.map_source, np.ndarray):
+                map_data = self.map_source
+            elif callable(self.map_source):
+                map_data = np.asarray(self.map_source())
+            else:
+                map_data = load_map_data(self.map_source)
+
+            tiles = self.tiles if self.tiles is not None else world_tiles
+            self.location_map = LocationMap(self.locations)
+            self.tile_map = TileMap(map_data, self.location_map, tiles)
+            self.reachability = ReachabilityQuery(
+                self.tile_map, self.location_map, backend=backend
+            )
+        tracer.count("tileworld.layers_loaded")
+        logger.debug(f"Loaded {self} {map_data.shape}")
+        return self
+
+
+class WorldProgression:
+    """
+    Chunked progression through the TileWorld, matching the chunks of
+    a TileGraph for a single layer world
+    > location_order <List[Set[WorldCoord]]>
+        > Locations completed during each chunk
+    > inventory_order <List[FrozenSet[str]]>
+        > Inventory held at the start of each chunk
+    > count_order <List[Dict[str, int]]>
+        > Item counts held at the start of each chunk
+    > item_inventory <FrozenSet[str]>
+        > Items held once the progression stopped
+    > completed_locations <FrozenSet[WorldCoord]>
+        > Every location completed
+    > goal_reached <bool>
+        > Whether the goal location was completed, False when the
+          progression stopped without completing anything new
+    > unbeatable <Optional[UnbeatableResult]>
+        > Diagnostics of a progression stopped at a fixed point before
+          completing its goal, None otherwise
+    """
+
+    def __init__(
+        self,
+        location_order: List[Set[WorldCoord]],
+        inventory_order: List[FrozenSet[str]],
+        count_order: List[Dict[str, int]],
+        item_inventory: FrozenSet[str],
+        goal_reached: bool,
+        unbeatable: Optional[UnbeatableResult] = None,
+    ):
+        self.location_order = location_order
+        self.inventory_order = inventory_order
+        self.count_order = count_order
+        self.item_inventory = item_inventory
+        self.completed_locations = frozenset().union(*location_order)
+        self.goal_reached = goal_reached
+        self.unbeatable = unbeatable
+
+    def __str__(self) -> str:
+        return (
+            f"WorldProgression [{len(self.location_order)} chunks] "
+            f"[goal_reached={self.goal_reached}] {id(self)}"
+        )
+
+
+class TileWorld:
+    """
+    Collection of lazily loaded map layers joined by directed links
+    > tiles <TileTable>
+        > Tile configuration shared by the layers without their own
+    > layers <Dict[Hashable, WorldLayer]>
+        > Layer name -> WorldLayer
+    > links <Dict[WorldCoord, List[Tuple[WorldCoord, FrozenSet[str]]]]>
+        > Link entrance -> (exit, traversal_cost) of every link leaving
+          the entrance
+    > backend
+        > Kernel backend passed to the ReachabilityQuery of each layer
+    """
+
+    def __init__(
+        self,
+        tiles: Union[dict, TileTable],
+        layers: Union[Mapping[Hashable, WorldLayer], Iterable[WorldLayer]],
+        links: Iterable[dict] = (),
+        backend=None,
+    ):
+        if not isinstance(tiles, TileTable):
+            tiles = TileTable(tiles)
+        self.tiles = tiles
+        if isinstance(layers, Mapping):
+            layers = layers.values()
+        self.layers = {layer.name: layer for layer in layers}
+        self.backend = backend
+        self.links = {}
+        self._layer_links = {}
+        self.__add_links(links)
+
+    def __str__(self) -> str:
+        return (
+            f"TileWorld Instance [{len(self.layers)} layers] "
+            f"[{len(self.loaded_layers)} loaded] {id(self)}"
+        )
+
+    @classmethod
+    def from_configuration(
+        cls,
+        config_data: dict,
+        base_path: Optional[PathLike] = None,
+        backend=None,
+    ) -> "TileWorld":
+        """
+        Builds the TileWorld from a world configuration, resolving the
+        layer map paths against base_path
+        """
+        base_path = Path(base_path) if base_path is not None else Path(".")
+        layers = []
+        for layer_name, layer_data in config_data.get("layers", {}).items():
+            map_source = layer_data["map"]
+            if not isinstance(map_source, np.ndarray):
+                map_source = base_path / map_source
+            layers.append(
+                WorldLayer(
+                    layer_name,
+                    map_source,
+                    layer_data.get("locations", ()),
+                    layer_data.get("tiles"),
+                )
+            )
+        return cls(
+            config_data["tiles"],
+            layers,
+            config_data.get("links", ()),
+            backend=backend,
+        )
+
+    @classmethod
+    def from_stacked(
+        cls,
+        map_stack: np.ndarray,
+        tiles: Union[dict, TileTable],
+        layer_locations: Optional[Mapping[int, Iterable[dict]]] = None,
+        links: Iterable[dict] = (),
+        backend=None,
+    ) -> "TileWorld":
+        """
+        Builds the TileWorld from a 3D (layer, x, y) array of equally
+        sized maps, naming each layer by its index along the first axis
+        """
+        if map_stack.ndim != 3:
+            raise ConfigurationError(
+                [f"Expected a 3D map stack, found shape {map_stack.shape}"]
+            )
+        layer_locations = layer_locations or {}
+        layers = [
+            WorldLayer(
+                layer_index,
+                map_stack[layer_index],
+                layer_locations.get(layer_index, ()),
+            )
+            for layer_index in range(map_stack.shape[0])
+        ]
+        return cls(tiles, layers, links, backend=backend)
+
+    def __add_links(self, links: Iterable[dict]) -> None:
+        """
+        Validates the link configuration entries and stores them by
+        entrance and by entrance layer
+        """
+        errors = []
+        for link_index, link_data in enumerate(links):
+            link_coords = []
+            for field in ("entrance", "exit"):
+                world_coord = link_data.get(field)
+                if world_coord is None or len(world_coord) != 3:
+                    errors.append(
+                        f"Link #{link_index} {field} {world_coord!r} isn't "
+                        "a (layer, x, y) coordinate"
+                    )
+                elif world_coord[0] not in self.layers:
+                    errors.append(
+                        f"Link #{link_index} {field} references unknown "
+                        f"layer {world_coord[0]!r}"
+                    )
+                else:
+                    link_coords.append(
+                        (
+                            world_coord[0],
+                            int(world_coord[1]),
+                            int(world_coord[2]),
+                        )
+                    )
+            if len(link_coords) != 2:
+                continue
+            link_entrance, link_exit = link_coords
+            try:
+                traversal_cost = compile_cost(
+                    link_data.get("traversal_cost", ())
+                )
+            except ValueError as cost_err:
+                errors.append(f"Link #{link_index} traversal_cost: {cost_err}")
+                continue
+            self.links.setdefault(link_entrance, []).append(
+                (link_exit, traversal_cost)
+            )
+            self._layer_links.setdefault(link_entrance[0], set()).add(
+                link_entrance
+            )
+        if errors:
+            raise ConfigurationError(errors)
+
+    @property
+    def loaded_layers(self) -> FrozenSet[Hashable]:
+        """
+        Names of the layers compiled so far
+        """
+        return frozenset(
+            layer_name
+            for layer_name, layer in self.layers.items()
+            if layer.loaded
+        )
+
+    def layer(self, layer_name: Hashable) -> WorldLayer:
+        """
+        Returns the WorldLayer, loading it on first access
+        """
+        world_layer = self.layers.get(layer_name)
+        if world_layer is None:
+            raise ConfigurationError([f"Unknown layer {layer_name!r}"])
+        return world_layer.load(self.tiles, backend=self.backend)
+
+    def reachable_tiles(
+        self,
+        start_coord: WorldCoord,
+        item_inventory: Optional[Iterable[str]] = None,
+    ) -> Dict[Hashable, np.ndarray]:
+        """
+        Explores the world from the starting coordinate, following every
+        link whose entrance is discovered and whose traversal_cost is
+        covered by the inventory
+
+        Returns the boolean array of discovered tiles for every layer
+        reached, leaving the layers never reached unloaded
+        """
+        item_inventory = frozenset(item_inventory or ())
+        reached_tiles = {}
+        start_coord = tuple(start_coord)
+        seeded = {start_coord}
+        seed_queue = deque([start_coord])
+        with tracer.phase("tileworld.explore"):
+            while seed_queue:
+                layer_name, *tile_coord = seed_queue.popleft()
+                tile_coord = tuple(tile_coord)
+                layer_tiles = reached_tiles.get(layer_name)
+                if layer_tiles is not None and layer_tiles[tile_coord]:
+                    continue
+
+                reachability = self.layer(layer_name).reachability
+                seed_tiles = reachability.reachable_tiles(
+                    tile_coord, item_inventory
+                )
+                if layer_tiles is not None:
+                    seed_tiles |= layer_tiles
+                reached_tiles[layer_name] = seed_tiles
+
+                for link_entrance in self._layer_links.get(layer_name, ()):
+                    if not seed_tiles[link_entrance[1:]]:
+                        continue
+                    for link_exit, traversal_cost in self.links[link_entrance]:
+                        if (
+                            link_exit not in seeded
+                            and traversal_cost.issubset(item_inventory)
+                        ):
+                            seeded.add(link_exit)
+                            seed_queue.append(link_exit)
+        return reached_tiles
+
+    def reachable_locations(
+        self,
+        start_coord: WorldCoord,
+        item_inventory: Optional[Iterable[str]] = None,
+    ) -> FrozenSet[WorldCoord]:
+        """
+        Returns the location entrances of every layer discovered when
+        exploring the world from the starting coordinate
+        """
+        reached_tiles = self.reachable_tiles(start_coord, item_inventory)
+        return self.__discovered_locations(reached_tiles)
+
+    def is_reachable(
+        self,
+        start_coord: WorldCoord,
+        end_coord: WorldCoord,
+        item_inventory: Optional[Iterable[str]] = None,
+    ) -> bool:
+        """
+        Checks whether the end coordinate is discovered when exploring
+        the world from the start coordinate
+        """
+        reached_tiles = self.reachable_tiles(start_coord, item_inventory)
+        layer_tiles = reached_tiles.get(end_coord[0])
+        return layer_tiles is not None and bool(
+            layer_tiles[tuple(end_coord[1:])]
+        )
+
+    def __discovered_locations(
+        self, reached_tiles: Mapping[Hashable, np.ndarray]
+    ) -> FrozenSet[WorldCoord]:
+        """
+        Converts the discovered tiles of each layer into the discovered
+        location entrances
+        """
+        discovered_locations = set()
+        for layer_name, layer_tiles in reached_tiles.items():
+            location_map = self.layers[layer_name].location_map
+            discovered_locations.update(
+                (layer_name, *location)
+                for location in location_map.entrance_locations
+                if layer_tiles[location]
+            )
+        return frozenset(discovered_locations)
+
+    def progression(
+        self,
+        start_coord: WorldCoord,
+        goal_coord: Optional[WorldCoord] = None,
+        item_inventory: Optional[Iterable[str]] = None,
+    ) -> WorldProgression:
+        """
+        Explores the world in chunks, completing the discovered locations
+        whose costs the inventory covers and collecting their rewards
+        before exploring again with the larger inventory
+
+        Each chunk runs the completion step of the TileGraph
+        (complete_locations) over the discovered locations, so counted
+        items, consume and the single reward of every location behave as
+        they do within a TileGraph
+
+        Stops once the goal location is completed, or when a chunk
+        neither completes a location nor changes the item counts
+        """
+        start_coord = tuple(start_coord)
+        goal_coord = tuple(goal_coord) if goal_coord is not None else None
+        global_item_inventory = ItemInventory(item_inventory or ())
+        global_completed_locations = set()
+        global_collected_locations = set()
+        location_order = []
+        inventory_order = []
+        count_order = []
+        unbeatable = None
+
+        logger.info(f"Exploring {self} from {start_coord}")
+        while goal_coord not in global_completed_locations:
+            chunk_inventory = global_item_inventory
+            with tracer.phase("tileworld.chunk"):
+                reached_tiles = self.reachable_tiles(
+                    start_coord, chunk_inventory.tokens
+                )
+                location_nodes = [
+                    (location, self.__location_node(location))
+                    for location in sorted(
+                        self.__discovered_locations(reached_tiles).difference(
+                            global_completed_locations
+                        ),
+                        key=_location_order,
+                    )
+                ]
+                global_item_inventory = chunk_inventory.copy()
+                completed_locations, _ = complete_locations(
+                    location_nodes,
+                    global_item_inventory,
+                    global_collected_locations,
+                )
+
+            if (
+                not completed_locations
+                and global_item_inventory == chunk_inventory
+            ):
+                if goal_coord is not None:
+                    unbeatable = self.__unbeatable_result(
+                        goal_coord,
+                        reached_tiles,
+                        global_item_inventory,
+                        global_completed_locations,
+                    )
+                break
+            inventory_order.append(chunk_inventory.items)
+            count_order.append(chunk_inventory.as_dict())
+            location_order.append(completed_locations)
+            global_completed_locations.update(completed_locations)
+
+        progression = WorldProgression(
+            location_order,
+            inventory_order,
+            count_order,
+            global_item_inventory.items,
+            goal_coord in global_completed_locations,
+            unbeatable,
+        )
+        logger.info(f"Finished {progression} across {self}")
+        return progression
+
+    def __location_node(self, location: WorldCoord):
+        """
+        TileNode of the location entrance within its layer
+        """
+        return self.layers[location[0]].tile_map[location[1:]]
+
+    def __unbeatable_result(
+        self,
+        goal_coord: WorldCoord,
+        reached_tiles: Mapping[Hashable, np.ndarray],
+        item_inventory: ItemInventory,
+        completed_locations: Set[WorldCoord],
+    ) -> UnbeatableResult:
+        """
+        Collects the diagnostics of a progression stopped at a fixed
+        point, over the layers loaded so far
+
+        Like the TileGraph diagnostics, the terrain_items are the items
+        missing for the tiles bordering the discovered tiles along with
+        the links leaving them, and the missing items of a location are
+        taken from the cost alternative closest to being met
+        """
+        held_tokens = item_inventory.tokens
+        unreachable_locations = {}
+        for layer_name in self.loaded_layers:
+            location_map = self.layers[layer_name].location_map
+            for location in location_map.entrance_locations:
+                world_location = (layer_name, *location)
+                if world_location in completed_locations:
+                    continue
+                location_node = self.__location_node(world_location)
+                unreachable_locations[world_location] = missing_items(
+                    location_node.reward_cost
+                    | location_node.traversal_cost
+                    | location_node.consume,
+                    held_tokens,
+                )
+
+        terrain_items = set()
+        for layer_name, layer_tiles in reached_tiles.items():
+            tile_map = self.layers[layer_name].tile_map
+            for tile_coord in map(tuple, np.argwhere(layer_tiles).tolist()):
+                for edge in tile_map[tile_coord].edges:
+                    if not layer_tiles[edge]:
+                        terrain_items.update(
+                            missing_items(
+                                tile_map[edge].traversal_cost, held_tokens
+                            )
+                        )
+            for link_entrance in self._layer_links.get(layer_name, ()):
+                if layer_tiles[link_entrance[1:]]:
+                    for _, traversal_cost in self.links[link_entrance]:
+                        terrain_items.update(
+                            missing_items(traversal_cost, held_tokens)
+                        )
+
+        blocking_items = set(terrain_items).union(
+            *unreachable_locations.values()
+        )
+        unobtainable_items = {
+            item
+            for item in blocking_items
+            if sum(
+                self.layers[layer_name].location_map.reward_count(item)
+                for layer_name in self.loaded_layers
+            )
+            < split_count(item)[1]
+        }
+        return UnbeatableResult(
+            goal_coord,
+            item_inventory.items,
+            frozenset(completed_locations),
+            unreachable_locations,
+            frozenset(terrain_items),
+            frozenset(unobtainable_items),
+        )
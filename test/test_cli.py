@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the beedle console command using the
+zelda 2 test data as the analyzed corpus
+"""
+
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import io
+import json
+
+from beedle.cli import (
+    _completed_records,
+    _write_records,
+    discover_inputs,
+    main,
+)
+
+
+def test_analyze_command(temporary_data_storage, tmp_path):
+    """
+    Runs the analyze subcommand over the test data directory and checks
+    the JSON-lines record emitted for the zelda 2 configuration
+    """
+    input_pairs = discover_inputs([str(temporary_data_storage)])
+    assert len(input_pairs) == 1
+    config_path, map_path = input_pairs[0]
+    assert config_path.name == "zelda2.json"
+    assert map_path.name == "zelda2map.dat"
+
+    output_path = tmp_path / "analysis.jsonl"
+    profile_path = tmp_path / "profiles"
+    exit_code = main(
+        [
+            "analyze",
+            str(temporary_data_storage / "*.json"),
+            "--start", "23", "22",
+            "--end", "69", "43",
+            "--jobs", "1",
+            "--output", str(output_path),
+            "--profile",
+            "--profile-dir", str(profile_path),
+            "--trace",
+        ]
+    )
+    assert exit_code == 0
+
+    with open(output_path, "r", encoding="utf-8") as output_handle:
+        records = [json.loads(line) for line in output_handle]
+    assert len(records) == 1
+
+    record = records[0]
+    assert record["status"] == "ok"
+    assert record["topological_order"][-1] == [13, [69, 43]]
+    assert [69, 43] in record["location_order"][-1]
+    for stage in ("load", "tile_map", "tile_graph", "topological_sort"):
+        assert record["timings"][stage] >= 0
+    assert len(list(profile_path.glob("*.prof"))) == 1
+
+    trace_summary = record["trace"]
+    assert trace_summary["counters"]["tilemap.tile_nodes"] == 130 * 150
+    assert trace_summary["counters"]["tilegraph.update_edge"] > 0
+    assert trace_summary["phases"]["tilegraph.chunk"]["calls"] == len(
+        record["location_order"]
+    )
+    assert trace_summary["events"]
+
+
+def test_analyze_cache(temporary_data_storage, tmp_path):
+    """
+    Runs the analyze subcommand twice against the same result cache and
+    checks the second run is answered by the cache
+    """
+    cache_path = tmp_path / "results.sqlite"
+    records = []
+    for run_index in range(2):
+        output_path = tmp_path / f"analysis-{run_index}.jsonl"
+        exit_code = main(
+            [
+                "analyze",
+                str(temporary_data_storage),
+                "--start", "23", "22",
+                "--end", "69", "43",
+                "--jobs", "1",
+                "--output", str(output_path),
+                "--cache", str(cache_path),
+            ]
+        )
+        assert exit_code == 0
+        with open(output_path, "r", encoding="utf-8") as output_handle:
+            records.append(json.loads(output_handle.readline()))
+
+    assert records[0]["cache_hit"] is False
+    assert records[1]["cache_hit"] is True
+    for field in ("location_order", "bottlenecks", "topological_order"):
+        assert records[0][field] == records[1][field]
+
+
+def test_analyze_all_locations(temporary_data_storage, tmp_path):
+    """
+    Runs the analyze subcommand with every location as a goal and checks
+    the goal chunks cover every location but the unresolved ones
+    """
+    output_path = tmp_path / "analysis.jsonl"
+    exit_code = main(
+        [
+            "analyze",
+            str(temporary_data_storage),
+            "--start", "23", "22",
+            "--end", "69", "43",
+            "--jobs", "1",
+            "--output", str(output_path),
+            "--all-locations",
+        ]
+    )
+    assert exit_code == 0
+    with open(output_path, "r", encoding="utf-8") as output_handle:
+        record = json.loads(output_handle.readline())
+
+    assert record["status"] == "ok"
+    assert record["unresolved_goals"] == [[126, 51]]
+    goal_chunks = dict(
+        (tuple(goal), chunk_index)
+        for goal, chunk_index in record["goal_chunks"]
+    )
+    assert goal_chunks[(69, 43)] == 13
+    assert len(goal_chunks) + len(record["unresolved_goals"]) == 87
+
+
+def test_analyze_worker_failure(tmp_path):
+    """
+    Checks a worker failing outside of the analysis yields the error
+    record of its input rather than aborting the remaining records
+    """
+    config_path = tmp_path / "zelda2.json"
+    map_path = tmp_path / "zelda2map.dat"
+    analyzed_future = Future()
+    analyzed_future.set_result({"input": 0, "status": "ok"})
+    crashed_future = Future()
+    crashed_future.set_exception(BrokenProcessPool("worker died"))
+    futures = {
+        analyzed_future: (0, config_path, map_path),
+        crashed_future: (1, config_path, None),
+    }
+
+    output_handle = io.StringIO()
+    assert _write_records(_completed_records(futures), output_handle) == 1
+    records = sorted(
+        (json.loads(line) for line in output_handle.getvalue().splitlines()),
+        key=lambda record: record["input"],
+    )
+    assert records[0] == {"input": 0, "status": "ok"}
+    assert records[1] == {
+        "input": 1,
+        "config": str(config_path),
+        "map": None,
+        "status": "error",
+        "error": "BrokenProcessPool: worker died",
+    }
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+"""
+Tests for the lazy imports of the beedle package and the cold-start
+import budget, measured within fresh interpreters
+"""
+
+import importlib
+import os
+import subprocess
+import sys
+
+import pytest
+
+import beedle
+
+
+# Cumulative milliseconds allowed for "import beedle" in a fresh
+# interpreter. The default leaves ample headroom over the ~4 ms measured
+# for machine load, setting BEEDLE_IMPORT_BUDGET_MS tightens it
+IMPORT_BUDGET_MS = float(os.environ.get("BEEDLE_IMPORT_BUDGET_MS", 50))
+HEAVY_MODULES = ("numpy", "loguru", "scipy", "numba", "beedle.tilegraph")
+
+
+def run_probe(statement: str) -> subprocess.CompletedProcess:
+    """
+    Runs the statement with "-X importtime" in a fresh interpreter, then
+    prints the heavy modules it loaded
+    """
+    probe = (
+        f"{statement}\n"
+        "import sys\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+
+
+def test_import_isolation():
+    """
+    Checks importing beedle loads none of the engine modules or heavy
+    dependencies until one of the public names is used
+    """
+    completed = run_probe("import beedle")
+    assert completed.stdout.strip() == ""
+    completed = run_probe("from beedle.cli import build_parser")
+    assert "numpy" not in completed.stdout
+    assert "beedle.tilegraph" not in completed.stdout
+    completed = run_probe("from beedle import TileGraph")
+    assert "numpy" in completed.stdout.split(",")
+
+
+def test_import_budget():
+    """
+    Checks the cumulative time of "import beedle", the fastest of three
+    fresh interpreters, stays within IMPORT_BUDGET_MS
+    """
+    package_timings = []
+    for _ in range(3):
+        completed = run_probe("import beedle")
+        package_timings.extend(
+            int(line.split("|")[1])
+            for line in completed.stderr.splitlines()
+            if line.startswith("import time:")
+            and line.split("|")[2].strip() == "beedle"
+        )
+    assert len(package_timings) == 3
+    assert min(package_timings) / 1000 < IMPORT_BUDGET_MS
+
+
+def test_lazy_exports():
+    """
+    Checks every public name resolves to the object of the submodule
+    defining it, along with the lazily imported submodules
+    """
+    assert set(beedle.__all__) <= set(dir(beedle))
+    for name in beedle.__all__:
+        value = getattr(beedle, name)
+        assert value is getattr(
+            importlib.import_module(value.__module__), name
+        )
+    assert beedle.tilekernels is importlib.import_module("beedle.tilekernels")
+    for missing_name in ("missing_engine", "_private"):
+        with pytest.raises(AttributeError, match=missing_name):
+            getattr(beedle, missing_name)
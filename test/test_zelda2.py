@@ -5,14 +5,73 @@ Test examples using zelda 2 as the data source
 for the beedle library
 """
 
+import copy
+import csv
+import json
 import pprint
 import random
+import struct
 import sys
+from concurrent.futures import ThreadPoolExecutor
+import xml.etree.ElementTree as ElementTree
+import zlib
 
 from loguru import logger
+import numpy as np
 import pytest
 
-from beedle import TileGraph, LocationMap, TileMap, TileMapIndexError
+from beedle import (
+    ConfigurationError,
+    ItemCriticality,
+    ItemInventory,
+    MapEditor,
+    MapSnapshot,
+    TileGraph,
+    LocationMap,
+    PartialTileMap,
+    ReachabilityQuery,
+    RequirementSolver,
+    RoutePlanner,
+    TileMap,
+    TileMapIndexError,
+    TileWorld,
+    WorldLayer,
+    compile_configuration,
+    load_compiled_configuration,
+)
+from beedle.tilecache import ResultCache, analysis_key
+from beedle.tilecost import (
+    CostExpression,
+    compile_cost,
+    format_cost,
+    missing_items,
+)
+from beedle.tileexport import (
+    adjacency_matrix,
+    export_arrays,
+    node_index,
+    write_csv,
+    write_graphml,
+    write_parquet,
+)
+from beedle.tileextract import (
+    MapLayout,
+    QuadrantLayout,
+    decode_rle,
+    extract_map_data,
+)
+from beedle.tilegraph import ALL_LOCATIONS
+from beedle.tilegrid import TileGrid
+from beedle.tileio import load_map_data, save_map_data
+from beedle.tilekernels import BACKENDS, ShardedBackend, get_backend
+from beedle.tilerender import (
+    PNG_SIGNATURE,
+    chunk_regions,
+    color_lookup,
+    render_map,
+    render_pyramid,
+    write_png,
+)
 
 
 def test_location_map(zelda2_configuration):
@@ -34,7 +93,7 @@ def test_location_map(zelda2_configuration):
         )
         logger.debug(item_msg)
 
-    assert isinstance(location_map.entrance_locations, set)
+    assert isinstance(location_map.entrance_locations, frozenset)
     assert len(location_map.entrance_locations) > 0
     for entrance in random.sample([*location_map.entrance_locations], k=3):
         assert isinstance(entrance, tuple)
@@ -74,6 +133,45 @@ def test_location_map(zelda2_configuration):
         )
 
 
+def test_location_map_immutable(zelda2_configuration):
+    """
+    Tests the LocationMap leaves the configuration untouched, refuses
+    modification and derives variants sharing the unchanged entries
+    """
+    location_data = copy.deepcopy(zelda2_configuration["locations"])
+    location_map = LocationMap(location_data)
+    assert location_data == zelda2_configuration["locations"]
+
+    reversed_location_map = LocationMap(location_data[::-1])
+    assert location_map.content_hash == reversed_location_map.content_hash
+    assert hash(location_map) == hash(reversed_location_map)
+    assert location_map == reversed_location_map
+
+    trophy_cave = (29, 2)
+    cave_one = (16, 30)
+    with pytest.raises(AttributeError):
+        location_map[trophy_cave] = {}
+    with pytest.raises(AttributeError):
+        location_map[trophy_cave]["reward"] = set()
+
+    swapped_map = location_map.with_swapped_rewards(trophy_cave, cave_one)
+    assert swapped_map != location_map
+    assert swapped_map[trophy_cave]["reward"] == {"Magic1"}
+    assert swapped_map[cave_one]["reward"] == {"Trophy"}
+    assert location_map[trophy_cave]["reward"] == {"Trophy"}
+    for entrance in location_map.entrance_locations - {trophy_cave, cave_one}:
+        assert swapped_map[entrance] is location_map[entrance]
+
+    restored_map = swapped_map.with_swapped_rewards(trophy_cave, cave_one)
+    assert restored_map.content_hash == location_map.content_hash
+
+    removed_map = location_map.with_changes({trophy_cave: None})
+    assert trophy_cave not in removed_map
+    assert trophy_cave not in removed_map.entrance_locations
+    assert len(removed_map) == len(location_map) - 1
+    assert not removed_map[trophy_cave]
+
+
 def test_map_generation(zelda2_map, zelda2_configuration):
     """
     Tests the ability to turn the map data and specified
@@ -160,3 +258,1490 @@ def test_graph_generation(zelda2_map, zelda2_configuration):
     topological_order, topological_graph = graph_obj.topological_sort(
         tile_map, location_map
     )
+
+
+def test_configuration_compiler(
+    zelda2_map, zelda2_configuration, temporary_data_storage
+):
+    """
+    Tests compiling the zelda 2 configuration into the dense lookup
+    tables and the validation of broken configurations
+    """
+    config_path = temporary_data_storage / "zelda2.json"
+    compiled = load_compiled_configuration(config_path)
+    assert load_compiled_configuration(config_path) is compiled
+
+    tile_data = zelda2_configuration["tiles"]
+    for tile_key, tile_properties in tile_data.items():
+        compiled_properties = compiled.tiles[int(tile_key)]
+        assert compiled.tiles.walkable[int(tile_key)] == (
+            tile_properties["WALKABLE"]
+        )
+        assert compiled_properties["BASE_COST"] == set(
+            tile_properties["BASE_COST"]
+        )
+        assert compiled.tiles.base_cost_mask[int(tile_key)] == (
+            compiled.item_table.mask(tile_properties["BASE_COST"])
+        )
+    assert compiled.unresolved_items == {"Spell"}
+    assert compiled.reward_sources["Triforce"] == ((69, 43),)
+
+    compiled.validate_map(zelda2_map)
+    location_map = LocationMap(compiled.locations)
+    tile_map = TileMap(zelda2_map, location_map, compiled.tiles)
+    for location, properties in location_map.items():
+        assert tile_map[location].reward == properties["reward"]
+
+    with open(config_path, "r", encoding="utf-8") as config_handle:
+        raw_configuration = json.load(config_handle)
+
+    broken_configuration = copy.deepcopy(raw_configuration)
+    del broken_configuration["tiles"]["3"]["WALKABLE"]
+    broken_configuration["locations"][0]["entrance"] = [1]
+    with pytest.raises(ConfigurationError) as config_err:
+        compile_configuration(broken_configuration)
+    assert len(config_err.value.errors) == 2
+
+    broken_configuration = copy.deepcopy(raw_configuration)
+    broken_configuration["tiles"]["4"]["BASE_COST"] = ["Glider"]
+    with pytest.raises(ConfigurationError):
+        compile_configuration(broken_configuration)
+
+    broken_map = zelda2_map.copy()
+    broken_map[0, 0] = 99
+    with pytest.raises(ConfigurationError):
+        compiled.validate_map(broken_map)
+
+
+def test_reachability_query(zelda2_map, zelda2_configuration):
+    """
+    Tests the component label queries against the tiles discovered
+    by the PartialTileMap floodfill
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    reachability = ReachabilityQuery(tile_map, location_map)
+
+    inventories = [set(), {"Boots", "Hammer", "Flute", "BaguNote"}]
+    start_locations = [(23, 22), (8, 59)]
+    for item_inventory in inventories:
+        for start_location in start_locations:
+            partial_tile_map = PartialTileMap(
+                tile_map, start_location, item_inventory
+            )
+            discovered_tiles = set(partial_tile_map.partial_map_tiles)
+
+            reachable_tiles = reachability.reachable_tiles(
+                start_location, item_inventory
+            )
+            assert reachable_tiles.sum() == len(discovered_tiles)
+            assert reachability.reachable_locations(
+                start_location, item_inventory
+            ) == partial_tile_map.discovered_locations(location_map)
+
+            for tile_coord in random.sample([*tile_map.keys()], 100):
+                assert reachability.is_reachable(
+                    start_location, tile_coord, item_inventory
+                ) == (tile_coord in discovered_tiles)
+
+    with pytest.raises(TileMapIndexError):
+        reachability.is_reachable((23, 22), (-1, 0), set())
+
+
+def test_requirement_solver(zelda2_map, zelda2_configuration):
+    """
+    Tests the minimal item sets found for the zelda 2 locations by
+    collecting exactly those items starting from an empty inventory
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    graph_start = (23, 22)
+    solver = RequirementSolver(graph_start, tile_map, location_map)
+    reachability = ReachabilityQuery(tile_map, location_map)
+
+    assert solver.minimal_item_sets((29, 2)) == (frozenset(),)
+    assert solver.minimal_item_sets((2, 6)) == (frozenset({"Trophy"}),)
+    assert solver.unreachable_locations == {(126, 51)}
+
+    great_palace_sets = solver.smallest_item_sets((69, 43))
+    assert great_palace_sets
+    for great_palace_set in great_palace_sets:
+        assert {"Thunder", "Crystal1", "Crystal6"} <= great_palace_set
+
+    def collect_items(item_set):
+        item_inventory = set()
+        completed_locations = set()
+        discovered_items = True
+        while discovered_items:
+            discovered_items = False
+            for location in reachability.reachable_locations(
+                graph_start, item_inventory
+            ):
+                location_node = tile_map[location]
+                total_cost = location_node.reward_cost | (
+                    location_node.traversal_cost
+                )
+                if total_cost.issubset(item_inventory):
+                    completed_locations.add(location)
+                    new_items = (
+                        location_node.reward & item_set
+                    ) - item_inventory
+                    if new_items:
+                        item_inventory.update(new_items)
+                        discovered_items = True
+        return item_inventory, completed_locations
+
+    for location in random.sample([*location_map.keys()], 10):
+        for item_set in solver.minimal_item_sets(location):
+            item_inventory, completed_locations = collect_items(item_set)
+            assert item_set == item_inventory
+            assert location in completed_locations
+
+
+def test_map_editor(zelda2_map, zelda2_configuration):
+    """
+    Tests the incremental re-analysis after tile and location edits
+    against a TileGraph rebuilt from scratch
+    """
+    graph_start = (23, 22)
+    graph_end = (69, 43)
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    map_editor = MapEditor(graph_start, graph_end, tile_map, location_map)
+
+    def assert_rebuilt(tile_graph, map_data, location_map, floodfill=False):
+        rebuilt_map = TileMap(
+            map_data, location_map, zelda2_configuration["tiles"]
+        )
+        rebuilt_graph = TileGraph(
+            graph_start,
+            graph_end,
+            rebuilt_map,
+            location_map,
+            reachability=None
+            if floodfill
+            else ReachabilityQuery(rebuilt_map, location_map),
+        )
+        assert tile_graph.location_order == rebuilt_graph.location_order
+        assert tile_graph.bottlenecks == rebuilt_graph.bottlenecks
+        assert tile_graph.graph_data == rebuilt_graph.graph_data
+
+    map_data = zelda2_map.copy()
+    tile_rng = random.Random(31)
+    tile_changes = {}
+    while len(tile_changes) < 20:
+        tile_coord = (tile_rng.randrange(130), tile_rng.randrange(150))
+        if tile_coord not in location_map and tile_coord != graph_start:
+            tile_changes[tile_coord] = tile_rng.choice([0, 2, 4, 11, 12, 13])
+    for tile_coord, tile_value in tile_changes.items():
+        map_data[tile_coord] = tile_value
+    assert_rebuilt(map_editor.set_tiles(tile_changes), map_data, location_map)
+
+    map_data[23, 23] = 12
+    assert_rebuilt(map_editor.set_tile((23, 23), 12), map_data, location_map)
+
+    location_changes = {(2, 6): {"reward_cost": ["Trophy", "Candle"]}}
+    tile_graph = map_editor.update_locations(location_changes)
+    assert map_editor.location_map[(2, 6)]["reward_cost"] == frozenset(
+        {"Trophy", "Candle"}
+    )
+    assert_rebuilt(
+        tile_graph, map_data, map_editor.location_map, floodfill=True
+    )
+
+
+def test_map_render(zelda2_map, zelda2_configuration, tmp_path):
+    """
+    Tests rendering the zelda 2 map with the progression overlays and
+    decoding the written PNG back into the rendered pixels
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    reachability = ReachabilityQuery(tile_map, location_map)
+    graph_obj = TileGraph(
+        (23, 22), (69, 43), tile_map, location_map, reachability=reachability
+    )
+
+    lookup = color_lookup(tile_table=zelda2_configuration["tiles"])
+    assert lookup.shape == (16, 3)
+    assert tuple(lookup[12]) == (0x3C, 0xBC, 0xFC)
+
+    regions = chunk_regions(graph_obj, reachability)
+    assert regions[23, 22] == 0
+    assert regions.max() < len(graph_obj.inventory_order)
+    map_image = render_map(
+        zelda2_map,
+        lookup,
+        regions=regions,
+        locations=location_map.entrance_locations,
+        bottlenecks=graph_obj.bottlenecks,
+        tile_scale=3,
+    )
+    assert map_image.shape == (130 * 3, 150 * 3, 3)
+
+    png_bytes = write_png(tmp_path / "zelda2.png", map_image).read_bytes()
+    assert png_bytes.startswith(PNG_SIGNATURE)
+    width, height = struct.unpack(">II", png_bytes[16:24])
+    assert (height, width) == map_image.shape[:2]
+    idat_length = struct.unpack(">I", png_bytes[33:37])[0]
+    scanlines = np.frombuffer(
+        zlib.decompress(png_bytes[41 : 41 + idat_length]), dtype=np.uint8
+    ).reshape(height, width * 3 + 1)
+    assert (scanlines[:, 1:].reshape(map_image.shape) == map_image).all()
+
+    pyramid_tiles = render_pyramid(map_image, tmp_path / "pyramid", 128)
+    assert (tmp_path / "pyramid" / "0" / "0_0.png") in pyramid_tiles
+    assert len(pyramid_tiles) == 1 + 4 + 16
+
+
+def test_map_extraction(zelda2_map, tmp_path):
+    """
+    Tests decoding a run length encoded rom layout along with the
+    binary map format round trip
+    """
+    assert decode_rle(np.array([0x21, 0x02, 0xF0])).tolist() == (
+        [1, 1, 1, 2] + [0] * 16
+    )
+
+    rom_path = tmp_path / "test.rom"
+    rom_path.write_bytes(bytes([0x21, 0x12, 0x73]))
+    layout = MapLayout(
+        "test",
+        quadrant_shape=(2, 4),
+        quadrants=(
+            QuadrantLayout("left", (0, 1), (0, 0), barrier=9),
+            QuadrantLayout(
+                "right", (2, 2), (0, 1), fills=((slice(1, None), slice(2), 0),)
+            ),
+        ),
+        transpose=True,
+    )
+    map_data = extract_map_data(rom_path, layout)
+    assert map_data.T.tolist() == [
+        [1, 1, 1, 9, 3, 3, 3, 3],
+        [2, 2, 1, 1, 0, 0, 3, 3],
+    ]
+
+    for map_name in ("zelda2map.npy", "zelda2map.dat"):
+        map_path = save_map_data(zelda2_map, tmp_path / map_name)
+        assert (load_map_data(map_path) == zelda2_map).all()
+
+
+def test_goal_directed_graph(zelda2_map, zelda2_configuration):
+    """
+    Tests the goal-directed TileGraph against the full progression for
+    a goal early in the progression and the final goal
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    graph_start = (23, 22)
+    # Ruto Town only needs the Trophy, reachable without any terrain item
+    goal_closures = {
+        (2, 6): {(2, 6), (29, 2)},
+        (69, 43): {
+            (2, 6),
+            (9, 39),
+            (10, 109),
+            (11, 34),
+            (21, 46),
+            (29, 2),
+            (57, 68),
+            (60, 45),
+            (62, 2),
+            (68, 3),
+            (69, 43),
+            (99, 69),
+            (110, 72),
+            (122, 105),
+            (125, 103),
+            (127, 30),
+        },
+    }
+
+    for graph_end, goal_closure in goal_closures.items():
+        full_graph = TileGraph(graph_start, graph_end, tile_map, location_map)
+        full_order = full_graph.topological_sort(tile_map, location_map)
+        for heuristic in (False, True):
+            goal_graph = TileGraph(
+                graph_start,
+                graph_end,
+                tile_map,
+                location_map,
+                goal_directed=True,
+                heuristic=heuristic,
+            )
+            assert goal_graph.goal_locations == goal_closure
+            assert [
+                completion_group & goal_graph.goal_locations
+                for completion_group in full_graph.location_order
+            ] == goal_graph.location_order
+            assert (
+                goal_graph.topological_sort(tile_map, location_map)
+                == full_order
+            )
+
+
+@pytest.mark.parametrize("backend_name", sorted(BACKENDS))
+def test_kernel_backends(zelda2_map, zelda2_configuration, backend_name):
+    """
+    Tests every kernel backend against the pure Python reference kernels
+    on the zelda 2 map and on random maps, skipping the backends whose
+    libraries aren't installed
+    """
+    try:
+        backend = get_backend(backend_name)
+    except ImportError:
+        pytest.skip(f"Kernel backend {backend_name} is unavailable")
+    reference = get_backend("python")
+
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    tile_grid = TileGrid(tile_map)
+    random_generator = np.random.default_rng(2)
+    kernel_inputs = [
+        (
+            tile_grid.traversable(tile_grid.inventory_mask(inventory)),
+            tile_grid.warp_indexes,
+        )
+        for inventory in (set(), {"Boots", "Hammer", "Flute"})
+    ]
+    for density in (0.4, 0.6, 0.8):
+        walkable = random_generator.random((37, 53)) < density
+        warps = random_generator.integers(0, walkable.size, (20, 2))
+        kernel_inputs.append((walkable, warps))
+
+    for walkable, warps in kernel_inputs:
+        labels, component_count = backend.label_components(walkable)
+        reference_labels, reference_count = reference.label_components(
+            walkable
+        )
+        assert component_count == reference_count
+        assert np.array_equal(labels, reference_labels)
+
+        start_coords = []
+        if walkable.shape == zelda2_map.shape:
+            start_coords.extend([(23, 22), (8, 59)])
+        start_coords.extend(
+            tuple(coord)
+            for coord in random_generator.integers(
+                0, walkable.shape, (10, 2)
+            ).tolist()
+        )
+        assert np.array_equal(
+            backend.distance_maps(walkable, start_coords, warps),
+            [
+                reference.distance_map(walkable, start_coord, warps)
+                for start_coord in start_coords
+            ],
+        )
+        for start_coord in start_coords:
+            assert np.array_equal(
+                backend.distance_map(walkable, start_coord, warps),
+                reference.distance_map(walkable, start_coord, warps),
+            )
+            assert np.array_equal(
+                backend.flood_fill(walkable, start_coord, warps),
+                reference.flood_fill(walkable, start_coord, warps),
+            )
+
+    walkable = random_generator.random((9, 11)) < 0.6
+    warps = random_generator.integers(0, walkable.size, (6, 2))
+    for end_coord in [(0, 0), (4, 5), (8, 10)]:
+        reaching = np.zeros(walkable.shape, dtype=bool)
+        for tile_coord in np.ndindex(*walkable.shape):
+            reaching[tile_coord] = reference.flood_fill(
+                walkable, tile_coord, warps
+            )[end_coord]
+        assert np.array_equal(
+            backend.reverse_flood_fill(walkable, end_coord, warps), reaching
+        )
+
+    graph_start, graph_end = (23, 22), (69, 43)
+    item_inventory = {"Boots", "Hammer", "Flute", "BaguNote"}
+    assert set(
+        PartialTileMap(
+            tile_map,
+            graph_start,
+            item_inventory,
+            tile_grid=tile_grid,
+            backend=backend,
+        ).partial_map_tiles
+    ) == set(
+        PartialTileMap(tile_map, graph_start, item_inventory).partial_map_tiles
+    )
+    kernel_graph = TileGraph(
+        graph_start, graph_end, tile_map, location_map, backend=backend
+    )
+    full_graph = TileGraph(graph_start, graph_end, tile_map, location_map)
+    assert kernel_graph.location_order == full_graph.location_order
+    assert kernel_graph.bottlenecks == full_graph.bottlenecks
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_sharded_backend(zelda2_map, zelda2_configuration, jobs):
+    """
+    Tests the strip labelling of the sharded backend against a single
+    labelling, in process and across worker processes
+    """
+    reference = get_backend("python")
+    backend = ShardedBackend(jobs=jobs, shards=7, min_shard_rows=4)
+    assert get_backend("sharded").inner.name != "sharded"
+    assert backend.shard_rows(130)[0] == (0, 18)
+    assert backend.shard_rows(130)[-1][1] == 130
+    assert len(backend.shard_rows(12)) == 3
+    assert backend.shard_rows(3) == [(0, 3)]
+
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    tile_grid = TileGrid(tile_map)
+    random_generator = np.random.default_rng(3)
+    kernel_inputs = [
+        (
+            tile_grid.traversable(tile_grid.inventory_mask(inventory)),
+            tile_grid.warp_indexes,
+        )
+        for inventory in (set(), {"Boots", "Hammer", "Flute"})
+    ]
+    for density in (0.3, 0.6, 0.8):
+        walkable = random_generator.random((61, 23)) < density
+        warps = random_generator.integers(0, walkable.size, (20, 2))
+        kernel_inputs.append((walkable, warps))
+
+    try:
+        for walkable, warps in kernel_inputs:
+            labels, component_count = backend.label_components(walkable)
+            reference_labels, reference_count = reference.label_components(
+                walkable
+            )
+            assert component_count == reference_count
+            assert np.array_equal(labels, reference_labels)
+            for start_coord in random_generator.integers(
+                0, walkable.shape, (6, 2)
+            ).tolist():
+                assert np.array_equal(
+                    backend.flood_fill(walkable, tuple(start_coord), warps),
+                    reference.flood_fill(walkable, tuple(start_coord), warps),
+                )
+
+        query = ReachabilityQuery(tile_map, location_map, backend=backend)
+        reference_query = ReachabilityQuery(tile_map, location_map)
+        for item_inventory in (set(), {"Boots", "Hammer", "Raft"}):
+            assert query.reachable_locations(
+                (23, 22), item_inventory
+            ) == reference_query.reachable_locations((23, 22), item_inventory)
+        sharded_graph = TileGraph(
+            (23, 22), (69, 43), tile_map, location_map, backend=backend
+        )
+        full_graph = TileGraph((23, 22), (69, 43), tile_map, location_map)
+        assert sharded_graph.location_order == full_graph.location_order
+    finally:
+        backend.close()
+
+
+def test_tile_world(zelda2_map, zelda2_configuration):
+    """
+    Tests the TileWorld progression against the TileGraph, then moves
+    the Trophy into a cave layer linked from the overworld
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    tile_graph = TileGraph((23, 22), (69, 43), tile_map, location_map)
+
+    single_world = TileWorld(
+        zelda2_configuration["tiles"],
+        [
+            WorldLayer(
+                "overworld", zelda2_map, zelda2_configuration["locations"]
+            )
+        ],
+    )
+    progression = single_world.progression(
+        ("overworld", 23, 22), ("overworld", 69, 43)
+    )
+    assert progression.goal_reached
+    assert [
+        {location[1:] for location in completion_group}
+        for completion_group in progression.location_order
+    ] == tile_graph.location_order
+    assert progression.inventory_order == tile_graph.inventory_order
+    assert progression.count_order == tile_graph.count_order
+    assert progression.unbeatable is None
+
+    def strip_layer(locations):
+        return {location[1:] for location in locations}
+
+    spectacle_cave = (10, 109)
+    for key_cost in (["SmallKey*2"], ["SmallKey*3"]):
+        key_locations = copy.deepcopy(zelda2_configuration["locations"])
+        for location_data in key_locations:
+            if tuple(location_data["entrance"]) in ((48, 11), (55, 16)):
+                location_data["reward"] = ["SmallKey"]
+            elif tuple(location_data["entrance"]) == spectacle_cave:
+                location_data["reward_cost"] = key_cost
+                location_data["consume"] = ["SmallKey", "SmallKey"]
+        key_map = LocationMap(copy.deepcopy(key_locations))
+        key_graph = TileGraph(
+            (23, 22),
+            (69, 43),
+            TileMap(zelda2_map, key_map, zelda2_configuration["tiles"]),
+            key_map,
+        )
+        key_progression = TileWorld(
+            zelda2_configuration["tiles"],
+            [WorldLayer("overworld", zelda2_map, key_locations)],
+        ).progression(("overworld", 23, 22), ("overworld", 69, 43))
+        assert key_progression.goal_reached == key_graph.beatable
+        assert [
+            strip_layer(completion_group)
+            for completion_group in key_progression.location_order
+        ] == key_graph.location_order
+        assert key_progression.count_order == key_graph.count_order
+        if key_graph.beatable:
+            assert key_progression.unbeatable is None
+            continue
+        world_unbeatable = key_progression.unbeatable
+        assert {
+            location[1:]: missing
+            for location, missing in (
+                world_unbeatable.unreachable_locations.items()
+            )
+        } == key_graph.unbeatable.unreachable_locations
+        assert world_unbeatable.blocking_items == (
+            key_graph.unbeatable.blocking_items
+        )
+        assert world_unbeatable.unobtainable_items == (
+            key_graph.unbeatable.unobtainable_items
+        )
+
+    overworld_locations = copy.deepcopy(zelda2_configuration["locations"])
+    for location_data in overworld_locations:
+        if location_data["entrance"] == [29, 2]:
+            location_data["reward"] = []
+    cave_map = np.full((5, 7), 11)
+    cave_map[1:4, :6] = 1
+    cave_locations = [
+        {
+            "description": "Trophy",
+            "entrance": [2, 5],
+            "exit": [2, 5],
+            "traversal_cost": [],
+            "reward_cost": [],
+            "reward": ["Trophy"],
+        }
+    ]
+
+    def sealed_map():
+        raise AssertionError("The sealed layer should never be loaded")
+
+    world = TileWorld(
+        zelda2_configuration["tiles"],
+        [
+            WorldLayer("overworld", zelda2_map, overworld_locations),
+            WorldLayer("trophy_cave", cave_map, cave_locations),
+            WorldLayer("sealed", sealed_map),
+        ],
+        links=[
+            {"entrance": ["overworld", 29, 2], "exit": ["trophy_cave", 2, 0]},
+            {"entrance": ["trophy_cave", 2, 0], "exit": ["overworld", 29, 2]},
+            {"entrance": ["overworld", 0, 0], "exit": ["sealed", 0, 0]},
+        ],
+    )
+    assert not world.loaded_layers
+    assert world.is_reachable(("overworld", 23, 22), ("trophy_cave", 2, 5))
+    assert world.loaded_layers == {"overworld", "trophy_cave"}
+
+    progression = world.progression(
+        ("overworld", 23, 22), ("overworld", 69, 43)
+    )
+    assert progression.goal_reached
+    assert world.loaded_layers == {"overworld", "trophy_cave"}
+    for completion_group, graph_group in zip(
+        progression.location_order, tile_graph.location_order
+    ):
+        overworld_group = {
+            location[1:]
+            for location in completion_group
+            if location[0] == "overworld"
+        }
+        assert overworld_group == graph_group
+        assert (("trophy_cave", 2, 5) in completion_group) == (
+            (29, 2) in graph_group
+        )
+
+    with pytest.raises(ConfigurationError):
+        TileWorld(
+            zelda2_configuration["tiles"],
+            [WorldLayer("overworld", zelda2_map)],
+            links=[{"entrance": ["overworld", 29, 2], "exit": ["cave", 0]}],
+        )
+
+
+def test_graph_export(zelda2_map, zelda2_configuration, tmp_path):
+    """
+    Tests the TileGraph exporters against graph_data and the
+    topological_sort output
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    tile_graph = TileGraph((23, 22), (69, 43), tile_map, location_map)
+    topological_order, _ = tile_graph.topological_sort(tile_map, location_map)
+    graph_edges = {
+        (node, connected_node)
+        for node, connected_nodes in tile_graph.graph_data.items()
+        for connected_node in connected_nodes
+    }
+
+    node_coords, edges = export_arrays(tile_graph)
+    assert {
+        (tuple(node_coords[source]), tuple(node_coords[target]))
+        for source, target in edges.tolist()
+    } == graph_edges
+    assert len(edges) == len(graph_edges)
+    try:
+        adjacency = adjacency_matrix(tile_graph)
+    except ImportError:
+        adjacency = None
+    if adjacency is not None:
+        assert adjacency.nnz == len(graph_edges)
+
+    nodes = node_index(tile_graph)
+    node_path, edge_path = write_csv(
+        tile_graph,
+        location_map,
+        tmp_path / "nodes.csv",
+        tmp_path / "edges.csv",
+        topological_order,
+    )
+    with open(node_path, "r", encoding="utf-8") as node_handle:
+        node_rows = list(csv.DictReader(node_handle))
+    assert len(node_rows) == len(nodes)
+    for node_row in node_rows:
+        node = (int(node_row["x"]), int(node_row["y"]))
+        assert nodes[node] == int(node_row["node_id"])
+        assert node_row["description"] == location_map[node]["description"]
+        chunk = int(node_row["chunk"])
+        assert chunk == -1 or node in tile_graph.location_order[chunk]
+    goal_row = node_rows[nodes[(69, 43)]]
+    assert int(goal_row["topological_index"]) >= 0
+    with open(edge_path, "r", encoding="utf-8") as edge_handle:
+        edge_kinds = [
+            edge_row["kind"] for edge_row in csv.DictReader(edge_handle)
+        ]
+    assert edge_kinds.count("graph") == len(graph_edges)
+
+    graphml_path = write_graphml(
+        tile_graph, location_map, tmp_path / "graph.graphml", topological_order
+    )
+    namespace = "{http://graphml.graphdrawing.org/xmlns}"
+    graphml_root = ElementTree.parse(graphml_path).getroot()
+    assert len(graphml_root.findall(f".//{namespace}node")) == len(nodes)
+    assert len(graphml_root.findall(f".//{namespace}edge")) == len(edge_kinds)
+
+    try:
+        write_parquet(
+            tile_graph,
+            location_map,
+            tmp_path / "nodes.parquet",
+            tmp_path / "edges.parquet",
+        )
+    except ImportError:
+        pass
+    else:
+        assert (tmp_path / "nodes.parquet").stat().st_size > 0
+
+
+def test_spatial_index(zelda2_map, zelda2_configuration):
+    """
+    Tests the LocationMap spatial index queries against scanning every
+    location, with and without the reachability filter
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    reachability = ReachabilityQuery(tile_map, location_map)
+    entrance_index = location_map.spatial_index()
+    assert len(entrance_index) == len(location_map)
+    entrances = sorted(location_map.entrance_locations)
+
+    def manhattan(first: tuple, second: tuple) -> int:
+        return abs(first[0] - second[0]) + abs(first[1] - second[1])
+
+    for min_coord, max_coord in (((0, 0), (20, 20)), ((50, 30), (90, 80))):
+        assert sorted(entrance_index.range_query(min_coord, max_coord)) == [
+            entrance
+            for entrance in entrances
+            if min_coord[0] <= entrance[0] <= max_coord[0]
+            and min_coord[1] <= entrance[1] <= max_coord[1]
+        ]
+
+    center = (60, 40)
+    assert sorted(
+        location for location, _ in entrance_index.radius_query(center, 25)
+    ) == [
+        entrance for entrance in entrances if manhattan(entrance, center) <= 25
+    ]
+    nearest = entrance_index.nearest(center, k=5)
+    assert [distance for _, distance in nearest] == sorted(
+        manhattan(entrance, center) for entrance in entrances
+    )[:5]
+
+    item_inventory = {"Boots"}
+    reachable_locations = reachability.reachable_locations(
+        (23, 22), item_inventory
+    )
+    nearest_reachable = reachability.nearest_reachable_locations(
+        (23, 22), item_inventory, k=4, origin=center
+    )
+    assert {location for location, _ in nearest_reachable} <= (
+        reachable_locations
+    )
+    assert [distance for _, distance in nearest_reachable] == sorted(
+        manhattan(location, center) for location in reachable_locations
+    )[:4]
+
+    exit_index = location_map.spatial_index("exit")
+    for location in exit_index.range_query(
+        (0, 0), (tile_map.map_size_x, tile_map.map_size_y)
+    ):
+        assert location in location_map
+    with pytest.raises(ValueError):
+        location_map.spatial_index("reward")
+
+
+def test_soft_locks(zelda2_map, zelda2_configuration):
+    """
+    Tests the soft-lock tiles against flood fills from the flagged tiles
+    after turning the Parapa Cave into a one-way passage
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    reachability = ReachabilityQuery(tile_map, location_map)
+    tile_graph = TileGraph((23, 22), (69, 43), tile_map, location_map)
+    soft_locks = reachability.soft_locks(tile_graph)
+    assert len(soft_locks) == len(tile_graph.inventory_order)
+    assert not any(soft_lock.any() for soft_lock in soft_locks)
+
+    graph_start, graph_end = (23, 22), (69, 43)
+    reaching_start = reachability.reaching_tiles(graph_start)
+    assert reaching_start[graph_start]
+    assert reaching_start[reachability.reachable_tiles(graph_start)].all()
+
+    one_way_map = location_map.with_changes({(48, 11): {"exit": (48, 11)}})
+    one_way_tiles = TileMap(
+        zelda2_map, one_way_map, zelda2_configuration["tiles"]
+    )
+    one_way_reachability = ReachabilityQuery(one_way_tiles, one_way_map)
+    item_inventory = {"Boots", "Hammer", "Flute", "Jump", "Fairy", "Raft"}
+    soft_lock = one_way_reachability.soft_lock_tiles(
+        graph_start, graph_end, item_inventory
+    )
+    reachable = one_way_reachability.reachable_tiles(
+        graph_start, item_inventory
+    )
+    assert soft_lock.any()
+    assert not soft_lock[graph_start]
+
+    flagged_tiles = [tuple(coord) for coord in np.argwhere(soft_lock).tolist()]
+    safe_tiles = [
+        tuple(coord) for coord in np.argwhere(reachable & ~soft_lock).tolist()
+    ]
+    for tile_coord in random.sample(flagged_tiles, 5) + random.sample(
+        safe_tiles, 5
+    ):
+        discovered_tiles = set(
+            PartialTileMap(
+                one_way_tiles, tile_coord, item_inventory
+            ).partial_map_tiles
+        )
+        escapes = (
+            graph_start in discovered_tiles or graph_end in discovered_tiles
+        )
+        assert escapes != soft_lock[tile_coord]
+
+
+def test_result_cache(zelda2_map, zelda2_configuration, tmp_path):
+    """
+    Tests the TileGraph results restored from the ResultCache against a
+    fresh analysis along with the invalidation and eviction of the store
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    graph_start, graph_end = (23, 22), (69, 43)
+    cache_path = tmp_path / "results.sqlite"
+
+    with ResultCache(cache_path) as result_cache:
+        fresh_graph = TileGraph(
+            graph_start, graph_end, tile_map, location_map, cache=result_cache
+        )
+        fresh_sort = fresh_graph.topological_sort(tile_map, location_map)
+        assert result_cache.hits == 0
+        assert len(result_cache) == 2
+
+    with ResultCache(cache_path) as result_cache:
+        cached_graph = TileGraph(
+            graph_start, graph_end, tile_map, location_map, cache=result_cache
+        )
+        cached_sort = cached_graph.topological_sort(tile_map, location_map)
+        assert result_cache.hits == 2
+        assert cached_graph.cache_key == fresh_graph.cache_key
+        assert cached_graph.location_order == fresh_graph.location_order
+        assert cached_graph.inventory_order == fresh_graph.inventory_order
+        assert list(cached_graph.bottlenecks.items()) == list(
+            fresh_graph.bottlenecks.items()
+        )
+        assert cached_graph.graph_data == fresh_graph.graph_data
+        assert cached_sort == fresh_sort
+
+        goal_graph = TileGraph(
+            graph_start,
+            graph_end,
+            tile_map,
+            location_map,
+            goal_directed=True,
+            cache=result_cache,
+        )
+        assert goal_graph.cache_key != fresh_graph.cache_key
+        assert result_cache.misses == 1
+
+        edited_map = zelda2_map.copy()
+        edited_map[0, 0] = 11 if zelda2_map[0, 0] != 11 else 12
+        edited_tiles = TileMap(
+            edited_map, location_map, zelda2_configuration["tiles"]
+        )
+        assert analysis_key(
+            edited_tiles, graph_start, graph_end
+        ) != analysis_key(tile_map, graph_start, graph_end)
+
+        assert result_cache.invalidate(fresh_graph.cache_key) == 2
+        assert fresh_graph.cache_key not in result_cache
+        assert goal_graph.cache_key in result_cache
+
+        result_cache.max_bytes = 0
+        result_cache.put("first", {"value": 1})
+        assert len(result_cache) == 0
+        result_cache.max_bytes = 10**6
+        result_cache.clear()
+        assert result_cache.total_bytes == 0
+
+
+def test_map_snapshot(zelda2_map, zelda2_configuration):
+    """
+    Tests the MapSnapshot answers match the ReachabilityQuery when queried
+    from a thread pool and that edits of the TileMap don't reach it
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    tile_graph = TileGraph((23, 22), (69, 43), tile_map, location_map)
+    reachability = ReachabilityQuery(tile_map, location_map)
+    snapshot = MapSnapshot(
+        tile_map, location_map, inventories=tile_graph.inventory_order
+    )
+    assert snapshot.content_hash == tile_map.content_hash
+    assert (snapshot.tile_values == zelda2_map).all()
+    with pytest.raises(AttributeError):
+        snapshot.shape = (1, 1)
+    with pytest.raises(ValueError):
+        snapshot.tile_values[0, 0] = 0
+    with pytest.raises(TileMapIndexError):
+        snapshot.reachable_tiles((500, 500))
+
+    def snapshot_answers(item_inventory):
+        return (
+            snapshot.reachable_tiles((23, 22), item_inventory),
+            snapshot.reachable_locations((23, 22), item_inventory),
+            snapshot.reaching_tiles((69, 43), item_inventory),
+            snapshot.is_reachable((23, 22), (69, 43), item_inventory),
+        )
+
+    inventories = list(tile_graph.inventory_order) * 4
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        threaded_answers = list(pool.map(snapshot_answers, inventories))
+    for item_inventory, answers in zip(inventories, threaded_answers):
+        assert (
+            answers[0]
+            == reachability.reachable_tiles((23, 22), item_inventory)
+        ).all()
+        assert answers[1] == reachability.reachable_locations(
+            (23, 22), item_inventory
+        )
+        assert (
+            answers[2] == reachability.reaching_tiles((69, 43), item_inventory)
+        ).all()
+        assert answers[3] == reachability.is_reachable(
+            (23, 22), (69, 43), item_inventory
+        )
+
+    full_inventory = tile_graph.inventory_order[-1]
+    reachable_before = snapshot.reachable_tiles((23, 22), full_inventory)
+    distances = snapshot.distance_map((23, 22), full_inventory)
+    assert distances[23, 22] == 0
+    assert ((distances >= 0) == reachable_before).all()
+
+    edited_tile = (23, 23)
+    edited_value = 11 if zelda2_map[edited_tile] != 11 else 12
+    tile_map.set_tile(edited_tile, edited_value)
+    assert snapshot.content_hash != tile_map.content_hash
+    assert snapshot.tile_values[edited_tile] == zelda2_map[edited_tile]
+    assert (
+        snapshot.reachable_tiles((23, 22), full_inventory) == reachable_before
+    ).all()
+
+
+def test_unbeatable_graph(zelda2_map, zelda2_configuration):
+    """
+    Tests the TileGraph stops at a fixed point once the Hammer can no
+    longer be collected and reports what blocked the search
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    tile_graph = TileGraph((23, 22), (69, 43), tile_map, location_map)
+    assert tile_graph.beatable
+    assert tile_graph.unbeatable is None
+
+    spectacle_cave = location_map.location_reward_search("Hammer")
+    hammerless_map = location_map.with_changes(
+        {spectacle_cave: {"reward": []}}
+    )
+    hammerless_tiles = TileMap(
+        zelda2_map, hammerless_map, zelda2_configuration["tiles"]
+    )
+    for goal_directed in (False, True):
+        unbeatable_graph = TileGraph(
+            (23, 22),
+            (69, 43),
+            hammerless_tiles,
+            hammerless_map,
+            goal_directed=goal_directed,
+        )
+        assert not unbeatable_graph.beatable
+        assert len(unbeatable_graph.location_order) == len(
+            unbeatable_graph.inventory_order
+        )
+        assert all(unbeatable_graph.location_order)
+
+        unbeatable = unbeatable_graph.unbeatable
+        assert "Hammer" not in unbeatable.item_inventory
+        assert "Hammer" in unbeatable.blocking_items
+        assert "Hammer" in unbeatable.unobtainable_items
+        assert (69, 43) in unbeatable.unreachable_locations
+        assert unbeatable.goal_missing_items
+        assert unbeatable.completed_locations == frozenset().union(
+            *unbeatable_graph.location_order
+        )
+        assert not unbeatable.completed_locations.intersection(
+            unbeatable.unreachable_locations
+        )
+        for location_items in unbeatable.unreachable_locations.values():
+            assert not location_items & unbeatable.item_inventory
+
+        unbeatable_data = json.loads(json.dumps(unbeatable.as_dict()))
+        restored = type(unbeatable).from_dict(unbeatable_data)
+        assert restored.unreachable_locations == (
+            unbeatable.unreachable_locations
+        )
+        assert restored.blocking_items == unbeatable.blocking_items
+
+
+def test_cost_expressions(zelda2_map, zelda2_configuration, tmp_path):
+    """
+    Tests boolean cost expressions through the compiler, the reachability
+    kernels, the flood fill, the TileGraph, the RequirementSolver, the
+    topological sort and the exporters
+    """
+    assert compile_cost(["Boots", "Raft"]) == frozenset({"Boots", "Raft"})
+    flute_cost = compile_cost("(Boots AND Raft) OR Flute")
+    assert isinstance(flute_cost, CostExpression)
+    assert flute_cost == compile_cost("Flute | Raft & Boots")
+    assert flute_cost != frozenset({"Boots", "Raft", "Flute"})
+    assert format_cost(flute_cost) == "Flute OR (Boots AND Raft)"
+    assert flute_cost.issubset({"Flute"})
+    assert not flute_cost.issubset({"Boots"})
+    assert (frozenset({"Candle"}) | flute_cost).clauses == (
+        frozenset({"Candle", "Flute"}),
+        frozenset({"Boots", "Candle", "Raft"}),
+    )
+    assert compile_cost("Hammer OR (Hammer AND Boots)") == {"Hammer"}
+    with pytest.raises(ValueError):
+        compile_cost("(Hammer OR")
+    assert missing_items(flute_cost, {"Boots"}) == {"Flute"}
+    assert missing_items(flute_cost, {"Flute"}) == frozenset()
+    assert missing_items(["Boots", "Raft"], {"Boots"}) == {"Raft"}
+    assert frozenset({"Flute"}) >= flute_cost
+    for unsupported_operation in (
+        lambda: flute_cost >= {"Flute"},
+        lambda: flute_cost.issuperset({"Flute"}),
+        lambda: flute_cost - {"Flute"},
+        lambda: frozenset({"Flute"}) - flute_cost,
+        lambda: flute_cost & {"Flute"},
+    ):
+        with pytest.raises(TypeError):
+            unsupported_operation()
+
+    def build_maps(configuration):
+        location_map = LocationMap(configuration["locations"])
+        tile_map = TileMap(zelda2_map, location_map, configuration["tiles"])
+        return location_map, tile_map
+
+    location_map, tile_map = build_maps(zelda2_configuration)
+    boulder_configuration = copy.deepcopy(zelda2_configuration)
+    boulder_configuration["tiles"]["14"]["BASE_COST"] = ["Boots"]
+    _, boulder_tiles = build_maps(boulder_configuration)
+    either_configuration = copy.deepcopy(zelda2_configuration)
+    either_configuration["tiles"]["14"]["BASE_COST"] = "Hammer OR Boots"
+    mido_town = (60, 45)
+    for location_entry in either_configuration["locations"]:
+        if tuple(location_entry["entrance"]) == mido_town:
+            location_entry["reward_cost"] = "LifeWater OR Trophy"
+    either_locations, either_tiles = build_maps(either_configuration)
+    assert either_tiles.content_hash != tile_map.content_hash
+
+    reachability = ReachabilityQuery(tile_map, location_map)
+    boulder_reachability = ReachabilityQuery(boulder_tiles, location_map)
+    either_reachability = ReachabilityQuery(either_tiles, either_locations)
+    for item_inventory, expected_reachability in (
+        ({"Hammer"}, reachability),
+        ({"Boots"}, boulder_reachability),
+    ):
+        either_reachable = either_reachability.reachable_tiles(
+            (23, 22), item_inventory
+        )
+        assert (
+            either_reachable
+            == expected_reachability.reachable_tiles((23, 22), item_inventory)
+        ).all()
+        assert set(
+            PartialTileMap(
+                either_tiles, (23, 22), item_inventory
+            ).partial_map_tiles
+        ) == {tuple(coord) for coord in np.argwhere(either_reachable).tolist()}
+
+    def completion_chunk(tile_graph, location):
+        return next(
+            chunk_index
+            for chunk_index, completion_group in enumerate(
+                tile_graph.location_order
+            )
+            if location in completion_group
+        )
+
+    tile_graph = TileGraph((23, 22), (69, 43), tile_map, location_map)
+    either_graph = TileGraph(
+        (23, 22), (69, 43), either_tiles, either_locations
+    )
+    assert either_graph.beatable
+    assert completion_chunk(either_graph, mido_town) < completion_chunk(
+        tile_graph, mido_town
+    )
+
+    # Hammer is held by the fixed point, only the traversal_cost is missing
+    blocked_configuration = copy.deepcopy(zelda2_configuration)
+    for location_entry in blocked_configuration["locations"]:
+        if tuple(location_entry["entrance"]) == (69, 43):
+            location_entry["reward_cost"] = "Hammer OR Fairy"
+            location_entry["traversal_cost"] = ["Unobtainium"]
+    blocked_locations, blocked_tiles = build_maps(blocked_configuration)
+    blocked_graph = TileGraph(
+        (23, 22), (69, 43), blocked_tiles, blocked_locations
+    )
+    assert "Hammer" in blocked_graph.unbeatable.item_inventory
+    assert blocked_graph.unbeatable.goal_missing_items == {"Unobtainium"}
+    assert "Fairy" not in blocked_graph.unbeatable.blocking_items
+
+    either_solver = RequirementSolver((23, 22), either_tiles, either_locations)
+    assert all(
+        "LifeWater" not in item_set
+        for item_set in either_solver.smallest_item_sets(mido_town)
+    )
+
+    compiled = compile_configuration(either_configuration)
+    assert isinstance(compiled.tiles.base_cost[14], CostExpression)
+    assert len(compiled.tiles.base_cost_masks[14]) == 2
+    broken_configuration = copy.deepcopy(either_configuration)
+    broken_configuration["tiles"]["14"]["BASE_COST"] = "Hammer OR"
+    with pytest.raises(ConfigurationError):
+        compile_configuration(broken_configuration)
+
+    # The goal is met through Boots alone, the Raft is never collected
+    def line_location(column, reward=(), reward_cost=()):
+        return {
+            "description": f"Location {column}",
+            "entrance": [0, column],
+            "exit": [0, column],
+            "traversal_cost": [],
+            "reward_cost": list(reward_cost),
+            "reward": list(reward),
+        }
+
+    line_locations = LocationMap(
+        [
+            line_location(0),
+            line_location(1, ["Boots"]),
+            line_location(3, ["Raft"], ["Unobtainium"]),
+            line_location(4, reward_cost=["Boots or Raft"]),
+        ]
+    )
+    line_tiles = TileMap(
+        np.full((1, 5), 5), line_locations, zelda2_configuration["tiles"]
+    )
+    line_graph = TileGraph((0, 0), (0, 4), line_tiles, line_locations)
+    assert line_graph.beatable
+    assert (0, 3) not in set().union(*line_graph.location_order)
+    _, line_topology = line_graph.topological_sort(line_tiles, line_locations)
+    assert line_topology[(0, 4)] == {(0, 1)}
+    assert (0, 3) not in line_topology
+    node_path, _ = write_csv(
+        line_graph,
+        line_locations,
+        tmp_path / "nodes.csv",
+        tmp_path / "edges.csv",
+    )
+    with open(node_path, "r", encoding="utf-8") as node_handle:
+        line_rows = {
+            (int(node_row["x"]), int(node_row["y"])): node_row
+            for node_row in csv.DictReader(node_handle)
+        }
+    assert line_rows[(0, 4)]["reward_cost"] == "Boots OR Raft"
+
+
+def test_counted_items(zelda2_map, zelda2_configuration):
+    """
+    Tests counted and consumed items through the ItemInventory, the
+    reward index of the LocationMap and the TileGraph
+    """
+    inventory = ItemInventory(["SmallKey", "SmallKey*2", "Hammer"])
+    assert inventory.count("SmallKey") == 3
+    assert "SmallKey*3" in inventory and "SmallKey*4" not in inventory
+    assert {"SmallKey", "SmallKey*2", "SmallKey*3"} <= inventory.tokens
+    assert inventory.meets(compile_cost("SmallKey*3"))
+    assert not inventory.meets(compile_cost(["SmallKey*4"]))
+    assert inventory.meets(compile_cost("SmallKey*4 OR Hammer"))
+    assert compile_cost("SmallKey*3").issubset(inventory.tokens)
+    assert ItemInventory.from_tokens(inventory.tokens) == inventory
+    remaining = inventory.copy()
+    remaining.consume(["SmallKey*2"])
+    assert remaining.as_dict() == {"Hammer": 1, "SmallKey": 1}
+    assert inventory.count("SmallKey") == 3
+    with pytest.raises(ValueError):
+        remaining.consume(["SmallKey*2"])
+    assert compile_cost("SmallKey*1") == {"SmallKey"}
+    with pytest.raises(ValueError):
+        compile_cost("SmallKey*0")
+
+    location_map = LocationMap(zelda2_configuration["locations"])
+    assert location_map.location_reward_sources("Life") == [(8, 59), (8, 61)]
+    assert location_map.reward_count("Life") == 2
+    assert location_map.reward_index["Hammer"] == (((10, 109), 1),)
+
+    spectacle_cave = (10, 109)
+    key_changes = {
+        (48, 11): {"reward": ["SmallKey"]},
+        (55, 16): {"reward": ["SmallKey"]},
+        spectacle_cave: {
+            "reward_cost": ["SmallKey*2"],
+            "consume": ["SmallKey", "SmallKey"],
+        },
+    }
+    key_map = location_map.with_changes(key_changes)
+    assert key_map[spectacle_cave]["consume"] == {"SmallKey*2"}
+    assert key_map.location_reward_sources("SmallKey*2") == [
+        (48, 11),
+        (55, 16),
+    ]
+    assert key_map.location_reward_cost_search("SmallKey") == [spectacle_cave]
+    key_tiles = TileMap(zelda2_map, key_map, zelda2_configuration["tiles"])
+    for goal_directed in (False, True):
+        key_graph = TileGraph(
+            (23, 22),
+            (69, 43),
+            key_tiles,
+            key_map,
+            goal_directed=goal_directed,
+        )
+        assert key_graph.beatable
+        assert len(key_graph.count_order) == len(key_graph.inventory_order)
+        assert key_graph.count_order[1]["SmallKey"] == 2
+        assert "SmallKey" not in key_graph.count_order[-1]
+        assert "SmallKey" not in key_graph.inventory_order[-1]
+        _, topological_graph = key_graph.topological_sort(key_tiles, key_map)
+        assert {(48, 11), (55, 16)} <= topological_graph[spectacle_cave]
+
+    key_changes[spectacle_cave]["reward_cost"] = ["SmallKey*3"]
+    locked_map = location_map.with_changes(key_changes)
+    locked_graph = TileGraph(
+        (23, 22),
+        (69, 43),
+        TileMap(zelda2_map, locked_map, zelda2_configuration["tiles"]),
+        locked_map,
+    )
+    assert not locked_graph.beatable
+    assert "SmallKey*3" in locked_graph.unbeatable.unreachable_locations[
+        spectacle_cave
+    ]
+    assert "SmallKey*3" in locked_graph.unbeatable.unobtainable_items
+
+    key_configuration = copy.deepcopy(zelda2_configuration)
+    for location_entry in key_configuration["locations"]:
+        if tuple(location_entry["entrance"]) in ((48, 11), (55, 16)):
+            location_entry["reward"] = ["SmallKey"]
+        elif tuple(location_entry["entrance"]) == spectacle_cave:
+            location_entry["reward_cost"] = ["SmallKey*2"]
+            location_entry["consume"] = ["SmallKey*2"]
+    compiled = compile_configuration(key_configuration)
+    assert compiled.reward_sources["SmallKey"] == ((48, 11), (55, 16))
+    assert "SmallKey" not in compiled.unresolved_items
+    key_configuration["locations"][0]["consume"] = ["SmallKey*0"]
+    with pytest.raises(ConfigurationError):
+        compile_configuration(key_configuration)
+
+
+def test_item_criticality(zelda2_map, zelda2_configuration):
+    """
+    Tests the batch item removal analysis against TileGraph searches of
+    a map whose locations no longer reward the item
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    tile_graph = TileGraph((23, 22), (69, 43), tile_map, location_map)
+    criticality = ItemCriticality(
+        (23, 22), (69, 43), tile_map, location_map, tile_graph=tile_graph
+    )
+    assert set(criticality.impacts) == set(location_map.reward_index)
+    full_graph = TileGraph(
+        (23, 22), (69, 43), tile_map, location_map, goals=ALL_LOCATIONS
+    )
+    assert criticality.baseline_locations == set().union(
+        *full_graph.location_order
+    )
+    assert {"Hammer", "Trophy", "Jump"} <= criticality.critical_items
+    assert "Life" not in criticality.critical_items
+    ranked_impacts = criticality.ranked()
+    assert ranked_impacts[0].critical
+    assert ranked_impacts[-1].lost_locations == frozenset()
+    assert criticality.impacts["Life"].lost_tiles == 0
+
+    for item in ("Hammer", "Life", "Boots"):
+        removed_map = location_map.with_changes(
+            {
+                source: {
+                    "reward": [
+                        reward
+                        for reward in location_map[source]["reward"]
+                        if reward != item
+                    ]
+                }
+                for source in location_map.location_reward_sources(item)
+            }
+        )
+        removed_tiles = TileMap(
+            zelda2_map, removed_map, zelda2_configuration["tiles"]
+        )
+        removed_graph = TileGraph(
+            (23, 22), (69, 43), removed_tiles, removed_map
+        )
+        # Every location as a goal so the search runs to its fixed point
+        # rather than stopping at graph_end
+        closure_graph = TileGraph(
+            (23, 22), (69, 43), removed_tiles, removed_map, goals=ALL_LOCATIONS
+        )
+        completed_locations = set().union(*closure_graph.location_order)
+        reachable_tiles = ReachabilityQuery(
+            removed_tiles, removed_map
+        ).reachable_tiles((23, 22), closure_graph.inventory_order[-1])
+        impact = criticality.impacts[item]
+        assert impact.lost_locations == (
+            criticality.baseline_locations - completed_locations
+        )
+        assert impact.lost_tiles == np.count_nonzero(
+            criticality.baseline_tiles & ~reachable_tiles
+        )
+        assert impact.goal_reachable == removed_graph.beatable
+        assert impact.goal_reachable == ((69, 43) in completed_locations)
+
+    pooled_criticality = ItemCriticality(
+        (23, 22),
+        (69, 43),
+        tile_map,
+        location_map,
+        tile_graph=tile_graph,
+        items=["Hammer", "Life", "Boots"],
+        jobs=2,
+    )
+    for item, impact in pooled_criticality.impacts.items():
+        assert impact.as_dict() == criticality.impacts[item].as_dict()
+
+
+def test_multi_goal_graph(zelda2_map, zelda2_configuration, tmp_path):
+    """
+    Tests a single TileGraph search over several goals and over every
+    location against searches for each goal on its own
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    tile_graph = TileGraph((23, 22), (69, 43), tile_map, location_map)
+    assert tile_graph.goals == {(69, 43)}
+    assert tile_graph.goal_chunks == {(69, 43): 13}
+
+    palaces = [(10, 109), (60, 45), (2, 6)]
+    for goal_directed in (False, True):
+        goal_graph = TileGraph(
+            (23, 22),
+            (69, 43),
+            tile_map,
+            location_map,
+            goal_directed=goal_directed,
+            goals=palaces,
+        )
+        assert goal_graph.beatable
+        assert not goal_graph.unresolved_goals
+        for goal in palaces:
+            single_graph = TileGraph(
+                (23, 22),
+                goal,
+                tile_map,
+                location_map,
+                goal_directed=goal_directed,
+            )
+            assert goal_graph.goal_chunks[goal] == (
+                len(single_graph.location_order) - 1
+            )
+            assert goal in goal_graph.location_order[
+                goal_graph.goal_chunks[goal]
+            ]
+
+    every_location = TileGraph(
+        (23, 22), (69, 43), tile_map, location_map, goals=ALL_LOCATIONS
+    )
+    assert every_location.beatable
+    assert every_location.goals == location_map.entrance_locations
+    assert every_location.unresolved_goals == {(126, 51)}
+    assert set(every_location.goal_chunks) == set().union(
+        *every_location.location_order
+    )
+    criticality = ItemCriticality(
+        (23, 22), (69, 43), tile_map, location_map, tile_graph=tile_graph
+    )
+    assert set(every_location.goal_chunks) == criticality.baseline_locations
+
+    with ResultCache(tmp_path / "results.sqlite") as result_cache:
+        for _ in range(2):
+            cached_graph = TileGraph(
+                (23, 22),
+                (69, 43),
+                tile_map,
+                location_map,
+                cache=result_cache,
+                goals=ALL_LOCATIONS,
+            )
+            assert cached_graph.goal_chunks == every_location.goal_chunks
+        assert result_cache.hits == 1
+
+
+def test_route_planner(zelda2_map, zelda2_configuration):
+    """
+    Tests the route over the TileGraph progression by walking every leg
+    with the items collected before it
+    """
+    location_map = LocationMap(zelda2_configuration["locations"])
+    tile_map = TileMap(zelda2_map, location_map, zelda2_configuration["tiles"])
+    tile_grid = TileGrid(tile_map)
+    warp_indexes = set(map(tuple, tile_grid.warp_indexes.tolist()))
+    tile_graph = TileGraph((23, 22), (69, 43), tile_map, location_map)
+    route = RoutePlanner(tile_graph, tile_map, location_map)
+    assert route.order[0] == (23, 22)
+    assert route.order[-1] == (69, 43)
+    assert sorted(route.order) == sorted(
+        set().union(*tile_graph.location_order)
+    )
+    assert [(leg.start, leg.end) for leg in route.legs] == list(
+        zip(route.order, route.order[1:])
+    )
+    assert route.total_cost == sum(leg.cost for leg in route.legs)
+
+    def walk_route(order):
+        item_counts = ItemInventory()
+        total_cost = 0
+        for start, end in zip(order, order[1:]):
+            item_counts.add(tile_map[start].reward)
+            distances = get_backend().distance_map(
+                tile_grid.traversable(tile_grid.inventory_mask(item_counts)),
+                start,
+                tile_grid.warp_indexes,
+            )
+            end_node = tile_map[end]
+            assert distances[end] >= 0
+            assert item_counts.meets(
+                end_node.reward_cost | end_node.traversal_cost
+            )
+            total_cost += int(distances[end])
+        return total_cost
+
+    assert walk_route(route.order) == route.total_cost
+    item_counts = ItemInventory()
+    for leg in route.legs:
+        item_counts.add(tile_map[leg.start].reward)
+        traversable = tile_grid.traversable(
+            tile_grid.inventory_mask(item_counts)
+        )
+        assert leg.path[0] == leg.start and leg.path[-1] == leg.end
+        assert len(leg.path) == leg.cost + 1
+        for tile_coord, next_coord in zip(leg.path, leg.path[1:]):
+            assert traversable[next_coord]
+            assert next_coord in tile_grid.adjacent(tile_coord) or (
+                np.ravel_multi_index(tile_coord, tile_grid.shape),
+                np.ravel_multi_index(next_coord, tile_grid.shape),
+            ) in warp_indexes
+
+    # The chunk by chunk order of the TileGraph walks much further
+    chunk_order = [(23, 22)]
+    for completion_group in tile_graph.location_order:
+        chunk_order.extend(
+            sorted(completion_group - {(23, 22), (69, 43)})
+        )
+    chunk_order.append((69, 43))
+    assert route.total_cost < walk_route(chunk_order)
+
+    goal_graph = TileGraph(
+        (23, 22), (69, 43), tile_map, location_map, goal_directed=True
+    )
+    goal_route = RoutePlanner(
+        goal_graph, tile_map, location_map, distances=route.distances
+    )
+    assert goal_route.distances is route.distances
+    assert set(goal_route.order) == set().union(
+        {(23, 22)}, *goal_graph.location_order
+    )
+    assert goal_route.total_cost == walk_route(goal_route.order)
+    assert goal_route.total_cost < route.total_cost
+    assert json.loads(json.dumps(goal_route.as_dict()))["order"][-1] == [
+        69,
+        43,
+    ]
+
+    # graph_start rewards the Key without its traversal_cost being met
+    start_locations = LocationMap(
+        [
+            {
+                "description": "Start",
+                "entrance": [0, 0],
+                "exit": [0, 0],
+                "traversal_cost": ["Unobtainium"],
+                "reward_cost": [],
+                "reward": ["Key"],
+            },
+            {
+                "description": "Goal",
+                "entrance": [0, 2],
+                "exit": [0, 2],
+                "traversal_cost": [],
+                "reward_cost": ["Key"],
+                "reward": [],
+            },
+        ]
+    )
+    start_tiles = TileMap(
+        np.full((1, 3), 5), start_locations, zelda2_configuration["tiles"]
+    )
+    start_graph = TileGraph((0, 0), (0, 2), start_tiles, start_locations)
+    assert start_graph.beatable
+    start_route = RoutePlanner(start_graph, start_tiles, start_locations)
+    assert start_route.order == [(0, 0), (0, 2)]
+    assert start_route.total_cost == 2
@@ -0,0 +1,148 @@
+"""
+Benchmark of the cold-start import cost of beedle
+
+Every statement runs within fresh interpreters started with
+"-X importtime", the cumulative time of the top level imports is read
+back from the report and the median over the repeats is printed along
+with the heavy modules the statement loaded
+
+The default statements cover the bare package import, the console
+command and the first access of the main engine classes. A budget in
+milliseconds makes the script exit with an error when the bare package
+import exceeds it
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+
+DEFAULT_STATEMENTS = (
+    "import beedle",
+    "import beedle.cli",
+    "from beedle import TileGraph",
+    "from beedle import ReachabilityQuery",
+    "from beedle import RoutePlanner",
+)
+HEAVY_MODULES = ("numpy", "loguru", "scipy", "numba")
+
+
+def top_level_imports(importtime_report: str) -> Dict[str, int]:
+    """
+    Cumulative microseconds of every top level import of an
+    "-X importtime" report, nested imports being indented
+    """
+    imports = {}
+    for line in importtime_report.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit() and module[1:2] != " ":
+            imports[module.strip()] = int(cumulative)
+    return imports
+
+
+def startup_imports() -> frozenset:
+    """
+    Modules the interpreter imports before running any statement
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "pass"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return frozenset(top_level_imports(completed.stderr))
+
+
+def measure_import(
+    statement: str, skipped_imports: frozenset = frozenset()
+) -> Tuple[float, List[str]]:
+    """
+    Runs the statement within a fresh interpreter, returning the
+    cumulative import time in milliseconds, the imports of the
+    interpreter startup excluded, and the heavy modules loaded
+    """
+    probe = (
+        f"{statement}\n"
+        "import sys\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    total_microseconds = sum(
+        cumulative
+        for module, cumulative in top_level_imports(completed.stderr).items()
+        if module not in skipped_imports
+    )
+    heavy_modules = [
+        module for module in completed.stdout.strip().split(",") if module
+    ]
+    return total_microseconds / 1000, heavy_modules
+
+
+def benchmark(statements: List[str], repeats: int) -> Dict[str, tuple]:
+    """
+    Median import time and heavy modules of every statement
+    """
+    skipped_imports = startup_imports()
+    results = {}
+    for statement in statements:
+        timings = []
+        for _ in range(repeats):
+            milliseconds, heavy_modules = measure_import(
+                statement, skipped_imports
+            )
+            timings.append(milliseconds)
+        results[statement] = (statistics.median(timings), heavy_modules)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "statements",
+        nargs="*",
+        default=list(DEFAULT_STATEMENTS),
+        help="Import statements to measure",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=5, help="Interpreters per statement"
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=None,
+        help="Milliseconds allowed for 'import beedle'",
+    )
+    args = parser.parse_args()
+
+    results = benchmark(args.statements, args.repeats)
+    width = max(len(statement) for statement in results)
+    for statement, (milliseconds, heavy_modules) in results.items():
+        print(
+            f"{statement:<{width}}  {milliseconds:8.1f} ms  "
+            f"{', '.join(heavy_modules) or '-'}"
+        )
+
+    if args.budget is not None:
+        if "import beedle" not in results:
+            results.update(benchmark(["import beedle"], args.repeats))
+        package_milliseconds = results["import beedle"][0]
+        if package_milliseconds > args.budget:
+            print(
+                f"import beedle took {package_milliseconds:.1f} ms, "
+                f"over the budget of {args.budget:.1f} ms"
+            )
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,19 +15,28 @@ The input configuration for the color definitions uses the following:
 - The index is the actual value of the tile on the map. This doesn't have to
   necessarily be an integer but float doesn't seem a likely alternative
 - The color is the string hex value of the color to map to the index value
+
+When a beedle configuration is provided the TileGraph progression is drawn
+on top of the map, tinting the tiles reached by every search chunk and
+marking the locations and bottlenecks. Large renders can additionally be
+split into a zoom pyramid of image tiles
 """
 
 import argparse
 import json
 from pathlib import Path
-from typing import Tuple, Union
+from typing import Union
 
 import numpy as np
-import matplotlib as mpl
-import matplotlib.pyplot as plt
 
-ColorMap = mpl.colors.ListedColormap
-Mapper = mpl.cm.ScalarMappable
+from beedle import LocationMap, ReachabilityQuery, TileGraph, TileMap
+from beedle.tilerender import (
+    chunk_regions,
+    color_lookup,
+    render_map,
+    render_pyramid,
+    write_png,
+)
 
 
 def load_hex_data(filename: Union[str, Path]) -> np.array:
@@ -81,50 +90,6 @@ def load_color_definitions(filename: Union[str, Path]) -> dict:
         return raw_color_data
 
 
-def create_colormap(color_definitions: dict) -> Tuple[ColorMap, Mapper]:
-    """
-    Given the scalar map data and color definitions, create
-    a colormap for usage within matplotlib for visualizing
-    the map data
-
-    References:
-    <ScalarMappable>
-    https://matplotlib.org/stable/api/cm_api.html#matplotlib.cm.ScalarMappable
-    <ListedColormap>
-    https://matplotlib.org/stable/api/_as_gen/matplotlib.colors.ListedColormap
-    <LinearSegmentedColormap>
-    https://matplotlib.org/stable/api/_as_gen/matplotlib.colors.LinearSegmentedColormap.html
-    """
-    color_values = [tile_value["color"] for tile_value in color_definitions.values()]
-    color_index = [tile_value["index"] for tile_value in color_definitions.values()]
-    normalize_function = plt.Normalize(
-        vmin=min(color_index), vmax=max(color_index), clip=False
-    )
-    normalized_index = normalize_function(color_index)
-
-    color_data = []
-    for color, index in zip(color_values, normalized_index):
-        color_data.append((index, mpl.colors.to_rgb(color)))
-
-    colormap_instance = mpl.colors.LinearSegmentedColormap.from_list(
-        "custom", color_data
-    )
-    mapper_instance = mpl.cm.ScalarMappable(
-        norm=normalize_function, cmap=colormap_instance
-    )
-    return colormap_instance, mapper_instance
-
-
-def translate_colormap(data: np.array, cmapper: Mapper) -> np.array:
-    """
-    Wrapper around mpl.cm.ScalarMappable.to_rgba to encode the provided
-    numpy array with RGBA color values for visualization purposes
-    """
-    map_color = cmapper.to_rgba(data, alpha=None, bytes=True, norm=True)
-    map_color = map_color[:, :, :-1]
-    return map_color
-
-
 if __name__ == "__main__":
     parser_obj = argparse.ArgumentParser()
     parser_obj.add_argument(
@@ -152,15 +117,81 @@ if __name__ == "__main__":
         default="./map_colors.png",
         help="Output file path for the map image",
     )
+    parser_obj.add_argument(
+        "--config",
+        dest="config",
+        type=str,
+        required=False,
+        default=None,
+        help="beedle configuration used to draw the progression overlays",
+    )
+    parser_obj.add_argument(
+        "--start",
+        dest="start",
+        type=int,
+        nargs=2,
+        default=None,
+        help="Starting coordinate of the progression",
+    )
+    parser_obj.add_argument(
+        "--end",
+        dest="end",
+        type=int,
+        nargs=2,
+        default=None,
+        help="Goal coordinate of the progression",
+    )
+    parser_obj.add_argument(
+        "--scale",
+        dest="scale",
+        type=int,
+        default=8,
+        help="Width in pixels of a single map tile",
+    )
+    parser_obj.add_argument(
+        "--pyramid",
+        dest="pyramid",
+        type=str,
+        default=None,
+        help="Output directory for a tiled zoom pyramid of the image",
+    )
+    parser_obj.add_argument(
+        "--tile-size",
+        dest="tile_size",
+        type=int,
+        default=256,
+        help="Size in pixels of the zoom pyramid tiles",
+    )
 
     args = parser_obj.parse_args()
     map_data = load_map_data(args.mapdata)
     color_structure = load_color_definitions(args.color_definitions)
-    colormap, mapper = create_colormap(color_structure)
-    color_map_data = translate_colormap(map_data, mapper)
-
-    DPI = 1000
-    (vfig, vax) = plt.subplots(dpi=DPI)
-    vfig.tight_layout()
-    map_figure = vax.imshow(color_map_data, cmap=colormap)
-    plt.savefig(args.outimage, format="png")
+
+    render_options = {}
+    tile_data = None
+    if args.config is not None:
+        with open(args.config, "r", encoding="utf-8") as config_handle:
+            configuration = json.load(config_handle)
+        tile_data = configuration["tiles"]
+        location_map = LocationMap(configuration["locations"])
+        render_options["locations"] = location_map.entrance_locations
+        if args.start is not None and args.end is not None:
+            tile_map = TileMap(map_data, location_map, tile_data)
+            reachability = ReachabilityQuery(tile_map, location_map)
+            graph_obj = TileGraph(
+                tuple(args.start),
+                tuple(args.end),
+                tile_map,
+                location_map,
+                reachability=reachability,
+            )
+            render_options["regions"] = chunk_regions(graph_obj, reachability)
+            render_options["bottlenecks"] = graph_obj.bottlenecks
+
+    lookup = color_lookup(color_structure, tile_data)
+    map_image = render_map(
+        map_data, lookup, tile_scale=args.scale, **render_options
+    )
+    write_png(args.outimage, map_image)
+    if args.pyramid is not None:
+        render_pyramid(map_image, args.pyramid, tile_size=args.tile_size)